@@ -35,8 +35,13 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
     ],
 
+    python_requires='>=3.7',
     install_requires=['requests'],
+    extras_require={'async': ['aiohttp']},
     include_package_data=True,
 )
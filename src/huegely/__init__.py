@@ -1,15 +1,21 @@
 __all__ = [
+    'AsyncBridge',
     'Bridge',
+    'BridgeCluster',
     'DimmableLight',
     'ColorLight',
     'ColorTemperatureLight',
     'ExtendedColorLight',
+    'profile',
 ]
 
+from huegely.aio import AsyncBridge
 from huegely.bridge import Bridge
+from huegely.cluster import BridgeCluster
 from huegely.lights import (
     DimmableLight,
     ColorLight,
     ColorTemperatureLight,
     ExtendedColorLight,
 )
+from huegely.profiling import profile
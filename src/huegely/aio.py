@@ -0,0 +1,604 @@
+""" Asyncio versions of the bridge and all devices.
+
+    Everything in here mirrors the synchronous API, except that every method doing a request is a coroutine::
+
+        async with AsyncBridge(bridge_ip, token) as bridge:
+            lights = await bridge.lights()
+            await asyncio.gather(*[light.on() for light in lights])
+
+    Requires the optional ``aiohttp`` dependency (``pip install huegely[async]``).
+"""
+import asyncio
+import contextvars
+import json
+
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from huegely import (
+    batch,
+    bridge,
+    exceptions,
+    features,
+    groups,
+    instrumentation,
+    lights,
+    sensors,
+    watch,
+)
+
+
+class AsyncFeatureBase(features.FeatureBase):
+    """ Async counterpart of FeatureBase. Name mapping and transition time handling are shared with the sync devices. """
+    __slots__ = ()
+
+    async def _set_state(self, **state):
+        current_state = (self._cached_state(self.cache_ttl) or await self._get_state()) if self._needs_current_state(state) else None
+        url, state, bookkeeping = self._prepare_state(state, current_state)
+
+        current_batch = self.bridge.current_batch
+        if current_batch is not None:
+            return current_batch.add(self, url, state, bookkeeping)
+
+        return await self._send_state(url, state, bookkeeping)
+
+    async def _send_state(self, url, state, bookkeeping=None):
+        try:
+            response = await self.bridge.make_request(url, method='PUT', **state)
+        except exceptions.HueError as e:
+            self._handle_state_error(e)
+            raise
+
+        self._apply_bookkeeping(bookkeeping)
+        return self._process_state_response(response)
+
+    async def _get_state(self):
+        try:
+            response = await self.bridge.make_request(self.device_url)
+        except exceptions.HueError:
+            self._invalidate_state()
+            raise
+
+        return self._process_device(response)
+
+    async def state(self, max_age=None, **state):
+        """ Gets or sets state attributes, see ``FeatureBase.state``. """
+        if state:
+            return await self._set_state(**state)
+
+        cached_state = self._cached_state(self.cache_ttl if max_age is None else max_age)
+        return cached_state if cached_state is not None else await self._get_state()
+
+    async def _state_value(self, attribute, max_age=None):
+        """ Returns a single state attribute, see ``FeatureBase._state_value``. """
+        if self._is_state_fresh(self.cache_ttl if max_age is None else max_age):
+            return self._state[attribute]
+        return (await self._get_state())[attribute]
+
+    async def _get_name(self):
+        self._update_name((await self.bridge.make_request(self.device_url))['name'])
+        return self._name
+
+    async def _set_name(self, name):
+        self._update_name((await self.bridge.make_request(self.device_url, method='PUT', name=name))['name'])
+        return self._name
+
+    async def name(self, name=None):
+        """ Gets or sets the current name of the device, see ``FeatureBase.name``. """
+        return await self._set_name(name=name) if name is not None else await self._get_name()
+
+
+class AsyncDimmer(features.Dimmer):
+    """ Async counterpart of Dimmer. """
+    __slots__ = ()
+
+    async def _set_state(self, **state):
+        state = self._brightness_steps_to_hue(state)
+        known_state = self._tracked_state() if 'bri_inc' in state else None
+
+        response = await super(AsyncDimmer, self)._set_state(**state)
+        if isinstance(response, batch.BatchResult):
+            return self._batched_response(response)
+
+        # See Dimmer._set_state, groups need an extra request to get the new brightness unless it can be predicted
+        if 'bri_inc' in response and not self._apply_brightness_increment(response, known_state):
+            response['brightness'] = (await self._get_state())['brightness']
+
+        return response
+
+    async def on(self, transition_time=None):
+        return (await self.state(on=True, transition_time=transition_time))['on']
+
+    async def off(self, transition_time=None):
+        return (await self.state(on=False, transition_time=transition_time))['on']
+
+    async def is_on(self):
+        return await self._state_value('on')
+
+    async def brighter(self, step=25, transition_time=None):
+        update = self._brighter_update(step)
+        try:
+            return (await self.state(transition_time=transition_time, **update))['brightness']
+        except exceptions.HueError as e:
+            if 'on' in update or not self._is_off_error(e):
+                raise
+            return (await self.state(on=True, transition_time=transition_time, **update))['brightness']
+
+    async def darker(self, step=25, transition_time=None):
+        update = self._darker_update(step)
+        if update is None:
+            return 0
+
+        try:
+            response = await self.state(transition_time=transition_time, **update)
+        except exceptions.HueError as e:
+            if self._is_off_error(e):
+                return 0
+            raise
+        return 0 if 'on' in update else response['brightness']
+
+    async def _set_brightness(self, brightness, transition_time=None):
+        try:
+            return (await self.state(transition_time=transition_time, **self._brightness_update(brightness)))['brightness']
+        except exceptions.HueError as e:
+            if self._is_off_error(e):
+                return 0
+            raise
+
+    async def _get_brightness(self):
+        return await self._state_value('brightness')
+
+    async def brightness(self, brightness=None, transition_time=None):
+        if brightness is not None:
+            return await self._set_brightness(brightness=brightness, transition_time=transition_time)
+        return await self._get_brightness()
+
+    async def _set_alert(self, alert):
+        return (await self.state(**self._alert_update(alert)))['alert']
+
+    async def _get_alert(self):
+        return await self._state_value('alert')
+
+    async def alert(self, alert=None):
+        return await self._set_alert(alert=alert) if alert is not None else await self._get_alert()
+
+
+class AsyncColorController(features.ColorController):
+    """ Async counterpart of ColorController. """
+    __slots__ = ()
+
+    async def _set_coordinates(self, coordinates, transition_time=None):
+        return (await self.state(transition_time=transition_time, **self._coordinates_update(coordinates)))['coordinates']
+
+    async def _get_coordinates(self):
+        return await self._state_value('coordinates')
+
+    async def coordinates(self, coordinates=None, transition_time=None):
+        if coordinates is not None:
+            return await self._set_coordinates(coordinates=coordinates, transition_time=transition_time)
+        return await self._get_coordinates()
+
+    async def _set_hue(self, hue, transition_time=None):
+        return (await self.state(transition_time=transition_time, **self._hue_update(hue)))['hue']
+
+    async def _get_hue(self):
+        return await self._state_value('hue')
+
+    async def hue(self, hue=None, transition_time=None):
+        if hue is not None:
+            return await self._set_hue(hue=hue, transition_time=transition_time)
+        return await self._get_hue()
+
+    async def _set_saturation(self, saturation, transition_time=None):
+        return (await self.state(transition_time=transition_time, **self._saturation_update(saturation)))['saturation']
+
+    async def _get_saturation(self):
+        return await self._state_value('saturation')
+
+    async def saturation(self, saturation=None, transition_time=None):
+        if saturation is not None:
+            return await self._set_saturation(saturation=saturation, transition_time=transition_time)
+        return await self._get_saturation()
+
+    async def _set_effect(self, effect):
+        return (await self.state(**self._effect_update(effect)))['effect']
+
+    async def _get_effect(self):
+        return await self._state_value('effect')
+
+    async def effect(self, effect=None):
+        return await self._set_effect(effect=effect) if effect is not None else await self._get_effect()
+
+    async def color_mode(self):
+        return await self._state_value('color_mode')
+
+
+class AsyncTemperatureController(features.TemperatureController):
+    """ Async counterpart of TemperatureController. """
+    __slots__ = ()
+
+    async def _set_temperature(self, temperature, transition_time=None):
+        return (await self.state(transition_time=transition_time, **self._temperature_update(temperature)))['temperature']
+
+    async def _get_temperature(self):
+        return await self._state_value('temperature')
+
+    async def temperature(self, temperature=None, transition_time=None):
+        if temperature is not None:
+            return await self._set_temperature(temperature=temperature, transition_time=transition_time)
+        return await self._get_temperature()
+
+
+class AsyncLight(AsyncFeatureBase, lights.Light):
+    __slots__ = ()
+
+    async def is_reachable(self):
+        return (await self._get_state())['is_reachable']
+
+    async def groups(self):
+        return (await self.bridge.membership()).groups(self.device_id)
+
+
+class AsyncDimmableLight(AsyncDimmer, AsyncLight, lights.DimmableLight):
+    __slots__ = ()
+
+
+class AsyncColorLight(AsyncDimmer, AsyncColorController, AsyncLight, lights.ColorLight):
+    __slots__ = ()
+
+
+class AsyncColorTemperatureLight(AsyncDimmer, AsyncTemperatureController, AsyncLight, lights.ColorTemperatureLight):
+    __slots__ = ()
+
+
+class AsyncExtendedColorLight(AsyncDimmer, AsyncTemperatureController, AsyncColorController, AsyncLight, lights.ExtendedColorLight):
+    __slots__ = ()
+
+
+ASYNC_LIGHT_TYPES = {
+    'Dimmable light': AsyncDimmableLight,
+    'Color light': AsyncColorLight,
+    'Color temperature light': AsyncColorTemperatureLight,
+    'Extended color light': AsyncExtendedColorLight
+}
+
+
+class AsyncGroup(AsyncFeatureBase, groups.Group):
+    __slots__ = ()
+
+    async def lights(self):
+        return (await self.bridge.membership()).lights(self.device_id)
+
+    async def group_type(self):
+        return (await self.bridge.make_request(self.device_url))['type']
+
+
+class AsyncDimmableGroup(AsyncDimmer, AsyncGroup, groups.DimmableGroup):
+    __slots__ = ()
+
+
+class AsyncColorGroup(AsyncDimmer, AsyncColorController, AsyncGroup, groups.ColorGroup):
+    __slots__ = ()
+
+
+class AsyncColorTemperatureGroup(AsyncDimmer, AsyncTemperatureController, AsyncGroup, groups.ColorTemperatureGroup):
+    __slots__ = ()
+
+
+class AsyncExtendedColorGroup(AsyncDimmer, AsyncTemperatureController, AsyncColorController, AsyncGroup, groups.ExtendedColorGroup):
+    __slots__ = ()
+
+
+ASYNC_GROUP_TYPES = [AsyncExtendedColorGroup, AsyncColorTemperatureGroup, AsyncColorGroup, AsyncDimmableGroup]
+
+
+class AsyncSensor(AsyncFeatureBase, sensors.Sensor):
+    __slots__ = ()
+
+
+class AsyncTemperatureSensor(AsyncSensor, sensors.TemperatureSensor):
+    __slots__ = ()
+
+    async def _get_temperature(self, max_age=None):
+        return await self._state_value('temperature', max_age=max_age) / 100
+    temperature = _get_temperature
+
+
+class AsyncMotionSensor(AsyncSensor, sensors.MotionSensor):
+    __slots__ = ()
+
+    async def _get_presence(self, max_age=None):
+        return await self._state_value('presence', max_age=max_age)
+    presence = _get_presence
+
+    async def _get_last_updated(self, max_age=None):
+        datetime_string = await self._state_value('last_updated', max_age=max_age)
+        return datetime.strptime(datetime_string, "%Y-%m-%dT%H:%M:%S")
+    last_updated = _get_last_updated
+
+
+ASYNC_SENSOR_TYPES = {
+    'ZLLTemperature': AsyncTemperatureSensor,
+    'ZLLPresence': AsyncMotionSensor,
+}
+
+
+# Bridge id -> batch collecting updates, see AsyncBridge.current_batch. Like everything kept in a context variable,
+# batches are per task, and tasks started inside a batch are part of it.
+_current_batches = contextvars.ContextVar('huegely_batches', default={})
+
+
+class AsyncBatch(batch.Batch):
+    """ Async counterpart of Batch, used via ``bridge.batch()``::
+
+            async with bridge.batch():
+                await light.on()
+                await light.brightness(200)
+            # One request to lights/<id>/state has been made
+
+        The requests of all devices are sent concurrently when the block ends.
+    """
+    def __enter__(self):
+        raise TypeError("Batches of an AsyncBridge have to be used with `async with`, not `with`.")
+
+    async def __aenter__(self):
+        return super(AsyncBatch, self).__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.bridge.current_batch = self._outer_batch
+        if exc_type is None:
+            await self.send()
+        else:
+            self.cancel()
+
+    async def send(self):
+        """ Sends all pending updates concurrently, see ``Batch.send``. """
+        pending, self._pending = self._pending, OrderedDict()
+
+        responses = await asyncio.gather(*[
+            device._send_state(url, state, bookkeeping) for url, (device, state, bookkeeping, _) in pending.items()
+        ], return_exceptions=True)
+
+        first_error = None
+        for (_, _, _, results), response in zip(pending.values(), responses):
+            if isinstance(response, Exception):
+                first_error = first_error or response
+                self._resolve(results, error=response)
+            else:
+                self._resolve(results, response)
+
+        if first_error is not None:
+            raise first_error
+
+
+class AsyncWatcher(watch.Watcher):
+    """ Async counterpart of Watcher, used via ``bridge.watch()``::
+
+            async for event in bridge.watch():
+                print(event.device, event.attribute, event.old_value, event.new_value)
+
+        The device kinds are polled concurrently.
+    """
+    def __iter__(self):
+        raise TypeError("Watchers of an AsyncBridge have to be used with `async for`, not `for`.")
+
+    async def __aiter__(self):
+        while True:
+            for event in await self.poll():
+                yield event
+            await asyncio.sleep(self.interval)
+
+    async def poll(self):
+        """ Polls the bridge once and returns the list of changes since the last poll, see ``Watcher.poll``. """
+        responses = await asyncio.gather(*[self.bridge.make_request(kind) for kind in self.kinds])
+
+        events = []
+        for kind, data in zip(self.kinds, responses):
+            events += self._process_kind(kind, data)
+        return self._finish_poll(events)
+
+
+class AsyncBridge(bridge.Bridge):
+    """ Async counterpart of Bridge. All requests share one aiohttp session, with at most *pool_size* connections
+        open to the bridge at any time; further requests wait for a free connection.
+
+        Use it as an async context manager or call ``await bridge.close()`` when done.
+    """
+    _light_types = ASYNC_LIGHT_TYPES
+    _sensor_types = ASYNC_SENSOR_TYPES
+    _group_types = ASYNC_GROUP_TYPES
+
+    def __init__(self, ip, username=None, transition_time=None, pool_size=10, timeout=10, cache_ttl=None):
+        if aiohttp is None:
+            raise ImportError("AsyncBridge requires aiohttp, install it with `pip install huegely[async]`.")
+        super(AsyncBridge, self).__init__(
+            ip, username=username, transition_time=transition_time, pool_size=pool_size, timeout=timeout, cache_ttl=cache_ttl
+        )
+
+    def _create_session(self):
+        # aiohttp sessions have to be created inside a running event loop, see _get_session
+        return None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    @property
+    def current_batch(self):
+        """ The batch currently collecting updates in this task, if any. """
+        return _current_batches.get().get(id(self))
+
+    @current_batch.setter
+    def current_batch(self, value):
+        batches = dict(_current_batches.get())
+        if value is None:
+            batches.pop(id(self), None)
+        else:
+            batches[id(self)] = value
+        _current_batches.set(batches)
+
+    def batch(self):
+        """ Returns an async context manager collecting all state updates made inside it, see ``AsyncBatch``. """
+        return AsyncBatch(self)
+
+    def __enter__(self):
+        raise TypeError("AsyncBridge has to be used with `async with`, not `with`.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def warm_up(self, connections=None):
+        """ Opens *connections* (defaults to the pool size) keep-alive connections to the bridge ahead of time. """
+        connections = max(1, min(self.pool_size, connections or self.pool_size))
+        url = 'http://{}/api/config'.format(self.ip)
+
+        session = self._get_session()
+
+        async def fetch():
+            async with session.request('GET', url) as response:
+                await response.read()
+
+        await asyncio.gather(*[fetch() for _ in range(connections)], return_exceptions=True)
+
+    async def close(self):
+        """ Closes all pooled connections to the bridge. """
+        if self.session is not None:
+            await self.session.close()
+
+    async def get_token(self, app_identifier):
+        url = 'http://{}/api'.format(self.ip)
+        response = await self.make_request(method='POST', full_url=url, devicetype=app_identifier)
+        return response['username']
+
+    async def make_request(self, path=None, method='GET', full_url=None, **data):
+        """ Async version of ``Bridge.make_request``, the response is processed in exactly the same way. """
+        url = full_url or self.base_url + path
+        self.request_count += 1
+
+        if not self.instruments:
+            async with self._get_session().request(method, url, json=data) as response:
+                response_data = await response.json(content_type=None)
+            return self._process_response(method, data, response_data)
+
+        with instrumentation.record(self, method, url, data) as info:
+            async with self._get_session().request(method, url, json=data) as response:
+                content = await response.read()
+            info.bytes_out = len(json.dumps(data).encode('utf-8'))
+            info.bytes_in = len(content)
+            info.response = self._process_response(method, data, json.loads(content.decode('utf-8')) if content else None)
+        return info.response
+
+    async def _get_name(self):
+        return (await self.make_request('config'))['name']
+
+    async def _set_name(self, name):
+        return (await self.make_request('config', method='PUT', name=name))['name']
+
+    async def name(self, name=None):
+        return await self._set_name(name=name) if name is not None else await self._get_name()
+
+    async def lights(self):
+        return self._build_lights(await self.make_request('lights'), complete=True)
+
+    async def groups(self):
+        return self._build_groups(await self.make_request('groups'), complete=True)
+
+    async def sensors(self):
+        return self._build_sensors(await self.make_request('sensors'), complete=True)
+
+    async def light(self, device_id, max_age=None):
+        """ Returns the light with *device_id*, see ``Bridge.light``. """
+        return await self._device('lights', device_id, max_age)
+
+    async def group(self, device_id, max_age=None):
+        return await self._device('groups', device_id, max_age)
+
+    async def sensor(self, device_id, max_age=None):
+        return await self._device('sensors', device_id, max_age)
+
+    async def light_by_name(self, name, max_age=None):
+        """ Returns the light called *name*, see ``Bridge.light_by_name``. """
+        return await self._device_by_name('lights', name, max_age, self.lights)
+
+    async def group_by_name(self, name, max_age=None):
+        return await self._device_by_name('groups', name, max_age, self.groups)
+
+    async def sensor_by_name(self, name, max_age=None):
+        return await self._device_by_name('sensors', name, max_age, self.sensors)
+
+    async def _device(self, kind, device_id, max_age):
+        device_id = int(device_id)
+        device = self._registry.get(kind, device_id, max_age)
+        if device is None:
+            device = self._build_device(kind, device_id, await self.make_request('{}/{}'.format(kind, device_id)))
+        return device
+
+    async def _device_by_name(self, kind, name, max_age, list_devices):
+        device = self._registry.get_by_name(kind, name, max_age)
+        if device is None and not self._registry.is_missing(kind, name, max_age):
+            await list_devices()
+            device = self._registry.get_by_name(kind, name)
+        return self._check_named_device(kind, name, device)
+
+    async def map(self, devices, fn, max_workers=None):
+        """ Awaits ``fn(device)`` for all *devices* concurrently, see ``Bridge.map``. """
+        devices = list(devices)
+        semaphore = asyncio.Semaphore(max_workers or self.pool_size)
+        locks = {device.device_url: asyncio.Lock() for device in devices}
+
+        async def call(device):
+            async with locks[device.device_url], semaphore:
+                try:
+                    return await fn(device), None
+                except exceptions.HueError as e:
+                    return None, e
+
+        return self._collect_results(devices, await asyncio.gather(*[call(device) for device in devices]))
+
+    async def membership(self, max_age=None):
+        age = self._membership.age()
+        if age is None or (max_age is not None and age > max_age):
+            await self.snapshot()
+        return self._membership
+
+    async def sync_sensors(self):
+        return self._sync_sensors(await self.make_request('sensors'))
+
+    async def set_many(self, lights, max_age=None, **state):
+        """ Async version of ``Bridge.set_many``, the planned requests are sent concurrently. """
+        lights_by_id = {light.device_id: light for light in lights}
+        plan = [(light, []) for light in lights_by_id.values()]
+        if len(lights_by_id) > 1:
+            index = await self.membership(max_age=max_age)
+            all_lights_group = await self.group(0) if self._targets_all_lights(lights_by_id, index) else None
+            plan = self._plan_set_many(lights_by_id, index, all_lights_group)
+
+        responses = await asyncio.gather(*[device.state(**state) for device, _ in plan])
+        for (_, members), response in zip(plan, responses):
+            self._update_members(members, state, response)
+        return [(device, response) for (device, _), response in zip(plan, responses)]
+
+    def watch(self, **kwargs):
+        """ Returns an async iterator polling the bridge, see ``AsyncWatcher``. """
+        return AsyncWatcher(self, **kwargs)
+
+    async def refresh(self, devices):
+        devices = list(devices)
+        prefixes = list({device._device_url_prefix for device in devices})
+        responses = await asyncio.gather(*[self.make_request(prefix) for prefix in prefixes])
+        return self._distribute_state(devices, dict(zip(prefixes, responses)))
+
+    async def snapshot(self):
+        return self._build_snapshot(await self.make_request(''))
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from huegely import (
+    exceptions,
+)
+
+
+def merge_state(merged_state, state):
+    """ Merges the hue-named *state* into *merged_state*. Newer values win, except brightness steps, which are combined. """
+    for key, value in state.items():
+        if key == 'bri_inc' and 'bri' in merged_state:
+            merged_state['bri'] = max(0, min(254, merged_state['bri'] + value))
+        elif key == 'bri_inc':
+            merged_state['bri_inc'] = merged_state.get('bri_inc', 0) + value
+        else:
+            if key == 'bri':
+                merged_state.pop('bri_inc', None)
+            merged_state[key] = value
+
+
+class BatchResult(dict):
+    """ Result of a state update made inside a batch.
+
+        Until the batch is sent, this contains the requested values, so that e.g. ``light.on()`` returns True inside a batch.
+        Once the batch has been sent, ``result()`` returns the processed response for the update,
+        in the same format ``state()`` returns it outside of a batch, or raises the HueError of a failed request.
+    """
+    def __init__(self, requested):
+        super(BatchResult, self).__init__(requested)
+        self._future = Future()
+
+    def done(self):
+        """ Returns True once the batch has been sent. """
+        return self._future.done()
+
+    def result(self, timeout=None):
+        """ Returns the processed response once the batch has been sent, waiting up to *timeout* seconds for it. """
+        return self._future.result(timeout=timeout)
+
+    def exception(self, timeout=None):
+        return self._future.exception(timeout=timeout)
+
+
+class Batch(object):
+    """ Collects state updates and sends them as one request per device.
+
+        Use it via ``bridge.batch()``::
+
+            with bridge.batch():
+                light.on()
+                light.brightness(200)
+                light.hue(1000)
+            # One request to lights/<id>/state has been made
+
+        Updates to the same device are merged, later values replacing earlier ones (brighter/darker steps are added up).
+        Reading state inside a batch still makes requests as usual, and doesn't see the pending updates.
+        If the block raises an exception, nothing is sent.
+    """
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self._outer_batch = None
+
+        # url -> (device, merged hue-named state, merged bookkeeping, [(result, requested huegely names), ...])
+        self._pending = OrderedDict()
+
+    def __enter__(self):
+        self._outer_batch = self.bridge.current_batch
+        self.bridge.current_batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.bridge.current_batch = self._outer_batch
+        if exc_type is None:
+            self.send()
+        else:
+            self.cancel()
+
+    def __len__(self):
+        """ Number of requests the batch will send. """
+        return len(self._pending)
+
+    def add(self, device, url, state, bookkeeping=None):
+        """ Adds an update of the hue-named *state* at *url* of *device* to the batch, with the *bookkeeping* to do
+            once it has been sent (see ``FeatureBase._apply_bookkeeping``). Returns a BatchResult.
+        """
+        result = BatchResult(device._codec.decode(state))
+
+        requested = set(result)
+        if 'bri_inc' in state:
+            requested.add('brightness')
+
+        _, merged_state, merged_bookkeeping, results = self._pending.setdefault(url, (device, {}, {}, []))
+        merge_state(merged_state, state)
+        merged_bookkeeping.update(bookkeeping or {})
+        results.append((result, requested))
+        return result
+
+    def send(self):
+        """ Sends all pending updates, one request per device.
+
+            All updates are attempted even if some of them fail, the first HueError is raised afterwards.
+        """
+        pending, self._pending = self._pending, OrderedDict()
+
+        first_error = None
+        for url, (device, state, bookkeeping, results) in pending.items():
+            try:
+                response = device._send_state(url, state, bookkeeping)
+            except exceptions.HueError as e:
+                first_error = first_error or e
+                self._resolve(results, error=e)
+            else:
+                self._resolve(results, response)
+
+        if first_error is not None:
+            raise first_error
+
+    def _resolve(self, results, response=None, error=None):
+        """ Completes the BatchResults in *results* with the *response* of the request, or its *error*. """
+        for result, requested in results:
+            if error is not None:
+                result._future.set_exception(error)
+            else:
+                result._future.set_result({key: value for key, value in response.items() if key in requested})
+
+    def cancel(self):
+        """ Drops all pending updates without sending them. """
+        pending, self._pending = self._pending, OrderedDict()
+        for _, _, _, results in pending.values():
+            for result, _ in results:
+                result._future.cancel()
@@ -0,0 +1,297 @@
+""" Benchmarks of huegely's public operations, run against the bridge emulator (see huegely.emulator)::
+
+    python -m huegely.bench --latency 0.02 --output results.json
+    python -m huegely.bench --latency 0.02 --compare results.json
+
+For every operation and scenario, this reports the latency percentiles, operations per second and the number of requests
+each operation made, and how much memory each light uses. Scenarios:
+
+ - default: operations on a bridge with default settings
+ - transition_time: the same operations on a bridge with a global transition time
+ - concurrent: operations on all lights at once, using ``Bridge.map``
+
+Results are saved as JSON, and can be compared with the results of an earlier run to spot regressions.
+"""
+import argparse
+import copy
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from collections import OrderedDict
+
+from huegely import (
+    bridge,
+    emulator,
+    fake_data,
+)
+from huegely.sensors import SENSOR_TYPES
+
+
+SCENARIOS = ['default', 'transition_time', 'concurrent']
+
+
+class Context(object):
+    """ What operations work with: the bridge, and devices of every kind fetched from it once. """
+    def __init__(self, hue_bridge):
+        self.bridge = hue_bridge
+        self.lights = hue_bridge.lights()
+        self.light = self.lights[0]
+        self.group = hue_bridge.groups()[0]
+        self.sensor = hue_bridge.sensors()[0]
+
+
+# State translated by the codec operations, a typical update and a full light state
+ENCODE_STATE = {'on': True, 'brightness': 200, 'coordinates': (0.5, 0.25), 'transition_time': 100}
+DECODE_STATE = fake_data.BRIDGE_LIGHTS['1']['state']
+
+# Operations measured for the default and transition_time scenarios: name -> function of the Context
+OPERATIONS = OrderedDict([
+    ('Bridge.lights', lambda context: context.bridge.lights()),
+    ('Bridge.snapshot', lambda context: context.bridge.snapshot()),
+    ('Dimmer.on', lambda context: context.light.on()),
+    ('Dimmer.off', lambda context: context.light.off()),
+    ('Dimmer.brighter', lambda context: context.light.brighter(1)),
+    ('ColorController.hue', lambda context: context.light.hue(10000)),
+    # Enough iterations turn the light off, so this runs after the operations that need it on
+    ('Dimmer.darker', lambda context: context.light.darker(1)),
+    ('Dimmer.brightness', lambda context: context.light.brightness()),
+    ('Group.lights', lambda context: context.group.lights()),
+    ('Bridge.light_by_name', lambda context: context.bridge.light_by_name(context.light._name)),
+    ('Sensor.state', lambda context: context.sensor.state()),
+    # Translating state, done for every request and response, without any I/O
+    ('Codec.encode', lambda context: context.light._codec.encode(ENCODE_STATE)),
+    ('Codec.decode', lambda context: context.light._codec.decode(DECODE_STATE)),
+])
+
+# Operations measured for the concurrent scenario, run on all lights: name -> function of a light
+CONCURRENT_OPERATIONS = OrderedDict([
+    ('Dimmer.on', lambda light: light.on()),
+    ('Dimmer.off', lambda light: light.off()),
+    ('Dimmer.brighter', lambda light: light.brighter(1)),
+    ('Dimmer.brightness', lambda light: light.brightness()),
+    ('ColorController.hue', lambda light: light.hue(10000)),
+])
+
+
+def make_datastore(lights=10):
+    """ Returns the fake bridge data with *lights* extended color lights, all of them in group 1. """
+    datastore = copy.deepcopy(fake_data.BRIDGE_FULL_STATE)
+    template = datastore['lights']['1']
+
+    datastore['lights'] = OrderedDict()
+    for light_id in range(1, lights + 1):
+        light = copy.deepcopy(template)
+        light['name'] = 'Light {}'.format(light_id)
+        light['uniqueid'] = '00:00:00:00:00:00:{:02x}:00-0b'.format(light_id % 256)
+        datastore['lights'][str(light_id)] = light
+
+    # Leave out sensors huegely doesn't support, they would only add noise
+    datastore['sensors'] = {
+        sensor_id: sensor for sensor_id, sensor in datastore['sensors'].items() if sensor['type'] in SENSOR_TYPES
+    }
+
+    all_lights = list(datastore['lights'])
+    for group in datastore['groups'].values():
+        group['lights'] = all_lights
+    return datastore
+
+
+def percentile(sorted_values, fraction):
+    """ Returns the value below which *fraction* of the *sorted_values* are (nearest rank). """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def measure(hue_bridge, operation, iterations, ops_per_iteration=1):
+    """ Runs *operation* *iterations* times and returns latency (in milliseconds), throughput and request statistics. """
+    durations = []
+    requests_before = hue_bridge.request_count
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation_start = time.perf_counter()
+        operation()
+        durations.append((time.perf_counter() - operation_start) * 1000)
+    total = time.perf_counter() - start
+    requests = hue_bridge.request_count - requests_before
+
+    durations.sort()
+    ops = iterations * ops_per_iteration
+    return OrderedDict([
+        ('iterations', iterations),
+        ('ops', ops),
+        ('ops_per_sec', ops / total if total else None),
+        ('requests', requests),
+        ('requests_per_op', requests / ops),
+        ('latency_ms', OrderedDict([
+            ('mean', sum(durations) / len(durations)),
+            ('p50', percentile(durations, 0.5)),
+            ('p95', percentile(durations, 0.95)),
+            ('p99', percentile(durations, 0.99)),
+        ])),
+    ])
+
+
+def run_scenario(scenario, bridge_emulator, iterations, workers=None):
+    """ Runs all operations of *scenario* against *bridge_emulator*. Returns a list of results. """
+    transition_time = 0.5 if scenario == 'transition_time' else None
+    results = []
+    with bridge.Bridge(bridge_emulator.ip, bridge_emulator.username, transition_time=transition_time,
+                       pool_size=workers or 10) as hue_bridge:
+        context = Context(hue_bridge)
+
+        if scenario == 'concurrent':
+            for name, operation in CONCURRENT_OPERATIONS.items():
+                result = measure(
+                    hue_bridge, lambda: hue_bridge.map(context.lights, operation, max_workers=workers), iterations,
+                    ops_per_iteration=len(context.lights),
+                )
+                results.append(OrderedDict([('scenario', scenario), ('operation', name)] + list(result.items())))
+        else:
+            for name, operation in OPERATIONS.items():
+                result = measure(hue_bridge, lambda: operation(context), iterations)
+                results.append(OrderedDict([('scenario', scenario), ('operation', name)] + list(result.items())))
+
+    return results
+
+
+def measure_memory(lights=10):
+    """ Builds *lights* lights from bridge data, like ``Bridge.lights()`` does, and returns the memory (in bytes)
+        each of them uses: in total, for the device object itself and for its state.
+    """
+    data = make_datastore(lights)['lights']
+    hue_bridge = bridge.Bridge('127.0.0.1', 'memory')
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        devices = hue_bridge._build_lights(data)
+        total = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    device = devices[0]
+    object_bytes = sys.getsizeof(device) + (sys.getsizeof(device.__dict__) if hasattr(device, '__dict__') else 0)
+    state = device._state
+    return OrderedDict([
+        ('devices', len(devices)),
+        ('bytes_per_device', total / len(devices)),
+        ('object_bytes_per_device', object_bytes),
+        ('state_bytes_per_device', sys.getsizeof(state) + (sys.getsizeof(state._extra) if state._extra else 0)),
+    ])
+
+
+def run(scenarios=SCENARIOS, iterations=100, latency=0, jitter=0, lights=10, workers=None):
+    """ Runs the benchmarks of all *scenarios*, each against a fresh emulator with *lights* lights.
+        Returns the report, a dictionary of settings and results that can be saved as JSON.
+    """
+    results = []
+    for scenario in scenarios:
+        with emulator.BridgeEmulator(datastore=make_datastore(lights), latency=latency, jitter=jitter) as bridge_emulator:
+            results += run_scenario(scenario, bridge_emulator, iterations, workers=workers)
+
+    return OrderedDict([
+        ('python', platform.python_version()),
+        ('settings', OrderedDict([
+            ('iterations', iterations),
+            ('latency', latency),
+            ('jitter', jitter),
+            ('lights', lights),
+            ('workers', workers),
+        ])),
+        ('results', results),
+        ('memory', measure_memory(lights)),
+    ])
+
+
+def compare(report, baseline):
+    """ Returns the p50 latency and requests per operation of *report* relative to *baseline*, as a list of
+        (scenario, operation, p50 ratio, requests per op ratio). Operations missing from *baseline* are skipped.
+    """
+    baseline_results = {(result['scenario'], result['operation']): result for result in baseline['results']}
+    comparison = []
+    for result in report['results']:
+        old = baseline_results.get((result['scenario'], result['operation']))
+        if old is None:
+            continue
+        comparison.append((
+            result['scenario'],
+            result['operation'],
+            result['latency_ms']['p50'] / old['latency_ms']['p50'] if old['latency_ms']['p50'] else None,
+            result['requests_per_op'] / old['requests_per_op'] if old['requests_per_op'] else None,
+        ))
+    return comparison
+
+
+def _format_ratio(ratio):
+    return '{:.2f}x'.format(ratio) if ratio is not None else '-'
+
+
+def print_report(report, baseline=None, out=sys.stdout):
+    comparison = {}
+    if baseline is not None:
+        comparison = {(scenario, operation): ratios for scenario, operation, *ratios in compare(report, baseline)}
+
+    header = '{:<16} {:<22} {:>9} {:>9} {:>9} {:>10} {:>9}'.format(
+        'scenario', 'operation', 'p50 ms', 'p95 ms', 'p99 ms', 'ops/sec', 'req/op'
+    )
+    if comparison:
+        header += ' {:>9} {:>9}'.format('p50 vs', 'req vs')
+    print(header, file=out)
+
+    for result in report['results']:
+        latency = result['latency_ms']
+        line = '{:<16} {:<22} {:>9.2f} {:>9.2f} {:>9.2f} {:>10.1f} {:>9.2f}'.format(
+            result['scenario'], result['operation'], latency['p50'], latency['p95'], latency['p99'],
+            result['ops_per_sec'] or 0, result['requests_per_op'],
+        )
+        ratios = comparison.get((result['scenario'], result['operation']))
+        if ratios:
+            line += ' {:>9} {:>9}'.format(*[_format_ratio(ratio) for ratio in ratios])
+        print(line, file=out)
+
+    memory = report.get('memory')
+    if memory:
+        line = 'memory: {:.0f} bytes per light, {:.0f} of them for the object and {:.0f} for its state'.format(
+            memory['bytes_per_device'], memory.get('object_bytes_per_device', 0), memory['state_bytes_per_device']
+        )
+        baseline_memory = (baseline or {}).get('memory')
+        if baseline_memory:
+            line += ' ({} vs baseline)'.format(_format_ratio(memory['bytes_per_device'] / baseline_memory['bytes_per_device']))
+        print(line, file=out)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks huegely against the bridge emulator.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Scenario to run (default: all).')
+    parser.add_argument('--iterations', type=int, default=100, help='Runs per operation.')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds every emulated request takes.')
+    parser.add_argument('--jitter', type=float, default=0, help='Maximum random deviation from the latency, in seconds.')
+    parser.add_argument('--lights', type=int, default=10, help='Number of emulated lights.')
+    parser.add_argument('--workers', type=int, help='Threads used by the concurrent scenario.')
+    parser.add_argument('--output', help='File to save the results to, as JSON.')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with.')
+    options = parser.parse_args(args)
+
+    report = run(
+        scenarios=options.scenario or SCENARIOS, iterations=options.iterations, latency=options.latency,
+        jitter=options.jitter, lights=options.lights, workers=options.workers,
+    )
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,45 @@
-from requests import request
+import threading
+import weakref
+
+from collections import (
+    defaultdict,
+    namedtuple,
+)
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import Session
+from requests.adapters import HTTPAdapter
 
 from huegely import (
+    batch,
     exceptions,
     groups,
+    instrumentation,
+    membership,
+    registry,
+    scheduler,
     utils,
+    watch,
 )
 from huegely.lights import LIGHT_TYPES
-from huegely.sensors import SENSOR_TYPES
+from huegely.sensors import (
+    SENSOR_TYPES,
+    state_fingerprint,
+)
+
+
+# All devices of a bridge, as returned by Bridge.snapshot()
+Snapshot = namedtuple('Snapshot', ['name', 'lights', 'groups', 'sensors'])
 
 
 class Bridge(object):
-    def __init__(self, ip, username=None, transition_time=None):
+    # Device classes used when building devices from API data. AsyncBridge swaps these for the async versions.
+    _light_types = LIGHT_TYPES
+    _sensor_types = SENSOR_TYPES
+    _group_types = groups.GROUP_TYPES
+
+    def __init__(self, ip, username=None, transition_time=None, pool_size=10, prewarm=False, timeout=10, cache_ttl=None,
+                 rate_limit=False):
         self.ip = ip
         self.username = username
         self.base_url = 'http://{}/api/{}/'.format(ip, username)
@@ -18,6 +47,94 @@ class Bridge(object):
         # Global transition time. If set, this is applied to all actions on this bridge.
         self.transition_time = transition_time
 
+        # Global cache policy: maximum age in seconds of cached device state used by getters, None to disable caching.
+        # Like transition_time, this can be overridden per device.
+        self.cache_ttl = cache_ttl
+
+        # Every bridge keeps its own pool of keep-alive connections, so consecutive commands don't have to
+        # open a new TCP connection each. The bridge's http stack is tiny, so the pool shouldn't be too big.
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = self._create_session()
+
+        # Sensors known to sync_sensors(), by device id: (sensor or None if unsupported, fingerprint)
+        self._synced_sensors = {}
+
+        # Which lights are in which groups, see membership()
+        self._membership = membership.MembershipIndex()
+
+        # Devices by id and name, see light(), light_by_name() etc.
+        self._registry = registry.DeviceRegistry()
+
+        # Identity map of the devices built from API responses, by (url prefix, device id), see _get_device().
+        # Weak, so devices nobody uses anymore can still be collected.
+        self._devices = weakref.WeakValueDictionary()
+
+        # Batches are per thread, see batch()
+        self._local = threading.local()
+
+        # Number of requests made to the bridge so far, useful for checking how many round trips an operation costs
+        self.request_count = 0
+
+        # Hooks called around every request, see add_instrument()
+        self.instruments = []
+
+        # Locks serializing operations on the same device when running them in parallel, see map()
+        self._lock = threading.Lock()
+        self._device_locks = defaultdict(threading.RLock)
+
+        # If set, commands are sent through the scheduler to stay within the bridge's rate limits, see CommandScheduler
+        self.scheduler = scheduler.CommandScheduler(self) if rate_limit else None
+
+        if prewarm:
+            self.warm_up()
+
+    def _create_session(self):
+        session = Session()
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+        return session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def current_batch(self):
+        """ The batch currently collecting updates in this thread, if any. """
+        return getattr(self._local, 'batch', None)
+
+    @current_batch.setter
+    def current_batch(self, value):
+        self._local.batch = value
+
+    def batch(self):
+        """ Returns a context manager collecting all state updates made inside it, which are then sent as a single
+            request per device. See ``huegely.batch.Batch``.
+        """
+        return batch.Batch(self)
+
+    def warm_up(self, connections=None):
+        """ Opens *connections* (defaults to the pool size) keep-alive connections to the bridge ahead of time,
+            so that the first commands don't pay for connection setup.
+
+            This uses the unauthenticated config endpoint, which is cheap for the bridge to answer.
+        """
+        connections = max(1, min(self.pool_size, connections or self.pool_size))
+        url = 'http://{}/api/config'.format(self.ip)
+
+        # Connections are only added to the pool if they are used at the same time, so fire the requests concurrently.
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for _ in range(connections):
+                executor.submit(self.session.request, 'GET', url, timeout=self.timeout)
+
+    def close(self):
+        """ Sends any queued commands and closes all pooled connections to the bridge. """
+        if self.scheduler is not None:
+            self.scheduler.close()
+        self.session.close()
+
     def get_token(self, app_identifier):
         """ Gets a new authorisation token. Use this token to initialize a bridge object.
 
@@ -43,11 +160,42 @@ class Bridge(object):
             Returns the unmodified api response.
 
             If any updates fail, a HueError is raised.
+
+            If the bridge has a scheduler, commands are queued and this blocks until the command has been sent.
+        """
+        if self.scheduler is not None and full_url is None and self.scheduler.handles(path, method):
+            return self.scheduler.submit(path, data)
+        return self._request(method, full_url or self.base_url + path, data)
+
+    def _request(self, method, url, data):
+        with self._lock:
+            self.request_count += 1
+
+        if not self.instruments:
+            response = self.session.request(method, url, json=data, timeout=self.timeout)
+            return self._process_response(method, data, response.json())
+
+        with instrumentation.record(self, method, url, data) as info:
+            response = self.session.request(method, url, json=data, timeout=self.timeout)
+            info.bytes_out = len(response.request.body or b'')
+            info.bytes_in = len(response.content)
+            info.response = self._process_response(method, data, response.json())
+        return info.response
+
+    def add_instrument(self, instrument):
+        """ Adds an instrument (see ``huegely.instrumentation.Instrument``), whose hooks are called around every request,
+            e.g. ``huegely.instrumentation.Metrics``. Returns the instrument.
         """
-        url = full_url or self.base_url + path
-        response = request(method, url, json=data, timeout=10)
-        response_data = response.json()
+        self.instruments.append(instrument)
+        return instrument
+
+    def remove_instrument(self, instrument):
+        self.instruments.remove(instrument)
 
+    def _process_response(self, method, data, response_data):
+        """ Turns the decoded json of an API response into the return value of ``make_request``,
+            raising a HueError if the request failed.
+        """
         if not response_data:
             raise exceptions.HueError(
                 'Something unexpected happened and the API returned nothing, not even an error. Data: {}'.format(data)
@@ -55,7 +203,7 @@ class Bridge(object):
 
         # Get requests generally return flat and directly usable data, unless an error occured.
         # If an error occurred on a get request, follow the usual POST/GET processing logic
-        if method == 'GET' and (type(response) != list or not any(['error' in result for result in response])):
+        if method == 'GET' and (type(response_data) != list or not any(['error' in result for result in response_data])):
             return response_data
 
         # POST/PUT API requests return lists of success/error responses and no helpful status codes.
@@ -88,58 +236,366 @@ class Bridge(object):
 
     def lights(self):
         """ Gets all light objects for this bridge, sorted by their device_id. """
-        data = self.make_request('lights')
+        return self._build_lights(self.make_request('lights'), complete=True)
 
-        found_lights = []
-        for device_id, light_data in data.items():
-            light_type = LIGHT_TYPES[light_data['type']]
-            found_lights.append(
-                light_type(
-                    bridge=self,
-                    device_id=int(device_id),
-                    name=light_data['name'],
-                    transition_time=self.transition_time
-                )
+    def groups(self):
+        """ Gets all group objects for this bridge, sorted by their device_id. """
+        return self._build_groups(self.make_request('groups'), complete=True)
+
+    def sensors(self):
+        return self._build_sensors(self.make_request('sensors'), complete=True)
+
+    def light(self, device_id, max_age=None):
+        """ Returns the light with *device_id*. Lights the bridge already knows (e.g. from ``lights()``, at most
+            *max_age* seconds ago if given) are returned without any requests, others are fetched with a single request
+            for just that light.
+        """
+        return self._device('lights', device_id, max_age)
+
+    def group(self, device_id, max_age=None):
+        """ Returns the group with *device_id*, see ``light()``. """
+        return self._device('groups', device_id, max_age)
+
+    def sensor(self, device_id, max_age=None):
+        """ Returns the sensor with *device_id*, see ``light()``. """
+        return self._device('sensors', device_id, max_age)
+
+    def light_by_name(self, name, max_age=None):
+        """ Returns the light called *name*. This doesn't make any requests if all lights are known (e.g. from
+            ``lights()``, at most *max_age* seconds ago if given), otherwise they are listed again first.
+            Raises a HueError if there is no such light, without listing the lights again if they were listed in the
+            last minute (or *max_age* seconds).
+        """
+        return self._device_by_name('lights', name, max_age, self.lights)
+
+    def group_by_name(self, name, max_age=None):
+        """ Returns the group called *name*, see ``light_by_name()``. """
+        return self._device_by_name('groups', name, max_age, self.groups)
+
+    def sensor_by_name(self, name, max_age=None):
+        """ Returns the sensor called *name*, see ``light_by_name()``. """
+        return self._device_by_name('sensors', name, max_age, self.sensors)
+
+    def _device(self, kind, device_id, max_age):
+        device_id = int(device_id)
+        device = self._registry.get(kind, device_id, max_age)
+        if device is None:
+            device = self._build_device(kind, device_id, self.make_request('{}/{}'.format(kind, device_id)))
+        return device
+
+    def _device_by_name(self, kind, name, max_age, list_devices):
+        device = self._registry.get_by_name(kind, name, max_age)
+        if device is None and not self._registry.is_missing(kind, name, max_age):
+            list_devices()
+            device = self._registry.get_by_name(kind, name)
+        return self._check_named_device(kind, name, device)
+
+    def _check_named_device(self, kind, name, device):
+        if device is None:
+            raise exceptions.HueError(
+                'There is no device called {} in {}'.format(name, kind), exceptions.RESOURCE_NOT_AVAILABLE
             )
+        return device
 
-        return sorted(found_lights, key=lambda l: l.device_id)
+    def _build_device(self, kind, device_id, data):
+        """ Builds the device of *kind* with *device_id* from its API *data* and adds it to the registry. """
+        if kind == 'lights':
+            device_type = self._light_types[data['type']]
+        elif kind == 'groups':
+            device_type = groups.get_group_type(data['action'], group_types=self._group_types)
+        elif data['type'] in self._sensor_types:
+            device_type = self._sensor_types[data['type']]
+        else:
+            raise exceptions.HueError('Sensor type {} not supported'.format(data['type']))
 
-    def groups(self):
-        """ Gets all group objects for this bridge, sorted by their device_id. """
-        data = self.make_request('groups')
+        device = self._get_device(device_type, int(device_id), data)
+        self._registry.update(kind, [device])
+        return device
 
-        found_groups = []
-        for device_id, group_data in data.items():
-            group_type = groups.get_group_type(group_data['action'])
-            found_groups.append(
-                group_type(
+    def sync_sensors(self):
+        """ Incrementally syncs all sensors and returns the ones that are new or changed since the last call.
+
+            Sensors whose last update time (and name) didn't change are skipped without decoding their state,
+            changed sensors are updated in place. The same sensor objects are returned across calls, and all of them
+            know their latest state (see ``state(max_age=...)``). ``synced_sensors()`` returns all of them.
+        """
+        return self._sync_sensors(self.make_request('sensors'))
+
+    def synced_sensors(self):
+        """ Returns all sensors known from the last ``sync_sensors()`` call, without making a request. """
+        return sorted(
+            [sensor for sensor, _ in self._synced_sensors.values() if sensor is not None], key=lambda s: s.device_id
+        )
+
+    def _sync_sensors(self, data):
+        changed_sensors = []
+        for device_id, sensor_data in data.items():
+            fingerprint = state_fingerprint(sensor_data)
+            synced = self._synced_sensors.get(device_id)
+            if synced is not None and synced[1] == fingerprint:
+                continue
+
+            if synced is None:
+                # Unsupported sensors are remembered as None, so they aren't looked at again
+                built_sensors = self._build_sensors({device_id: sensor_data})
+                sensor = built_sensors[0] if built_sensors else None
+            else:
+                sensor = synced[0]
+                if sensor is not None:
+                    sensor._process_device(sensor_data)
+
+            self._synced_sensors[device_id] = (sensor, fingerprint)
+            if sensor is not None:
+                changed_sensors.append(sensor)
+
+        for device_id in set(self._synced_sensors) - set(data):
+            del self._synced_sensors[device_id]
+
+        return sorted(changed_sensors, key=lambda s: s.device_id)
+
+    def snapshot(self):
+        """ Gets the bridge name and all light, group and sensor objects with a single request to the full datastore.
+
+            All devices know their state at the time of the snapshot, so reading it with ``device.state(max_age=...)``
+            doesn't cause any further requests.
+        """
+        return self._build_snapshot(self.make_request(''))
+
+    def membership(self, max_age=None):
+        """ Returns the index of which lights belong to which groups, see ``huegely.membership.MembershipIndex``.
+
+            The index is updated by every call to ``lights()``, ``groups()`` and ``snapshot()``. If it's incomplete,
+            or older than *max_age* seconds, it's refreshed with a single request to the full datastore.
+        """
+        age = self._membership.age()
+        if age is None or (max_age is not None and age > max_age):
+            self.snapshot()
+        return self._membership
+
+    def _device_lock(self, device):
+        """ Returns the lock for operations on *device*. Objects representing the same device share their lock. """
+        with self._lock:
+            return self._device_locks[device.device_url]
+
+    def map(self, devices, fn, max_workers=None):
+        """ Calls ``fn(device)`` for all *devices* in parallel and returns the results in the same order, e.g.::
+
+                bridge.map(bridge.lights(), lambda light: light.brightness(200))
+
+            At most *max_workers* (default: the connection pool size) calls run at the same time. Calls for the same
+            device never overlap, so device state like the remembered brightness for transition times stays consistent.
+            Note that batches are per thread, so calls made by *fn* aren't part of a batch opened around ``map``.
+
+            If any calls fail with a HueError, all other calls still complete, and a BulkHueError containing the errors
+            and the results of all successful calls is raised afterwards.
+        """
+        devices = list(devices)
+
+        def call(device):
+            with self._device_lock(device):
+                return fn(device)
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as executor:
+            futures = [executor.submit(call, device) for device in devices]
+
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append((future.result(), None))
+            except exceptions.HueError as e:
+                outcomes.append((None, e))
+        return self._collect_results(devices, outcomes)
+
+    def _collect_results(self, devices, outcomes):
+        """ Returns the results from a list of (result, HueError or None) *outcomes*, or raises a BulkHueError. """
+        errors = []
+        for device, (_, error) in zip(devices, outcomes):
+            if error is not None:
+                error.device = device
+                errors.append(error)
+
+        results = [result for result, _ in outcomes]
+        if errors:
+            raise exceptions.BulkHueError(errors, results)
+        return results
+
+    def set_many(self, lights, max_age=None, **state):
+        """ Applies the same *state* to all *lights*, using group commands where possible.
+
+            If the lights are exactly the lights of a group (including group 0, which contains all lights), a single
+            group command is sent. Otherwise, the lights are covered by as few groups as possible, and the remaining
+            lights get individual commands. Apart from saving requests, this makes the lights change at the same time.
+
+            Groups are planned from the membership index (see ``membership(max_age)``), which usually doesn't cost any
+            requests. Group 0 is fetched once, the first time all lights are targeted. Single lights are always
+            addressed directly.
+            The lights updated by a group command have their known state updated too (see ``state(max_age=...)``).
+            Returns a list of (device, response) tuples, one per request made.
+        """
+        lights_by_id = {light.device_id: light for light in lights}
+        plan = [(light, []) for light in lights_by_id.values()]
+        if len(lights_by_id) > 1:
+            index = self.membership(max_age=max_age)
+            all_lights_group = self.group(0) if self._targets_all_lights(lights_by_id, index) else None
+            plan = self._plan_set_many(lights_by_id, index, all_lights_group)
+
+        results = []
+        for device, members in plan:
+            response = device.state(**state)
+            self._update_members(members, state, response)
+            results.append((device, response))
+        return results
+
+    def _targets_all_lights(self, lights_by_id, index):
+        """ Returns True if ``set_many`` needs group 0 for the lights in *lights_by_id*: they are all lights of the
+            bridge, and no other group has exactly these lights.
+        """
+        light_ids = set(lights_by_id)
+        if light_ids != set(index.light_ids(0)):
+            return False
+        return all(set(group_light_ids) != light_ids for group_light_ids in index.group_lights().values())
+
+    def _plan_set_many(self, lights_by_id, index, all_lights_group=None):
+        """ Plans the requests of ``set_many`` from the membership *index*, with group 0 if *all_lights_group* is given.
+            Returns a list of (device, lights the device's command updates) tuples, the lights being empty for commands
+            sent to a light itself.
+        """
+        group_lights = {
+            group_id: set(light_ids) for group_id, light_ids in index.group_lights().items() if index.group(group_id)
+        }
+        group_objects = {group_id: index.group(group_id) for group_id in group_lights}
+        if all_lights_group is not None:
+            group_lights[0], group_objects[0] = set(lights_by_id), all_lights_group
+
+        group_ids, light_ids = groups.plan_group_commands(lights_by_id, group_lights)
+
+        plan = [
+            (group_objects[group_id], [lights_by_id[light_id] for light_id in sorted(group_lights[group_id])])
+            for group_id in group_ids
+        ]
+        return plan + [(lights_by_id[light_id], []) for light_id in light_ids]
+
+    def _update_members(self, lights, state, response):
+        """ Applies the *response* of a group command setting *state* to the known state of the group's *lights*.
+            Lights forget their state when the outcome for them isn't known: relative brightness changes depend on
+            each light's brightness, and commands inside a batch haven't been sent yet.
+        """
+        unknown = 'brighter' in state or 'darker' in state or isinstance(response, batch.BatchResult)
+        for light in lights:
+            if unknown:
+                light._invalidate_state()
+            else:
+                light._update_known_state(response)
+
+    def refresh(self, devices):
+        """ Gets the current state of all *devices* (any mix of lights, groups and sensors), with a single request
+            per device kind instead of one request per device.
+
+            Every device remembers its new state (see ``state(max_age=...)``). Returns the list of states,
+            in the same order as *devices*.
+        """
+        devices = list(devices)
+        prefixes = {device._device_url_prefix for device in devices}
+        return self._distribute_state(devices, {prefix: self.make_request(prefix) for prefix in prefixes})
+
+    def watch(self, **kwargs):
+        """ Returns an iterator polling the bridge in bulk and yielding a ``huegely.watch.ChangeEvent``
+            for every changed device attribute. See ``huegely.watch.Watcher`` for the available options.
+        """
+        return watch.Watcher(self, **kwargs)
+
+    def _distribute_state(self, devices, data):
+        """ Hands each device its part of the bulk responses in *data*, which maps url prefixes to responses. """
+        states = []
+        for device in devices:
+            device_data = data[device._device_url_prefix].get(str(device.device_id))
+            if device_data is None:
+                raise exceptions.HueError(
+                    'Device {} does not exist on the bridge'.format(device.device_url),
+                    exceptions.RESOURCE_NOT_AVAILABLE,
+                    device=device
+                )
+            states.append(device._process_device(device_data))
+        return states
+
+    def _get_device(self, device_type, device_id, data):
+        """ Returns the *device_type* object for *device_id*, with name and state (if included) from its API *data*.
+
+            Devices are only built once: as long as a device object is in use, it's updated in place and returned again,
+            so that per-device settings and state (like transition times and the brightness to reset to) are kept.
+            A new object is only built for new devices, or if the type of a device changed (e.g. lights in a group changed).
+        """
+        key = (device_type._device_url_prefix, device_id)
+        with self._lock:
+            device = self._devices.get(key)
+            if type(device) is not device_type:
+                device = device_type(
                     bridge=self,
-                    device_id=int(device_id),
-                    name=group_data['name'],
-                    transition_time=self.transition_time
+                    device_id=device_id,
+                    name=data['name'],
+                    transition_time=self.transition_time,
+                    state=data.get(device_type._state_attribute),
                 )
-            )
+                self._devices[key] = device
+            elif device_type._state_attribute in data:
+                device._process_device(data)
+            else:
+                # Devices known from somewhere other than the API (e.g. the inventory) don't come with a state
+                device._update_name(data['name'])
+        return device
 
-        return sorted(found_groups, key=lambda l: l.device_id)
+    def _build_snapshot(self, data):
+        return Snapshot(
+            name=data['config']['name'],
+            lights=self._build_lights(data['lights'], complete=True),
+            groups=self._build_groups(data['groups'], complete=True),
+            sensors=self._build_sensors(data['sensors'], complete=True),
+        )
 
-    def sensors(self):
-        data = self.make_request('sensors')
+    def _build_lights(self, data, complete=False):
+        """ Builds light objects from the response of the lights endpoint.
+            If *data* is *complete*, i.e. contains all lights of the bridge, the membership index is updated with them.
+        """
+        found_lights = []
+        for device_id, light_data in data.items():
+            light_type = self._light_types[light_data['type']]
+            found_lights.append(self._get_device(light_type, int(device_id), light_data))
+
+        found_lights = sorted(found_lights, key=lambda l: l.device_id)
+        if complete:
+            self._membership.update_lights(found_lights)
+        self._registry.update('lights', found_lights, complete=complete)
+        return found_lights
+
+    def _build_groups(self, data, complete=False):
+        """ Builds group objects from the response of the groups endpoint.
+            If *data* is *complete*, i.e. contains all groups of the bridge, the membership index is updated with them.
+        """
+        found_groups = []
+        for device_id, group_data in data.items():
+            group_type = groups.get_group_type(group_data['action'], group_types=self._group_types)
+            found_groups.append(self._get_device(group_type, int(device_id), group_data))
+
+        found_groups = sorted(found_groups, key=lambda l: l.device_id)
+        if complete:
+            self._membership.update_groups(data, found_groups)
+        self._registry.update('groups', found_groups, complete=complete)
+        return found_groups
 
+    def _build_sensors(self, data, complete=False):
+        """ Builds sensor objects from the response of the sensors endpoint, skipping unsupported sensor types.
+            If *data* is *complete*, i.e. contains all sensors of the bridge, they replace the ones in the registry.
+        """
         found_sensors = []
         for device_id, sensor_data in data.items():
             sensor_type = sensor_data['type']
-            if sensor_type not in SENSOR_TYPES:
+            if sensor_type not in self._sensor_types:
                 print("Sensor type {} not supported".format(sensor_type))
                 continue
 
-            sensor_type = SENSOR_TYPES[sensor_data['type']]
-            found_sensors.append(
-                sensor_type(
-                    bridge=self,
-                    device_id=int(device_id),
-                    name=sensor_data['name'],
-                    state=sensor_data['state']
-                )
-            )
+            sensor_type = self._sensor_types[sensor_data['type']]
+            found_sensors.append(self._get_device(sensor_type, int(device_id), sensor_data))
 
-        return sorted(found_sensors, key=lambda l: l.device_id)
+        found_sensors = sorted(found_sensors, key=lambda l: l.device_id)
+        self._registry.update('sensors', found_sensors, complete=complete)
+        return found_sensors
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from huegely import exceptions
+
+
+class BridgeCluster(object):
+    """ Manages several bridges as one. Discovery, snapshots and commands run on all bridges concurrently,
+        so they take about as long as the slowest bridge instead of the sum of all of them.
+
+        *bridges* is either a dictionary of keys (any name you like) to bridges, or a list of bridges,
+        which are then keyed by ``(ip, username)``. Devices are keyed by ``(bridge key, device_id)``::
+
+            cluster = BridgeCluster([Bridge(ip_1, token_1), Bridge(ip_2, token_2)])
+            lights = cluster.lights()
+            lights[((ip_2, token_2), 3)].on()
+            cluster.set_many(lights.values(), on=False)
+
+        If the operation fails with a HueError on some bridges, it still completes on all others, and a BulkHueError
+        containing the errors and the results of all bridges (by bridge key, None for failed bridges) is raised.
+    """
+    def __init__(self, bridges):
+        if not isinstance(bridges, dict):
+            bridges = OrderedDict(((bridge.ip, bridge.username), bridge) for bridge in bridges)
+        self.bridges = OrderedDict(bridges)
+        self._keys = {id(bridge): key for key, bridge in self.bridges.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Closes all bridges. """
+        self._fan_out(lambda bridge: bridge.close())
+
+    def key(self, device):
+        """ Returns the ``(bridge key, device_id)`` key of *device*. """
+        return self._keys[id(device.bridge)], device.device_id
+
+    def _fan_out(self, fn, bridges=None):
+        """ Calls ``fn(bridge)`` for all *bridges* (default: all bridges of the cluster) concurrently.
+            Returns a dictionary of bridge keys to results, or raises a BulkHueError once all calls have finished.
+        """
+        bridges = self.bridges if bridges is None else bridges
+        if not bridges:
+            return OrderedDict()
+
+        with ThreadPoolExecutor(max_workers=len(bridges)) as executor:
+            futures = OrderedDict((key, executor.submit(fn, bridge)) for key, bridge in bridges.items())
+
+        results = OrderedDict()
+        errors = []
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except exceptions.HueError as e:
+                # Errors of a single device keep it, others are attributed to the bridge
+                e.device = e.device or bridges[key]
+                results[key] = None
+                errors.append(e)
+
+        if errors:
+            raise exceptions.BulkHueError(errors, results)
+        return results
+
+    def _devices(self, results):
+        return OrderedDict(
+            ((key, device.device_id), device) for key, devices in results.items() for device in devices
+        )
+
+    def lights(self):
+        """ Gets the lights of all bridges, as an ordered dictionary keyed by ``(bridge key, device_id)``. """
+        return self._devices(self._fan_out(lambda bridge: bridge.lights()))
+
+    def groups(self):
+        """ Gets the groups of all bridges, as an ordered dictionary keyed by ``(bridge key, device_id)``. """
+        return self._devices(self._fan_out(lambda bridge: bridge.groups()))
+
+    def sensors(self):
+        """ Gets the sensors of all bridges, as an ordered dictionary keyed by ``(bridge key, device_id)``. """
+        return self._devices(self._fan_out(lambda bridge: bridge.sensors()))
+
+    def snapshot(self):
+        """ Gets a snapshot (see ``Bridge.snapshot``) of every bridge, as a dictionary keyed by bridge key. """
+        return self._fan_out(lambda bridge: bridge.snapshot())
+
+    def _split(self, devices):
+        """ Splits *devices* by bridge. Returns a dictionary of bridge keys to lists of (position, device). """
+        devices_by_bridge = OrderedDict()
+        for position, device in enumerate(devices):
+            devices_by_bridge.setdefault(self._keys[id(device.bridge)], []).append((position, device))
+        return devices_by_bridge
+
+    def map(self, devices, fn, max_workers=None):
+        """ Calls ``fn(device)`` for all *devices* in parallel, on all bridges at the same time, see ``Bridge.map``.
+            Returns the results in the same order as *devices*, or raises a BulkHueError with the errors of all bridges.
+        """
+        devices = list(devices)
+        devices_by_bridge = self._split(devices)
+
+        def run(bridge):
+            bridge_devices = [device for _, device in devices_by_bridge[self._keys[id(bridge)]]]
+            try:
+                return bridge.map(bridge_devices, fn, max_workers=max_workers), []
+            except exceptions.BulkHueError as e:
+                return e.results, e.errors
+
+        bridges = OrderedDict((key, self.bridges[key]) for key in devices_by_bridge)
+        results = [None] * len(devices)
+        errors = []
+        for key, (bridge_results, bridge_errors) in self._fan_out(run, bridges).items():
+            for (position, _), result in zip(devices_by_bridge[key], bridge_results):
+                results[position] = result
+            errors += bridge_errors
+
+        if errors:
+            raise exceptions.BulkHueError(errors, results)
+        return results
+
+    def set_many(self, lights, **state):
+        """ Applies the same *state* to all *lights*, on all bridges at the same time, see ``Bridge.set_many``.
+            Returns a list of (device, response) tuples, one per request made.
+        """
+        lights_by_bridge = self._split(lights)
+        bridges = OrderedDict((key, self.bridges[key]) for key in lights_by_bridge)
+
+        responses = self._fan_out(
+            lambda bridge: bridge.set_many([light for _, light in lights_by_bridge[self._keys[id(bridge)]]], **state),
+            bridges
+        )
+        return [response for bridge_responses in responses.values() for response in bridge_responses]
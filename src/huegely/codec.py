@@ -0,0 +1,63 @@
+from types import MappingProxyType
+
+from huegely import constants
+
+
+def encode_transition_time(transition_time):
+    """ Converts a huegely transition time to the hue API's unit. """
+    return round(transition_time / 10.0)
+
+
+def encode_coordinates(coordinates):
+    """ Converts color coordinates, e.g. an (x, y) tuple, to the list the hue API expects. """
+    return [coordinates[0], coordinates[1]]
+
+
+class Codec(object):
+    """ Translates state between huegely and hue API names (and values), e.g. ``{'brightness': 100}`` to
+        ``{'bri': 100}`` and back. Attributes without a mapping keep their name.
+
+        Codecs are compiled once from the name mapping and value encoders they're created with, and never change
+        afterwards, so they can be shared between devices and threads. *encoders* map huegely names to functions
+        converting values before they are sent. Values received from the bridge are only renamed, e.g. coordinates
+        stay lists.
+    """
+    __slots__ = ('_to_hue', '_to_huegely', '_encoders')
+
+    def __init__(self, names=constants.HUEGELY_TO_HUE_MAPPING, encoders=None):
+        self._to_hue = dict(names)
+        self._to_huegely = {hue_name: name for name, hue_name in self._to_hue.items()}
+        self._encoders = dict(encoders or {})
+
+    @property
+    def names(self):
+        """ Read-only mapping of huegely names to hue API names. """
+        return MappingProxyType(self._to_hue)
+
+    def encode(self, state):
+        """ Returns huegely-named *state* with hue API names and values. """
+        to_hue = self._to_hue
+        encoders = self._encoders
+        if not encoders:
+            return {to_hue.get(key, key): value for key, value in state.items()}
+
+        encoded = {}
+        for key, value in state.items():
+            encoder = encoders.get(key)
+            encoded[to_hue.get(key, key)] = value if encoder is None else encoder(value)
+        return encoded
+
+    def decode(self, state):
+        """ Returns hue-named *state* with huegely names. """
+        to_huegely = self._to_huegely
+        return {to_huegely.get(key, key): value for key, value in state.items()}
+
+
+# Only renames attributes, see ``utils.huegely_to_hue_names``
+NAMES = Codec()
+
+# Used by devices to translate their state, see ``FeatureBase._codec``
+STATE = Codec(encoders={
+    'transition_time': encode_transition_time,
+    'coordinates': encode_coordinates,
+})
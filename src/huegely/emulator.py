@@ -0,0 +1,454 @@
+""" A local emulator of the hue bridge API, for trying out huegely and measuring its performance without hardware.
+
+Start it from the command line::
+
+    python -m huegely.emulator --port 8000 --latency 0.05 --jitter 0.02
+
+and connect to it like to a real bridge, with the username 'token'::
+
+    bridge = Bridge('127.0.0.1:8000', 'token')
+
+Or run it in a background thread, e.g. in tests::
+
+    with BridgeEmulator(latency=0.05) as emulator:
+        bridge = Bridge(emulator.ip, emulator.username)
+"""
+import argparse
+import copy
+import json
+import random
+import threading
+import time
+
+from collections import Counter
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+from huegely import (
+    exceptions,
+    fake_data,
+    scheduler,
+)
+
+
+# Hue API error types used by the emulator, in addition to the ones in huegely.exceptions
+UNAUTHORIZED_USER = 1
+INVALID_JSON = 2
+METHOD_NOT_AVAILABLE = 4
+PARAMETER_NOT_AVAILABLE = 6
+INVALID_VALUE = 7
+INTERNAL_ERROR = 901
+
+# Attributes which can be changed with a state (lights) or action (groups) update, with their valid ranges
+STATE_ATTRIBUTES = {
+    'on': None,
+    'bri': (1, 254),
+    'hue': (0, 65535),
+    'sat': (0, 254),
+    'ct': (153, 500),
+    'xy': None,
+    'alert': None,
+    'effect': None,
+    'transitiontime': (0, 65535),
+    'bri_inc': (-254, 254),
+}
+
+# Attributes that can be sent to a device which is switched off without causing an error 201
+OFF_ATTRIBUTES = {'on', 'transitiontime', 'alert'}
+
+# Updating these attributes changes the color mode of a light
+COLOR_MODES = {
+    'hue': 'hs',
+    'sat': 'hs',
+    'xy': 'xy',
+    'ct': 'ct',
+}
+
+# Parts of the configuration that can be read without a username
+PUBLIC_CONFIG = ['name', 'datastoreversion', 'swversion', 'apiversion', 'mac', 'bridgeid', 'factorynew',
+                 'replacesbridgeid', 'modelid']
+
+
+def _error(error_type, address, description):
+    return {'error': {'type': error_type, 'address': address, 'description': description}}
+
+
+def _success(address, value):
+    return {'success': {address: value}}
+
+
+class EmulatedBridge(object):
+    """ The state and API semantics of an emulated bridge, without the HTTP part. See BridgeEmulator.
+
+        *datastore* is the full state of the bridge as returned by the API for ``GET /api/<username>``,
+        by default a copy of ``huegely.fake_data.BRIDGE_FULL_STATE``.
+
+        Every request takes *latency* seconds, give or take up to *jitter* seconds.
+
+        *rate_limits* is a dictionary of commands (PUT requests) per second per resource, e.g.
+        ``{'lights': 10, 'groups': 1}``, with bursts of up to *burst* commands. Commands exceeding the limits are
+        delayed until they are allowed if *overload* is 'delay', the way the bridge queues commands,
+        or rejected with an internal error (type 901) if *overload* is 'drop'.
+    """
+    def __init__(self, datastore=None, latency=0, jitter=0, rate_limits=None, burst=1, overload='delay'):
+        if overload not in ('delay', 'drop'):
+            raise ValueError("overload must be 'delay' or 'drop', not {!r}".format(overload))
+
+        self.datastore = copy.deepcopy(datastore if datastore is not None else fake_data.BRIDGE_FULL_STATE)
+        self.latency = latency
+        self.jitter = jitter
+        self.overload = overload
+        self.rate_limits = dict(rate_limits or {})
+        self._buckets = {
+            resource: scheduler.TokenBucket(rate, burst) for resource, rate in self.rate_limits.items()
+        }
+
+        self._lock = threading.Lock()
+        self._link_button_pressed = False
+
+        # Counts of requests by method and resource, plus 'dropped' and 'errors'. See stats().
+        self._stats = Counter()
+
+    @property
+    def usernames(self):
+        return set(self.datastore['config'].get('whitelist', {}))
+
+    def press_link_button(self):
+        """ Allows the next request to create a new user to succeed, like pressing the button on a real bridge. """
+        self._link_button_pressed = True
+
+    def stats(self):
+        """ Returns the number of requests handled per method and per '<method> <resource>',
+            how many commands were dropped because of the rate limits and how many requests failed.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    def _wait(self):
+        delay = self.latency + random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle(self, method, path, body=None):
+        """ Handles an API request to *path* (e.g. '/api/token/lights'), with the decoded json *body*.
+            Returns the data to respond with.
+        """
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] != 'api':
+            return [_error(exceptions.RESOURCE_NOT_AVAILABLE, path, 'resource, {}, not available'.format(path))]
+        parts = parts[1:]
+
+        resource = parts[1] if len(parts) > 1 else ''
+        self._count(method, '{} {}'.format(method, resource))
+
+        self._wait()
+        if method == 'PUT' and resource in self._buckets:
+            if self.overload == 'drop':
+                if not self._buckets[resource].try_acquire():
+                    self._count('dropped')
+                    return [_error(INTERNAL_ERROR, path, 'Internal error, 503')]
+            else:
+                self._buckets[resource].acquire()
+
+        with self._lock:
+            response = self._dispatch(method, parts, body)
+
+        if isinstance(response, list) and any('error' in result for result in response):
+            self._count('errors')
+        return response
+
+    def _dispatch(self, method, parts, body):
+        address = '/' + '/'.join(parts[1:])
+
+        # Creating users and reading the public part of the configuration doesn't require a username
+        if not parts:
+            if method != 'POST':
+                return [_error(METHOD_NOT_AVAILABLE, '/', 'method, {}, not available for resource, /'.format(method))]
+            return self._create_user(body)
+        if parts == ['config'] and method == 'GET':
+            config = self.datastore['config']
+            return {key: config[key] for key in PUBLIC_CONFIG if key in config}
+
+        if parts[0] not in self.usernames:
+            return [_error(UNAUTHORIZED_USER, address, 'unauthorized user')]
+        parts = parts[1:]
+
+        if method == 'GET':
+            return self._get(parts, address)
+        if method == 'PUT':
+            if not isinstance(body, dict):
+                return [_error(INVALID_JSON, address, 'body contains invalid json')]
+            return self._put(parts, address, body)
+
+        return [_error(METHOD_NOT_AVAILABLE, address, 'method, {}, not available for resource, {}'.format(method, address))]
+
+    def _create_user(self, body):
+        if not self._link_button_pressed:
+            return [_error(exceptions.LINK_BUTTON_NOT_PRESSED, '', 'link button not pressed')]
+        self._link_button_pressed = False
+
+        username = 'user{}'.format(len(self.usernames) + 1)
+        self.datastore['config'].setdefault('whitelist', {})[username] = {
+            'name': (body or {}).get('devicetype', ''),
+        }
+        return [{'success': {'username': username}}]
+
+    def _group_zero(self):
+        """ The special group 0, which contains all lights. """
+        lights = sorted(self.datastore['lights'], key=int)
+        any_on = any(self.datastore['lights'][light_id]['state']['on'] for light_id in lights)
+        return {
+            'name': 'Group 0',
+            'lights': lights,
+            'type': 'LightGroup',
+            'action': dict(self.datastore['groups'].get('0', {}).get('action', {'on': any_on})),
+        }
+
+    def _find(self, parts):
+        """ Returns the data at *parts* of the datastore, or None if it doesn't exist. """
+        if parts[:2] == ['groups', '0']:
+            data, parts = self._group_zero(), parts[2:]
+        else:
+            data = self.datastore
+
+        for part in parts:
+            if not isinstance(data, dict) or part not in data:
+                return None
+            data = data[part]
+        return data
+
+    def _get(self, parts, address):
+        if not parts:
+            return self.datastore
+
+        data = self._find(parts)
+        if data is None:
+            return [_error(exceptions.RESOURCE_NOT_AVAILABLE, address, 'resource, {}, not available'.format(address))]
+        return data
+
+    def _put(self, parts, address, body):
+        if parts == ['config'] or (len(parts) == 2 and parts[0] in ('lights', 'groups', 'sensors')):
+            return self._put_attributes(parts, address, body)
+        if len(parts) == 3 and (parts[0], parts[2]) in (('lights', 'state'), ('groups', 'action')):
+            return self._put_state(parts, address, body)
+        if len(parts) == 3 and parts[0] == 'sensors' and parts[2] in ('config', 'state'):
+            return self._put_attributes(parts, address, body)
+
+        return [_error(METHOD_NOT_AVAILABLE, address, 'method, PUT, not available for resource, {}'.format(address))]
+
+    def _put_attributes(self, parts, address, body):
+        """ Updates existing attributes, e.g. names or sensor configuration. """
+        data = self._find(parts)
+        if data is None:
+            return [_error(exceptions.RESOURCE_NOT_AVAILABLE, address, 'resource, {}, not available'.format(address))]
+
+        response = []
+        for key, value in body.items():
+            if key not in data or isinstance(data[key], dict):
+                response.append(_error(
+                    PARAMETER_NOT_AVAILABLE, '{}/{}'.format(address, key), 'parameter, {}, not available'.format(key)
+                ))
+                continue
+            data[key] = value
+            response.append(_success('{}/{}'.format(address, key), value))
+        return response
+
+    def _put_state(self, parts, address, body):
+        resource, device_id = parts[0], parts[1]
+        if resource == 'groups' and device_id == '0':
+            device = self._group_zero()
+        else:
+            device = self.datastore[resource].get(device_id)
+        if device is None:
+            address = '/{}/{}'.format(resource, device_id)
+            return [_error(exceptions.RESOURCE_NOT_AVAILABLE, address, 'resource, {}, not available'.format(address))]
+
+        if resource == 'groups':
+            all_lights = self.datastore['lights']
+            lights = [all_lights[light_id] for light_id in device['lights'] if light_id in all_lights]
+            is_on = any(light['state']['on'] for light in lights)
+        else:
+            lights = [device]
+            is_on = device['state']['on']
+
+        response = []
+        applied = {}
+        for key, value in body.items():
+            error = self._check_state_attribute(key, value, is_on or body.get('on') is True)
+            if error is not None:
+                response.append(_error(error[0], '{}/{}'.format(address, key), error[1]))
+                continue
+
+            applied[key] = value
+            response.append(_success('{}/{}'.format(address, key), value))
+
+        for light in lights:
+            self._apply_state(light['state'], applied)
+
+        if resource == 'groups':
+            self._apply_state(device['action'], applied)
+        else:
+            # Lights respond with the new brightness for brightness steps, groups respond with the step itself
+            for result in response:
+                value = result.get('success', {}).pop(address + '/bri_inc', None)
+                if value is not None:
+                    result['success'][address + '/bri'] = device['state']['bri']
+
+        return response
+
+    def _check_state_attribute(self, key, value, is_on):
+        """ Returns the error type and description for an invalid update of *key* to *value*, None if it's valid. """
+        if key not in STATE_ATTRIBUTES:
+            return PARAMETER_NOT_AVAILABLE, 'parameter, {}, not available'.format(key)
+
+        value_range = STATE_ATTRIBUTES[key]
+        if value_range is not None and (not isinstance(value, int) or not value_range[0] <= value <= value_range[1]):
+            return INVALID_VALUE, 'invalid value, {}, for parameter, {}'.format(value, key)
+
+        if key not in OFF_ATTRIBUTES and not is_on:
+            return exceptions.CANNOT_MODIFY_WHILE_OFF, 'parameter, {}, is not modifiable. Device is set to off.'.format(key)
+
+        return None
+
+    def _apply_state(self, state, applied):
+        for key, value in applied.items():
+            if key == 'transitiontime':
+                continue
+            if key == 'bri_inc':
+                state['bri'] = max(1, min(254, state.get('bri', 254) + value))
+                continue
+
+            state[key] = value
+            if key in COLOR_MODES and 'colormode' in state:
+                state['colormode'] = COLOR_MODES[key]
+
+
+class BridgeEmulator(object):
+    """ Serves an EmulatedBridge over HTTP on *host*:*port* (by default a free port on localhost),
+        from a background thread. Keyword arguments are passed to EmulatedBridge.
+
+        Use ``ip`` and ``username`` to connect huegely to it::
+
+            with BridgeEmulator(latency=0.05, rate_limits={'lights': 10, 'groups': 1}) as emulator:
+                bridge = Bridge(emulator.ip, emulator.username)
+                ...
+                print(emulator.bridge.stats())
+    """
+    def __init__(self, host='127.0.0.1', port=0, **kwargs):
+        self.bridge = EmulatedBridge(**kwargs)
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self.bridge))
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def ip(self):
+        """ The address to pass to Bridge, e.g. '127.0.0.1:8000'. """
+        host, port = self.server.server_address[:2]
+        return '{}:{}'.format(host, port)
+
+    @property
+    def username(self):
+        """ A username accepted by the emulator. """
+        return sorted(self.bridge.usernames)[0]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """ Starts serving requests in a background thread. """
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stops serving requests and closes the socket. """
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
+
+
+def _make_handler(bridge):
+    class RequestHandler(BaseHTTPRequestHandler):
+        # Keep connections alive, like the real bridge does. Without TCP_NODELAY, headers and body being written
+        # separately would add tens of milliseconds to every response, hiding the emulated latency.
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _handle(self):
+            body = None
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                try:
+                    body = json.loads(self.rfile.read(length).decode('utf-8'))
+                except ValueError:
+                    body = ValueError
+
+            if body is ValueError:
+                response = [_error(INVALID_JSON, self.path, 'body contains invalid json')]
+            else:
+                response = bridge.handle(self.command, self.path, body)
+
+            content = json.dumps(response).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return RequestHandler
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Runs an emulated hue bridge.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds every request takes.')
+    parser.add_argument('--jitter', type=float, default=0, help='Maximum random deviation from the latency, in seconds.')
+    parser.add_argument('--light-rate', type=float, help='Maximum light commands per second.')
+    parser.add_argument('--group-rate', type=float, help='Maximum group commands per second.')
+    parser.add_argument('--overload', choices=['delay', 'drop'], default='delay',
+                        help='What to do with commands exceeding the rate limits.')
+    options = parser.parse_args(args)
+
+    rate_limits = {}
+    if options.light_rate:
+        rate_limits['lights'] = options.light_rate
+    if options.group_rate:
+        rate_limits['groups'] = options.group_rate
+
+    emulator = BridgeEmulator(
+        options.host, options.port, latency=options.latency, jitter=options.jitter, rate_limits=rate_limits,
+        overload=options.overload,
+    )
+    print('Emulating a hue bridge on {}, username {}'.format(emulator.ip, emulator.username))
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
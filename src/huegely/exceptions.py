@@ -1,3 +1,4 @@
+RESOURCE_NOT_AVAILABLE = 3
 LINK_BUTTON_NOT_PRESSED = 101
 CANNOT_MODIFY_WHILE_OFF = 201
 
@@ -11,3 +12,19 @@ class HueError(Exception):
         self.device = device
 
         super(HueError, self).__init__(message, *args)
+
+
+class BulkHueError(HueError):
+    """ Raised by operations on many devices (like ``bridge.map``) if the operation failed for some of them.
+
+        *errors* contains the HueError of each failed device (with its ``device`` set), *results* contains
+        the results for all devices in order, with None for failed devices. For ``BridgeCluster``, *results* is a
+        dictionary of bridge keys to results, and errors that aren't about a single device have the bridge as ``device``.
+    """
+    def __init__(self, errors, results):
+        self.errors = errors
+        self.results = results
+
+        super(BulkHueError, self).__init__(
+            '{} of {} operations failed: {}'.format(len(errors), len(results), '; '.join(str(error) for error in errors))
+        )
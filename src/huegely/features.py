@@ -1,24 +1,55 @@
+from datetime import (
+    datetime,
+    timedelta,
+)
+
 from huegely import (
+    batch,
+    codec,
     exceptions,
-    utils
+    state as device_state,
 )
 
 
 class FeatureBase(object):
-    """ Base interface for all features, mostly concerned with device state. """
-    transition_time = None
-    _reset_brightness_to = None
+    """ Base interface for all features, mostly concerned with device state.
+
+        Devices use ``__slots__`` to keep their memory footprint small, so every subclass (features and device types
+        alike) needs to declare ``__slots__``, usually empty. ``__weakref__`` allows bridges to track their devices.
+    """
+    __slots__ = (
+        'bridge', 'device_id', '_name', '_transition_time', '_cache_ttl', '_state', '_state_set_at',
+        '_reset_brightness_to', '__weakref__',
+    )
 
-    def __init__(self, bridge, device_id, name=None, transition_time=None):
+    # Translates state between huegely and hue API names and values
+    _codec = codec.STATE
+
+    # Class the state is stored in, extended with the _state_fields of each feature (see ``state.state_type``)
+    _state_type = device_state.DeviceState
+    _state_fields = ()
+
+    def __init__(self, bridge, device_id, name=None, transition_time=None, state=None, cache_ttl=None):
         if not (hasattr(self, '_device_url_prefix') and hasattr(self, '_state_attribute')):
             raise Exception("Classes using FeatureBase need to define _device_url_prefix and _state_attribute")
 
         self.bridge = bridge
         self.device_id = device_id
-        self.device_url = '{}/{}'.format(self._device_url_prefix, device_id)
 
         self._name = name
         self.transition_time = transition_time
+        self.cache_ttl = cache_ttl
+
+        # Last known state of the device (using huegely names) and when it was received, see ``state(max_age=...)``
+        self._state = None
+        self._state_set_at = None
+
+        # Brightness to re-apply when turning the device on, see ``Dimmer._handle_transition_times``
+        self._reset_brightness_to = None
+
+        # Devices built from bulk API responses get their state for free, *state* uses the hue API naming
+        if state is not None:
+            self._store_state(self._codec.decode(state))
 
     def __repr__(self):
         return "{} {} (id: {})".format(
@@ -30,6 +61,11 @@ class FeatureBase(object):
     def __str__(self):
         return self._name or "(unknown name)"
 
+    @property
+    def device_url(self):
+        """ Path of the device in the API, e.g. 'lights/1'. Built when needed rather than stored with every device. """
+        return '{}/{}'.format(self._device_url_prefix, self.device_id)
+
     @property
     def transition_time(self):
         return self._transition_time if self._transition_time is not None else self.bridge.transition_time
@@ -38,63 +74,199 @@ class FeatureBase(object):
     def transition_time(self, value):
         self._transition_time = value
 
-    def _handle_transition_times(self, state):
+    @property
+    def cache_ttl(self):
+        """ Maximum age (in seconds) of cached state returned by getters, defaults to the bridge's cache_ttl. """
+        return self._cache_ttl if self._cache_ttl is not None else self.bridge.cache_ttl
+
+    @cache_ttl.setter
+    def cache_ttl(self, value):
+        self._cache_ttl = value
+
+    def _handle_transition_times(self, state, current_state=None):
         """ Applies globally set transition times and deals with a bug in the hue api that causes lights
             to turn on with brightness 1 when turned off with a transition time.
+
+            Returns the new state and the bookkeeping to do once it has been sent, see ``_apply_bookkeeping``.
         """
         transition = state.get('transition_time', self.transition_time)
         if transition is not None:
-            state['transition_time'] = round(transition / 10.0)
-        return state
+            state['transition_time'] = transition
+        return state, {}
 
-    def _set_state(self, **state):
+    def _apply_bookkeeping(self, bookkeeping):
+        """ Sets the device attributes in *bookkeeping*, once the update that needed them has been sent.
+            Doing this before would leave e.g. a remembered brightness behind when a batch is cancelled.
+        """
+        for attribute, value in (bookkeeping or {}).items():
+            setattr(self, attribute, value)
+
+    def _needs_current_state(self, state):
+        """ Returns True if the current device state is needed to prepare the update to *state*. """
+        return False
+
+    def _prepare_state(self, state, current_state=None):
+        """ Turns huegely-named *state* into the url and hue-named data of the request updating it,
+            and the bookkeeping to apply once it has been sent.
+            This does no I/O, so it can be shared between the sync and async devices.
+        """
         url = '{}/{}'.format(self.device_url, self._state_attribute)
 
         # Remove any Nones from state
         state = {key: value for key, value in state.items() if value is not None}
 
-        state = self._handle_transition_times(state)
+        state, bookkeeping = self._handle_transition_times(state, current_state)
 
         # Convert huegely-named state attributes to hue api naming scheme
-        state = utils.huegely_to_hue_names(state)
-
-        response = self.bridge.make_request(url, method='PUT', **state)
-
-        # Convert hue api names back to huegely names
-        return utils.hue_to_huegely_names(response)
-
-    def _get_state(self):
-        response = self.bridge.make_request(self.device_url)
+        return url, self._codec.encode(state), bookkeeping
 
+    def _process_device(self, response):
+        """ Processes the response of a device GET request and returns its huegely-named state. """
         # Whenever the state is received, store the name of the object, because we get it for free.
         # This could be done in the constructor, making the name always available,
         # but that would make initialisation extremely expensive.
-        self._name = response.get('name', None) or self._name
+        self._update_name(response.get('name', None))
 
         # Convert hue-named state attribute to huegely naming scheme
-        state = utils.hue_to_huegely_names(response[self._state_attribute])
+        return self._store_state(self._codec.decode(response[self._state_attribute])).as_dict()
+
+    def _store_state(self, state):
+        """ Remembers *state* as the last known state of the device, updating the stored state object in place. """
+        if self._state is None:
+            self._state = device_state.state_type(type(self))(state)
+        else:
+            self._state.assign(state)
+        self._state_set_at = datetime.now()
+        return self._state
+
+    def _tracked_state(self):
+        """ Returns a copy of the last known state regardless of its age, or None if it isn't known.
+            The state is kept up to date by all updates made through huegely, so this is good enough for
+            predicting the outcome of brighter/darker, where an extra request would double the latency.
+        """
+        return self._state.as_dict() if self._state is not None else None
+
+    def _is_off_error(self, error):
+        """ Returns True if *error* was caused by changing the device while it's off, which callers ignore. """
+        return error.error_code == exceptions.CANNOT_MODIFY_WHILE_OFF
+
+    def _handle_state_error(self, error):
+        """ Updates the cached state after a state update failed with *error*. Failing because the device is off
+            tells us just that, any other error leaves the device in an unknown state.
+        """
+        if self._is_off_error(error) and self._state is not None:
+            self._state['on'] = False
+        else:
+            self._invalidate_state()
+
+    def _invalidate_state(self):
+        """ Forgets the cached state, e.g. after a failed request left the device in an unknown state. """
+        self._state = None
+        self._state_set_at = None
+
+    def _is_state_fresh(self, max_age):
+        """ Returns True if the last known state is at most *max_age* seconds old. """
+        return self._state is not None and bool(max_age) and datetime.now() - self._state_set_at <= timedelta(seconds=max_age)
+
+    def _cached_state(self, max_age):
+        """ Returns a copy of the last known state if it is at most *max_age* seconds old, None otherwise. """
+        return self._state.as_dict() if self._is_state_fresh(max_age) else None
+
+    def _set_state(self, **state):
+        current_state = (self._cached_state(self.cache_ttl) or self._get_state()) if self._needs_current_state(state) else None
+        url, state, bookkeeping = self._prepare_state(state, current_state)
+
+        # Inside a batch, updates are only collected and sent when the batch ends
+        current_batch = self.bridge.current_batch
+        if current_batch is not None:
+            return current_batch.add(self, url, state, bookkeeping)
+
+        return self._send_state(url, state, bookkeeping)
 
+    def _send_state(self, url, state, bookkeeping=None):
+        """ Sends the hue-named *state* update to *url*. Returns the processed response using huegely names. """
+        try:
+            response = self.bridge.make_request(url, method='PUT', **state)
+        except exceptions.HueError as e:
+            self._handle_state_error(e)
+            raise
+
+        self._apply_bookkeeping(bookkeeping)
+        return self._process_state_response(response)
+
+    def _process_state_response(self, response):
+        """ Converts the processed response of a state update to huegely names and applies the updated values
+            to the cached state, so it stays valid.
+        """
+        # Convert hue api names back to huegely names
+        state = self._codec.decode(response)
+        self._update_known_state(state)
         return state
 
-    def state(self, **state):
+    def _update_known_state(self, state):
+        """ Applies the huegely-named *state* of a successful update to the cached state.
+            Only attributes that are part of the state are updated, e.g. not bri_inc or transition_time.
+        """
+        known_state = self._state
+        if known_state is not None:
+            for key, value in state.items():
+                if key in known_state:
+                    known_state[key] = value
+
+    def _get_state(self):
+        try:
+            response = self.bridge.make_request(self.device_url)
+        except exceptions.HueError:
+            self._invalidate_state()
+            raise
+
+        return self._process_device(response)
+
+    def state(self, max_age=None, **state):
         """ Gets or sets state attributes. Call this without any arguments to get the
             entire state as reported by the Hue bridge. Note that the state reported by groups
             is unreliable - the values mostly seem to have no relation to the real lights. It is sometimes necessary
             to get the state though, especially when using the brighter/darker commands.
 
+            When getting the state, *max_age* (in seconds) allows returning the last known state of the device without
+            making a request, as long as it isn't older than that. It defaults to the device's ``cache_ttl``, which in turn
+            defaults to the bridge's ``cache_ttl`` (no caching unless set). Devices created by the bridge, e.g. via
+            ``bridge.lights()`` or ``bridge.snapshot()``, already know their state. The cached state is kept up to date
+            with every successful update and dropped when a request fails.
+
             Pass in any amount of state attributes to update them, e.g. on=True, brighter=50.
 
             Returns a dictionary of successfully updated attributes in the format of ``{'brightness': 100, 'on': True}``
         """
-        return self._set_state(**state) if state else self._get_state()
+        if state:
+            return self._set_state(**state)
+
+        cached_state = self._cached_state(self.cache_ttl if max_age is None else max_age)
+        return cached_state if cached_state is not None else self._get_state()
+
+    def _state_value(self, attribute, max_age=None):
+        """ Returns a single state *attribute*, like ``state(max_age=max_age)[attribute]``, but without copying
+            the cached state.
+        """
+        if self._is_state_fresh(self.cache_ttl if max_age is None else max_age):
+            return self._state[attribute]
+        return self._get_state()[attribute]
 
     def _get_name(self):
         """ Returns the current name of the group """
-        return self.bridge.make_request(self.device_url)['name']
+        self._update_name(self.bridge.make_request(self.device_url)['name'])
+        return self._name
 
     def _set_name(self, name):
         """ Set a new name for the group and returns the new name. """
-        return self.bridge.make_request(self.device_url, method='PUT', name=name)['name']
+        self._update_name(self.bridge.make_request(self.device_url, method='PUT', name=name)['name'])
+        return self._name
+
+    def _update_name(self, name):
+        """ Remembers *name* as the current name of the device, re-indexing it on the bridge if it changed. """
+        if name and name != self._name:
+            self._name = name
+            self.bridge._registry.rename(self._device_url_prefix, self)
 
     def name(self, name=None):
         """ Gets or sets the current name of the group. If called without *name* argument, returns the current group name.
@@ -106,30 +278,45 @@ class FeatureBase(object):
 
 class Dimmer(FeatureBase):
     """ Abstract base class for devices that allow dimming (which is all Hue devices currently being sold.) """
+    __slots__ = ()
+    _state_fields = ('brightness',)
 
-    def _handle_transition_times(self, state):
-        """ Applies globally set transition times and deals with a bug in the hue api that causes lights
-            to turn on with brightness 1 when turned off with a transition time.
-        """
-        state = super(Dimmer, self)._handle_transition_times(state)
+    def _brightness_reset_steps(self, state):
+        """ Works out which parts of the brightness reset workaround (see ``_handle_transition_times``) apply to *state*.
 
-        use_transition = state.get('transition_time', None) is not None
+            Returns a tuple of (remember current brightness, re-apply remembered brightness).
+        """
+        transition = state.get('transition_time', None)
+        use_transition = (transition if transition is not None else self.transition_time) is not None
         needs_reset = self._reset_brightness_to is not None
-        turn_on = state.get('on', None) is True or state.get('brightness', None) != 0
+        turn_on = state.get('on', None) is True or state.get('brightness', None) not in (None, 0)
         turn_off = state.get('on', None) is False or state.get('brightness', None) == 0
 
+        return use_transition and turn_off, needs_reset and turn_on
+
+    def _needs_current_state(self, state):
+        return any(self._brightness_reset_steps(state))
+
+    def _handle_transition_times(self, state, current_state=None):
+        """ Applies globally set transition times and deals with a bug in the hue api that causes lights
+            to turn on with brightness 1 when turned off with a transition time.
+        """
+        remember_brightness, reset_brightness = self._brightness_reset_steps(state)
+        state, bookkeeping = super(Dimmer, self)._handle_transition_times(state, current_state)
+        reset_brightness_to = self._reset_brightness_to
+
         # Remember current brightness if a transition time is being used
-        if use_transition and turn_off:
-            self._reset_brightness_to = self.brightness()
+        if remember_brightness:
+            reset_brightness_to = bookkeeping['_reset_brightness_to'] = current_state['brightness']
 
         # Apply remembered brightness if light is being turned on
-        if needs_reset and turn_on and not self.is_on():
-            state['brightness'] = self._reset_brightness_to
-            self._reset_brightness_to = None
+        if reset_brightness and not current_state['on']:
+            state['brightness'] = reset_brightness_to
+            bookkeeping['_reset_brightness_to'] = None
 
-        return state
+        return state, bookkeeping
 
-    def _set_state(self, **state):
+    def _brightness_steps_to_hue(self, state):
         """ Attribute names in *state* are mapped between how huegely names them and hue API ones.
             Usually this is taken care of simply by replacing the names, but in the case of ``darker`` and ``brighter``,
             just replacing the names isn't enough, because the hue api uses ``bri_inc`` for both.
@@ -140,18 +327,51 @@ class Dimmer(FeatureBase):
         if 'brighter' in state:
             increase = state.pop('brighter')
             state['bri_inc'] = increase
+        return state
+
+    def _predicted_brightness(self, known_state, increment):
+        """ Predicts the brightness after changing the brightness in *known_state* by *increment*.
+            Like the bridge, this never goes below 1: dimming with ``bri_inc`` doesn't turn lights off.
+        """
+        return max(1, min(254, known_state['brightness'] + increment))
+
+    def _apply_brightness_increment(self, response, known_state):
+        """ Replaces ``bri_inc`` in the *response* of a brighter/darker update with the new brightness,
+            predicted from *known_state*, the state before the update. Returns False if no prediction was possible.
+        """
+        increment = response.pop('bri_inc')
+        if known_state is None:
+            return False
+
+        response['brightness'] = self._predicted_brightness(known_state, increment)
+        if self._state is not None:
+            self._state['brightness'] = response['brightness']
+        return True
+
+    def _batched_response(self, response):
+        """ Returns the BatchResult *response* of an update made inside a batch. Nothing has been sent yet,
+            so the new brightness of brighter/darker isn't known.
+        """
+        if response.pop('bri_inc', None) is not None:
+            response['brightness'] = None
+        return response
+
+    def _set_state(self, **state):
+        state = self._brightness_steps_to_hue(state)
+        known_state = self._tracked_state() if 'bri_inc' in state else None
 
         response = super(Dimmer, self)._set_state(**state)
+        if isinstance(response, batch.BatchResult):
+            return self._batched_response(response)
 
         # The groups endpoint for updating state behaves differently to the lights one when it comes to
         # the brighter/darker commands. Instead of returning the new brightness, it instead returns the
         # requested value directly, e.g. {'bri_inc': 10} instead of {'brightness': 240}.
-        # Because of that, we need to make another request to have consistent behaviour.
+        # If the brightness was known before the update, the new one is predicted from it,
+        # otherwise we need to make another request to have consistent behaviour.
 
-        if 'bri_inc' in response:
-            extra_state = self.state()
-            response.pop('bri_inc')
-            response['brightness'] = extra_state['brightness']
+        if 'bri_inc' in response and not self._apply_brightness_increment(response, known_state):
+            response['brightness'] = self._get_state()['brightness']
 
         return response
 
@@ -165,60 +385,91 @@ class Dimmer(FeatureBase):
 
     def is_on(self):
         """ Returns True if the light(s) is on, False otherwise. """
-        return self.state()['on']
+        return self._state_value('on')
 
     def brighter(self, step=25, transition_time=None):
         """ Makes the light(s) gradually brighter. Turns light on if necessary.
 
+            If the light is known to be off, it's turned on in the same request, otherwise turning it on needs a retry.
+
             Returns new brightness value.
         """
-        step = max(0, min(254, step))
-
+        update = self._brighter_update(step)
         try:
-            return self.state(brighter=step, transition_time=transition_time)['brightness']
+            return self.state(transition_time=transition_time, **update)['brightness']
         except exceptions.HueError as e:
-            if e.error_code == exceptions.CANNOT_MODIFY_WHILE_OFF:
-                return self.state(on=True, brighter=step, transition_time=transition_time)['brightness']
-            raise
+            if 'on' in update or not self._is_off_error(e):
+                raise
+            return self.state(on=True, transition_time=transition_time, **update)['brightness']
+
+    def _brighter_update(self, step):
+        """ Returns the state update for ``brighter(step)``, which also turns the light(s) on if they're known to be off. """
+        update = {'brighter': max(0, min(254, step))}
+        known_state = self._tracked_state()
+        if known_state is not None and not known_state['on']:
+            update['on'] = True
+        return update
+
+    def _is_known_off(self):
+        """ Returns True if the light(s) are known to be off, from state that is still fresh under ``cache_ttl``.
+            Older state isn't used, someone else might have turned them on since.
+        """
+        return self._is_state_fresh(self.cache_ttl) and self._state.get('on') is False
 
     def darker(self, step=25, transition_time=None):
-        """ Makes the light(s) gradually darker. Turns off if the brightness goes down to 0.
+        """ Makes the light(s) gradually darker. The bridge never dims below brightness 1, so if the light(s) are known
+            to go below that (see ``cache_ttl``), they are turned off in the same request.
 
-            Returns the new brightness value.
+            If the light(s) are known to be off, no request is made.
+
+            Returns the new brightness value, 0 if the light(s) are off.
         """
-        step = max(0, min(254, step))
+        update = self._darker_update(step)
+        if update is None:
+            return 0
 
         try:
-            response = self.state(darker=step, transition_time=transition_time)
+            response = self.state(transition_time=transition_time, **update)
         except exceptions.HueError as e:
-            if e.error_code == exceptions.CANNOT_MODIFY_WHILE_OFF:
+            if self._is_off_error(e):
                 return 0
             raise
+        return 0 if 'on' in update else response['brightness']
 
-        # Turn the lamp off if the brightness reaches 0
-        if response['brightness'] == 0:
-            self.off(transition_time=transition_time)
+    def _darker_update(self, step):
+        """ Returns the state update for ``darker(step)``, which also turns the light(s) off if they're known to go
+            below the lowest brightness, or None if they're known to be off already.
+        """
+        if self._is_known_off():
+            return None
 
-        return response['brightness']
+        update = {'darker': max(0, min(254, step))}
+        brightness = self._state.get('brightness') if self._is_state_fresh(self.cache_ttl) else None
+        if brightness is not None and brightness - update['darker'] < 1:
+            update['on'] = False
+        return update
 
     def _set_brightness(self, brightness, transition_time=None):
         """ Sets brightness to specific value (0-254). Values are clamped to allowed range.
 
             Returns the new brightness value.
         """
-        brightness = max(0, min(255, brightness))
-        on = brightness != 0
-
         try:
-            return self.state(on=on, brightness=brightness, transition_time=transition_time)['brightness']
+            return self.state(transition_time=transition_time, **self._brightness_update(brightness))['brightness']
         except exceptions.HueError as e:
-            if e.error_code == exceptions.CANNOT_MODIFY_WHILE_OFF:
+            if self._is_off_error(e):
                 return 0
             raise
 
+    def _brightness_update(self, brightness):
+        """ Returns the state update for ``brightness(brightness)``, turning the light(s) off at 0. """
+        brightness = max(0, min(255, brightness))
+        return {'on': brightness != 0, 'brightness': brightness}
+
+
     def _get_brightness(self):
         """ Gets current brightness value (0-254). """
-        return self.state()['brightness']
+        return self._state_value('brightness')
 
     def brightness(self, brightness=None, transition_time=None):
         """ Returns the current brightness level if called without *brightness* argument, otherwise sets and returns the new value.
@@ -234,13 +485,17 @@ class Dimmer(FeatureBase):
 
             Returns new alert value.
         """
+        return self.state(**self._alert_update(alert))['alert']
+
+    def _alert_update(self, alert):
+        """ Returns the state update for ``alert(alert)``, raising HueError for unsupported alerts. """
         if alert not in ['none', 'select']:
             raise exceptions.HueError('Cannot set alert to {}. Only "none" and "select" are supported.', device=self)
-        return self.state(alert=alert)['alert']
+        return {'alert': alert}
 
     def _get_alert(self):
         """ Gets current alert value ('none' or 'select'). """
-        return self.state()['alert']
+        return self._state_value('alert')
 
     def alert(self, alert=None):
         """ Returns the current alert value if called without *alert* argument,
@@ -256,18 +511,22 @@ class Dimmer(FeatureBase):
 
 class ColorController(FeatureBase):
     """ Abstract base class for colored lights. """
+    __slots__ = ()
+    _state_fields = ('hue', 'saturation', 'coordinates', 'effect', 'color_mode')
 
     def _set_coordinates(self, coordinates, transition_time=None):
         """ Sets coordinates to new value (each 0 - 1). Values are clamped to valid range.
             Returns new coordinate values.
         """
-        x = max(0, min(1, coordinates[0]))
-        y = max(0, min(1, coordinates[1]))
-        return self.state(coordinates=(x, y), transition_time=transition_time)['coordinates']
+        return self.state(transition_time=transition_time, **self._coordinates_update(coordinates))['coordinates']
+
+    def _coordinates_update(self, coordinates):
+        """ Returns the state update for ``coordinates(coordinates)``. """
+        return {'coordinates': (max(0, min(1, coordinates[0])), max(0, min(1, coordinates[1])))}
 
     def _get_coordinates(self):
         """ Gets current coordinate values (each 0 - 1). """
-        return self.state()['coordinates']
+        return self._state_value('coordinates')
 
     def coordinates(self, coordinates=None, transition_time=None):
         """ Returns the current coolor coordinates value if called without *coordinates* argument,
@@ -290,12 +549,15 @@ class ColorController(FeatureBase):
 
             Returns new hue value.
         """
-        hue = hue % 65535
-        return self.state(hue=hue, transition_time=transition_time)['hue']
+        return self.state(transition_time=transition_time, **self._hue_update(hue))['hue']
+
+    def _hue_update(self, hue):
+        """ Returns the state update for ``hue(hue)``. """
+        return {'hue': hue % 65535}
 
     def _get_hue(self):
         """ Gets current hue value (0-65535). """
-        return self.state()['hue']
+        return self._state_value('hue')
 
     def hue(self, hue=None, transition_time=None):
         """ Returns the current hue value if called without *hue* argument,
@@ -311,12 +573,15 @@ class ColorController(FeatureBase):
 
             Returns new saturation value.
         """
-        saturation = max(0, min(254, saturation))
-        return self.state(saturation=saturation, transition_time=transition_time)['saturation']
+        return self.state(transition_time=transition_time, **self._saturation_update(saturation))['saturation']
+
+    def _saturation_update(self, saturation):
+        """ Returns the state update for ``saturation(saturation)``. """
+        return {'saturation': max(0, min(254, saturation))}
 
     def _get_saturation(self):
         """ Gets current saturation value (0-254). """
-        return self.state()['saturation']
+        return self._state_value('saturation')
 
     def saturation(self, saturation=None, transition_time=None):
         """ Returns the current saturation value if called without *saturation* argument,
@@ -333,13 +598,17 @@ class ColorController(FeatureBase):
 
             Returns new effect value.
         """
+        return self.state(**self._effect_update(effect))['effect']
+
+    def _effect_update(self, effect):
+        """ Returns the state update for ``effect(effect)``, raising HueError for unsupported effects. """
         if effect not in ['none', 'colorloop']:
             raise exceptions.HueError('Cannot set effect to {}. Only "none" and "colorloop" are supported.', device=self)
-        return self.state(effect=effect)['effect']
+        return {'effect': effect}
 
     def _get_effect(self):
         """ Gets current effect value ('none' or 'colorloop'). """
-        return self.state()['effect']
+        return self._state_value('effect')
 
     def effect(self, effect=None):
         """ Returns the current effect value if called without *effect* argument,
@@ -355,11 +624,13 @@ class ColorController(FeatureBase):
             Note that this has only been tested on an ExtendedColorLight, because I don't have others.
             It might not work on ColorLights or ColorTemperatureLights.
         """
-        return self.state()['color_mode']
+        return self._state_value('color_mode')
 
 
 class TemperatureController(FeatureBase):
     """ Abstract base class for lights that allow setting a color temperature for their white light. """
+    __slots__ = ()
+    _state_fields = ('temperature', 'color_mode')
 
     def _set_temperature(self, temperature, transition_time=None):
         """ Sets color temperature to new value in mireds (154-500).
@@ -367,12 +638,15 @@ class TemperatureController(FeatureBase):
 
             Returns new temperature.
         """
-        temperature = max(154, min(500, temperature))
-        return self.state(temperature=temperature, transition_time=transition_time)['temperature']
+        return self.state(transition_time=transition_time, **self._temperature_update(temperature))['temperature']
+
+    def _temperature_update(self, temperature):
+        """ Returns the state update for ``temperature(temperature)``. """
+        return {'temperature': max(154, min(500, temperature))}
 
     def _get_temperature(self):
         """ Gets current color temperature in mireds (154-500). """
-        return self.state()['temperature']
+        return self._state_value('temperature')
 
     def temperature(self, temperature=None, transition_time=None):
         """ Returns the current color temperature (in mireds) if called without *temperature* argument,
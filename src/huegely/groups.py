@@ -1,46 +1,84 @@
 from huegely import (
+    codec,
     features,
-    utils,
+    state,
 )
 
 
 class Group(features.FeatureBase):
+    __slots__ = ()
     _identifier_actions = []  # Minimum set of group actions required to identify the group type
     _state_attribute = 'action'
+    _state_type = state.GroupAction
     _device_url_prefix = 'groups'
 
     def lights(self):
-        """ Returns all lights that belong to this group. """
-        light_ids = [int(light_id) for light_id in self.bridge.make_request(self.device_url)['lights']]
-        return [light for light in self.bridge.lights() if light.device_id in light_ids]
+        """ Returns all lights that belong to this group, from the bridge's membership index (see ``Bridge.membership``).
+            This doesn't make any requests, unless the index hasn't been built yet.
+        """
+        return self.bridge.membership().lights(self.device_id)
 
     def group_type(self):
         """ Get the type of group (light group or room) """
         return self.bridge.make_request(self.device_url)['type']
 
+
 class DimmableGroup(features.Dimmer, Group):
+    __slots__ = ()
     _identifier_actions = ['brightness']
 
 
 class ColorGroup(features.Dimmer, features.ColorController, Group):
+    __slots__ = ()
     _identifier_actions = ['hue']
 
 
 class ColorTemperatureGroup(features.Dimmer, features.TemperatureController, Group):
+    __slots__ = ()
     _identifier_actions = ['temperature']
 
 
 class ExtendedColorGroup(features.Dimmer, features.TemperatureController, features.ColorController, Group):
+    __slots__ = ()
     _identifier_actions = ['temperature', 'hue']
 
 
-def get_group_type(group_actions):
+# Group types in the order they are tried when identifying a group, most specific first.
+GROUP_TYPES = [ExtendedColorGroup, ColorTemperatureGroup, ColorGroup, DimmableGroup]
+
+
+def get_group_type(group_actions, group_types=GROUP_TYPES):
     """ Gets the appropriate group type for a group of lamps.
         The API doesn't identify the different types of groups directly, it only returns the available actions.
         So, we go through the options and return the most-fitting group.
     """
-    group_actions = utils.hue_to_huegely_names(group_actions)
-    for group_type in [ExtendedColorGroup, ColorTemperatureGroup, ColorGroup, DimmableGroup]:
+    group_actions = codec.NAMES.decode(group_actions)
+    for group_type in group_types:
         if all([id_action in group_actions for id_action in group_type._identifier_actions]):
             return group_type
     raise Exception("No group type could be found for actions {}".format(group_actions))
+
+
+def plan_group_commands(light_ids, group_lights):
+    """ Plans how to send the same command to all lights in *light_ids* with as few requests as possible.
+        *group_lights* maps group ids to the set of light ids in each group.
+
+        Groups that only contain targeted lights are picked greedily, biggest first, as long as they cover at least
+        two lights that aren't covered yet. Group commands are much more limited by the bridge than light commands,
+        so single lights are always addressed directly.
+
+        Returns a tuple of (list of group ids, sorted list of remaining light ids).
+    """
+    light_ids = set(light_ids)
+    candidates = {group_id: lights for group_id, lights in group_lights.items() if lights and lights <= light_ids}
+
+    uncovered = set(light_ids)
+    group_ids = []
+    while candidates:
+        group_id = max(candidates, key=lambda candidate: (len(candidates[candidate] & uncovered), -candidate))
+        if len(candidates[group_id] & uncovered) < 2:
+            break
+        uncovered -= candidates.pop(group_id)
+        group_ids.append(group_id)
+
+    return group_ids, sorted(uncovered)
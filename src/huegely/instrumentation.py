@@ -0,0 +1,213 @@
+import re
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from huegely import exceptions
+
+
+# Path segments that identify a device, replaced by {id} in endpoint templates
+_ID_SEGMENT = re.compile(r'(?<=/)\d+(?=/|$)')
+
+
+def endpoint_template(url, base_url):
+    """ Returns the endpoint of *url* with device ids replaced, e.g. 'lights/{id}/state'.
+        Urls not starting with *base_url* (unauthenticated ones like ``get_token``'s) are relative to the api root.
+    """
+    if url.startswith(base_url):
+        path = url[len(base_url):]
+    else:
+        path = url.split('/api', 1)[-1]
+    return _ID_SEGMENT.sub('{id}', '/' + path.strip('/'))[1:] or '/'
+
+
+class RequestInfo(object):
+    """ A request to the bridge, as seen by instruments.
+
+        Before the request, ``method``, ``url``, ``endpoint`` (see ``endpoint_template``) and ``data`` are set.
+        Afterwards, ``elapsed`` is the duration in seconds, ``bytes_in``/``bytes_out`` the size of the response and
+        request bodies, and either ``response`` is the processed response or ``error`` the exception raised.
+    """
+    def __init__(self, bridge, method, url, data):
+        self.bridge = bridge
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint_template(url, bridge.base_url)
+        self.data = data
+        self.started_at = time.perf_counter()
+        self.elapsed = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.response = None
+        self.error = None
+
+    @property
+    def error_type(self):
+        """ The hue error type (e.g. '201') if the request failed with a HueError, the exception's class name if it
+            failed otherwise (e.g. 'ConnectTimeout'), None if it didn't fail.
+        """
+        if self.error is None:
+            return None
+        if isinstance(self.error, exceptions.HueError) and self.error.error_code is not None:
+            return str(self.error.error_code)
+        return type(self.error).__name__
+
+
+class Instrument(object):
+    """ Base class for request hooks. Add instruments with ``bridge.add_instrument()``.
+
+        ``before_request`` is called before every request to the bridge, ``after_request`` once it has finished,
+        whether it succeeded or not. Both get the RequestInfo of the request. Hooks run on the thread making the request.
+    """
+    def before_request(self, info):
+        pass
+
+    def after_request(self, info):
+        pass
+
+
+@contextmanager
+def record(bridge, method, url, data):
+    """ Runs the instruments of *bridge* around the request in the with block, which fills in the yielded RequestInfo. """
+    info = RequestInfo(bridge, method, url, data)
+    for instrument in bridge.instruments:
+        instrument.before_request(info)
+
+    try:
+        yield info
+    except Exception as e:
+        info.error = e
+        raise
+    finally:
+        info.elapsed = time.perf_counter() - info.started_at
+        for instrument in bridge.instruments:
+            instrument.after_request(info)
+
+
+class Metrics(Instrument):
+    """ Counts requests, errors and bytes and records latency histograms, per bridge, method and endpoint template::
+
+            metrics = Metrics()
+            bridge.add_instrument(metrics)
+            ...
+            print(metrics.prometheus())
+
+        The same instance can be added to several bridges, they are told apart by their ip.
+        *buckets* are the upper bounds of the latency histogram buckets, in seconds.
+    """
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (bridge ip, method, endpoint) -> counters, see _new_entry
+            self._entries = OrderedDict()
+
+    def _new_entry(self):
+        return {
+            'count': 0,
+            'duration_sum': 0.0,
+            'buckets': [0] * len(self.buckets),
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'errors': OrderedDict(),
+        }
+
+    def after_request(self, info):
+        key = (info.bridge.ip, info.method, info.endpoint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = self._new_entry()
+
+            entry['count'] += 1
+            entry['duration_sum'] += info.elapsed
+            entry['bytes_in'] += info.bytes_in
+            entry['bytes_out'] += info.bytes_out
+            for index, bound in enumerate(self.buckets):
+                if info.elapsed <= bound:
+                    entry['buckets'][index] += 1
+                    break
+
+            error_type = info.error_type
+            if error_type is not None:
+                entry['errors'][error_type] = entry['errors'].get(error_type, 0) + 1
+
+    def as_dict(self):
+        """ Returns the metrics as a list of dictionaries, one per bridge, method and endpoint.
+            Histogram buckets are cumulative, like in Prometheus: the number of requests that took at most *le* seconds.
+        """
+        with self._lock:
+            entries = [(key, dict(entry, errors=dict(entry['errors']))) for key, entry in self._entries.items()]
+
+        metrics = []
+        for (bridge, method, endpoint), entry in entries:
+            cumulative, histogram = 0, OrderedDict()
+            for bound, count in zip(self.buckets, entry['buckets']):
+                cumulative += count
+                histogram[bound] = cumulative
+
+            metrics.append(OrderedDict([
+                ('bridge', bridge),
+                ('method', method),
+                ('endpoint', endpoint),
+                ('count', entry['count']),
+                ('duration_sum', entry['duration_sum']),
+                ('histogram', histogram),
+                ('bytes_in', entry['bytes_in']),
+                ('bytes_out', entry['bytes_out']),
+                ('errors', entry['errors']),
+            ]))
+        return metrics
+
+    def prometheus(self, prefix='huegely'):
+        """ Returns the metrics in the Prometheus text exposition format. """
+        metrics = self.as_dict()
+
+        def labels(metric, **extra):
+            pairs = [('bridge', metric['bridge']), ('method', metric['method']), ('endpoint', metric['endpoint'])]
+            pairs += sorted(extra.items())
+            return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+        lines = []
+
+        def add(name, metric_type, description, samples):
+            lines.append('# HELP {}_{} {}'.format(prefix, name, description))
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, metric_type))
+            lines.extend('{}_{}{} {}'.format(prefix, sample_name, sample_labels, value) for sample_name, sample_labels, value in samples)
+
+        add('requests_total', 'counter', 'Requests made to the bridge.', [
+            ('requests_total', labels(metric), metric['count']) for metric in metrics
+        ])
+
+        histogram_samples = []
+        for metric in metrics:
+            for bound, count in metric['histogram'].items():
+                histogram_samples.append(('request_duration_seconds_bucket', labels(metric, le=repr(float(bound))), count))
+            histogram_samples.append(('request_duration_seconds_bucket', labels(metric, le='+Inf'), metric['count']))
+            histogram_samples.append(('request_duration_seconds_sum', labels(metric), repr(metric['duration_sum'])))
+            histogram_samples.append(('request_duration_seconds_count', labels(metric), metric['count']))
+        add('request_duration_seconds', 'histogram', 'Duration of requests to the bridge.', histogram_samples)
+
+        add('request_errors_total', 'counter', 'Failed requests, by hue error type or exception.', [
+            ('request_errors_total', labels(metric, error_type=error_type), count)
+            for metric in metrics for error_type, count in metric['errors'].items()
+        ])
+        add('received_bytes_total', 'counter', 'Bytes received from the bridge.', [
+            ('received_bytes_total', labels(metric), metric['bytes_in']) for metric in metrics
+        ])
+        add('sent_bytes_total', 'counter', 'Bytes sent to the bridge.', [
+            ('sent_bytes_total', labels(metric), metric['bytes_out']) for metric in metrics
+        ])
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
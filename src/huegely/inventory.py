@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+from huegely import groups
+
+
+class Inventory(object):
+    """ Caches the devices of a bridge on disk, so that a restarted process can use them without any discovery requests::
+
+            inventory = Inventory(bridge, '/var/cache/huegely/inventory.json')
+            inventory.lights()[0].on()  # One request, to turn the light on
+
+        The inventory stores device ids, types, names and group memberships, but not their state.
+        The first time (or if the file is missing or for another bridge), devices are discovered with a single request
+        to the full datastore and saved.
+
+        Devices loaded from the file are validated lazily: a background thread gets the bridge's config, lights and
+        groups, and checks that the bridge's ``swversion`` and the ids of all lights and groups are still the same.
+        These are a fraction of the full datastore, which also holds rules, schedules, scenes etc.
+        Either way, the lights and groups are updated in place with the fetched names, state and memberships,
+        and the file is saved again if anything changed. ``wait()`` waits for the validation, ``is_valid`` holds its
+        outcome. Sensors aren't validated, call ``discover()`` to pick up added or removed sensors.
+
+        Pass ``validate=False`` to skip validation, e.g. if the file is known to be up to date.
+
+        Inventories only work with the synchronous ``Bridge``, passing an ``AsyncBridge`` raises a TypeError.
+    """
+    VERSION = 1
+
+    def __init__(self, bridge, path, validate=True):
+        if asyncio.iscoroutinefunction(bridge.make_request):
+            raise TypeError("Inventory only supports the synchronous Bridge, not {}.".format(type(bridge).__name__))
+        self.bridge = bridge
+        self.path = path
+        self.validate_on_load = validate
+
+        # None until validated, then True if the cached inventory still matched the bridge
+        self.is_valid = None
+        self.validation_error = None
+
+        self._lock = threading.Lock()
+        self._records = None
+        self._devices = None
+        self._validation = None
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._devices is not None:
+                return
+
+            records = self._read()
+            if records is None:
+                self._discover()
+                self.is_valid = True
+                return
+
+            self._records = records
+            self._devices = self._build(records)
+            if self.validate_on_load:
+                self._validation = threading.Thread(target=self._validate_in_background, daemon=True)
+                self._validation.start()
+
+    def lights(self):
+        """ Returns the bridge's lights, from the inventory. """
+        self._ensure_loaded()
+        return list(self._devices['lights'])
+
+    def groups(self):
+        """ Returns the bridge's groups, from the inventory. """
+        self._ensure_loaded()
+        return list(self._devices['groups'])
+
+    def sensors(self):
+        """ Returns the bridge's supported sensors, from the inventory. """
+        self._ensure_loaded()
+        return list(self._devices['sensors'])
+
+    def wait(self, timeout=None):
+        """ Waits for the background validation to finish, returns ``is_valid``. """
+        self._ensure_loaded()
+        if self._validation is not None:
+            self._validation.join(timeout)
+        return self.is_valid
+
+    def _validate_in_background(self):
+        try:
+            self.validate()
+        except Exception as e:
+            self.validation_error = e
+
+    def validate(self):
+        """ Checks the inventory against the bridge's config, lights and groups (three requests) and updates it.
+            Returns True if it was valid.
+        """
+        config = self.bridge.make_request('config')
+        light_data = self.bridge.make_request('lights')
+        group_data = self.bridge.make_request('groups')
+
+        with self._lock:
+            old_records = self._records
+            if old_records is None:
+                # Nothing to validate against, e.g. validate() was called before the inventory was loaded
+                self._discover()
+                self.is_valid = False
+                return self.is_valid
+
+            records = dict(
+                old_records,
+                swversion=config.get('swversion'),
+                lights=self._light_records(light_data),
+                groups=self._group_records(group_data),
+            )
+            self.is_valid = old_records['swversion'] == records['swversion'] and all(
+                set(old_records[kind]) == set(records[kind]) for kind in ('lights', 'groups')
+            )
+
+            self._records = records
+            self._devices = dict(
+                self._devices,
+                lights=self.bridge._build_lights(light_data, complete=True),
+                groups=self.bridge._build_groups(group_data, complete=True),
+            )
+            if records != old_records:
+                self.save()
+        return self.is_valid
+
+    def discover(self):
+        """ Replaces the inventory with all devices of the bridge, using a single request to the full datastore. """
+        with self._lock:
+            self._discover()
+
+    def _discover(self):
+        data = self.bridge.make_request('')
+        snapshot = self.bridge._build_snapshot(data)
+        self._records = {
+            'swversion': data['config'].get('swversion'),
+            'lights': self._light_records(data['lights']),
+            'groups': self._group_records(data['groups']),
+            'sensors': self._sensor_records(data['sensors']),
+        }
+        self._devices = {'lights': snapshot.lights, 'groups': snapshot.groups, 'sensors': snapshot.sensors}
+        self.save()
+
+    def _light_records(self, data):
+        return {device_id: {'name': light['name'], 'type': light['type']} for device_id, light in data.items()}
+
+    def _group_records(self, data):
+        return {
+            device_id: {
+                'name': group['name'],
+                'type': groups.get_group_type(group['action']).__name__,
+                'lights': group['lights'],
+            }
+            for device_id, group in data.items()
+        }
+
+    def _sensor_records(self, data):
+        return {
+            device_id: {'name': sensor['name'], 'type': sensor['type']}
+            for device_id, sensor in data.items() if sensor['type'] in self.bridge._sensor_types
+        }
+
+    def _group_type(self, name):
+        """ Returns the bridge's group class for the (synchronous) group class *name*, e.g. 'DimmableGroup'. """
+        base_type = getattr(groups, name)
+        return next(group_type for group_type in self.bridge._group_types if issubclass(group_type, base_type))
+
+    def _build(self, records):
+        """ Builds the devices from inventory *records*, and indexes them and their group memberships, without any requests. """
+        bridge = self.bridge
+
+        def build(device_types, kind):
+            return sorted(
+                (bridge._get_device(device_types(record['type']), int(device_id), {'name': record['name']})
+                 for device_id, record in records[kind].items()),
+                key=lambda device: device.device_id
+            )
+
+        devices = {
+            'lights': build(lambda light_type: bridge._light_types[light_type], 'lights'),
+            'groups': build(self._group_type, 'groups'),
+            'sensors': build(lambda sensor_type: bridge._sensor_types[sensor_type], 'sensors'),
+        }
+        bridge._membership.update_lights(devices['lights'])
+        bridge._membership.update_groups(records['groups'], devices['groups'])
+        for kind, kind_devices in devices.items():
+            bridge._registry.update(kind, kind_devices, complete=True)
+        return devices
+
+    def _read(self):
+        """ Returns the records stored for this bridge, or None if there are none. """
+        try:
+            with open(self.path) as inventory_file:
+                stored = json.load(inventory_file)
+        except (IOError, ValueError):
+            return None
+
+        if stored.get('version') != self.VERSION or stored.get('bridge') != self.bridge.ip:
+            return None
+        return stored['records']
+
+    def save(self):
+        """ Writes the inventory to disk. The file is replaced atomically, so readers never see a partial file. """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as inventory_file:
+            json.dump({'version': self.VERSION, 'bridge': self.bridge.ip, 'records': self._records}, inventory_file)
+        os.replace(inventory_file.name, self.path)
@@ -4,34 +4,43 @@ from huegely.features import (
     ColorController,
     TemperatureController,
 )
+from huegely.state import LightState
 
 
 class Light(FeatureBase):
     """ Abstract base class for all lights.
         All lights inherit from ``Light`` and any appropriate feature classes.
     """
+    __slots__ = ()
     _state_attribute = 'state'
+    _state_type = LightState
     _device_url_prefix = 'lights'
 
     def is_reachable(self):
         """ Returns True if the light is currently reachable, False otherwise. """
         return self._get_state()['is_reachable']
 
+    def groups(self):
+        """ Returns all groups this light belongs to, from the bridge's membership index (see ``Bridge.membership``).
+            This doesn't make any requests, unless the index hasn't been built yet.
+        """
+        return self.bridge.membership().groups(self.device_id)
+
 
 class DimmableLight(Dimmer, Light):
-    pass
+    __slots__ = ()
 
 
 class ColorLight(Dimmer, ColorController, Light):
-    pass
+    __slots__ = ()
 
 
 class ColorTemperatureLight(Dimmer, TemperatureController, Light):
-    pass
+    __slots__ = ()
 
 
 class ExtendedColorLight(Dimmer, TemperatureController, ColorController, Light):
-    pass
+    __slots__ = ()
 
 
 LIGHT_TYPES = {
@@ -0,0 +1,103 @@
+import threading
+import time
+
+
+class MembershipIndex(object):
+    """ Which lights belong to which groups, and the other way around. Use it via ``bridge.membership()``.
+
+        The index is kept up to date from every complete listing of lights or groups the bridge gets (``lights()``,
+        ``groups()``, ``snapshot()``), so it usually doesn't cost any requests of its own. Updates are incremental:
+        only groups whose lights changed are re-indexed.
+
+        The light and group objects returned are the ones built by the listing the index was last updated from,
+        so their known state (see ``state(max_age=...)``) is as old as that listing.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # Device id -> device object of the last listing
+        self._lights = {}
+        self._groups = {}
+
+        # Group id -> tuple of light ids, and light id -> set of group ids
+        self._group_lights = {}
+        self._light_groups = {}
+
+        self.lights_updated_at = None
+        self.groups_updated_at = None
+
+    @property
+    def is_complete(self):
+        """ True once both lights and groups have been indexed. """
+        return self.lights_updated_at is not None and self.groups_updated_at is not None
+
+    def age(self):
+        """ Seconds since the older of the last lights and groups updates, None if the index isn't complete. """
+        if not self.is_complete:
+            return None
+        return time.monotonic() - min(self.lights_updated_at, self.groups_updated_at)
+
+    def update_lights(self, lights):
+        """ Replaces the indexed lights with *lights*, a complete list of the bridge's lights. """
+        with self._lock:
+            self._lights = {light.device_id: light for light in lights}
+            self.lights_updated_at = time.monotonic()
+
+    def update_groups(self, data, groups):
+        """ Updates group memberships from *data*, the complete response of the groups endpoint,
+            and replaces the indexed groups with *groups*, the group objects built from it.
+        """
+        group_lights = {int(group_id): tuple(int(light_id) for light_id in group_data['lights']) for group_id, group_data in data.items()}
+
+        with self._lock:
+            for group_id in set(self._group_lights) - set(group_lights):
+                self._set_group_lights(group_id, ())
+                del self._group_lights[group_id]
+
+            for group_id, light_ids in group_lights.items():
+                if self._group_lights.get(group_id) != light_ids:
+                    self._set_group_lights(group_id, light_ids)
+
+            self._groups = {group.device_id: group for group in groups}
+            self.groups_updated_at = time.monotonic()
+
+    def _set_group_lights(self, group_id, light_ids):
+        for light_id in self._group_lights.get(group_id, ()):
+            self._light_groups[light_id].discard(group_id)
+            if not self._light_groups[light_id]:
+                del self._light_groups[light_id]
+
+        self._group_lights[group_id] = light_ids
+        for light_id in light_ids:
+            self._light_groups.setdefault(light_id, set()).add(group_id)
+
+    def light_ids(self, group_id):
+        """ Returns the sorted ids of the lights in the group with *group_id*. Group 0 contains all lights. """
+        with self._lock:
+            if group_id == 0:
+                return sorted(self._lights)
+            return sorted(self._group_lights.get(group_id, ()))
+
+    def group_ids(self, light_id):
+        """ Returns the sorted ids of the groups the light with *light_id* belongs to. """
+        with self._lock:
+            return sorted(self._light_groups.get(light_id, ()))
+
+    def group_lights(self):
+        """ Returns the light ids of all indexed groups (not including group 0), as group id -> tuple of light ids. """
+        with self._lock:
+            return dict(self._group_lights)
+
+    def group(self, group_id):
+        """ Returns the group with *group_id*, or None if it isn't indexed. """
+        return self._groups.get(group_id)
+
+    def lights(self, group_id):
+        """ Returns the lights in the group with *group_id*. """
+        light_ids = self.light_ids(group_id)
+        return [self._lights[light_id] for light_id in light_ids if light_id in self._lights]
+
+    def groups(self, light_id):
+        """ Returns the groups the light with *light_id* belongs to. """
+        group_ids = self.group_ids(light_id)
+        return [self._groups[group_id] for group_id in group_ids if group_id in self._groups]
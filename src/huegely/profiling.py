@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from huegely import bridge
+
+
+# The function that makes the actual requests of the synchronous api, every call to it is one round trip
+_REQUEST_CODE = bridge.Bridge._request.__code__
+
+# Modules whose functions aren't recorded: this one, and the emulator, which might be serving requests in the background
+_IGNORED_MODULES = {__name__, 'huegely.emulator'}
+
+
+class CallNode(object):
+    """ A function in the call tree of a Profile, with the number of times it was called from its parent,
+        the total time spent in it and the number of requests made by it, directly or through the functions it called.
+    """
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.calls = 0
+        self.total_time = 0.0
+        self.requests = 0
+        self.children = OrderedDict()
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = CallNode(name, parent=self)
+        return node
+
+    def as_dict(self):
+        return OrderedDict([
+            ('name', self.name),
+            ('calls', self.calls),
+            ('total_time', self.total_time),
+            ('requests', self.requests),
+            ('children', [child.as_dict() for child in self.children.values()]),
+        ])
+
+    def format(self, depth=0):
+        """ Returns the tree below this node as text, one line per function. """
+        lines = []
+        for child in self.children.values():
+            lines.append('{}{}  calls={} requests={} time={:.2f}ms'.format(
+                '  ' * depth, child.name, child.calls, child.requests, child.total_time * 1000
+            ))
+            lines += child.format(depth + 1)
+        return lines
+
+
+class Profile(object):
+    """ Tree of the huegely functions called while profiling, see ``profile()``. """
+    def __init__(self):
+        self.root = CallNode('<profile>')
+        self._lock = threading.Lock()
+
+        # Thread id -> stack of (frame, node, start time) of the huegely functions currently running
+        self._stacks = {}
+
+    @property
+    def requests(self):
+        """ Total number of requests made while profiling. """
+        return self.root.requests
+
+    def as_dict(self):
+        return self.root.as_dict()
+
+    def format(self):
+        return '\n'.join(self.root.format())
+
+    def __str__(self):
+        return self.format()
+
+    def _trace(self, frame, event, arg):
+        if event == 'call':
+            module = frame.f_globals.get('__name__', '')
+            code = frame.f_code
+            # Comprehensions are an implementation detail of the function they're in
+            if not module.startswith('huegely.') or module in _IGNORED_MODULES or code.co_name.endswith('comp>'):
+                return
+
+            with self._lock:
+                stack = self._stacks.setdefault(threading.get_ident(), [])
+                node = (stack[-1][1] if stack else self.root).child(getattr(code, 'co_qualname', code.co_name))
+                node.calls += 1
+                if code is _REQUEST_CODE:
+                    request_node = node
+                    while request_node is not None:
+                        request_node.requests += 1
+                        request_node = request_node.parent
+
+            stack.append((frame, node, time.perf_counter()))
+
+        elif event == 'return':
+            stack = self._stacks.get(threading.get_ident())
+            if stack and stack[-1][0] is frame:
+                _, node, started_at = stack.pop()
+                node.total_time += time.perf_counter() - started_at
+
+
+@contextmanager
+def profile():
+    """ Records which huegely functions are called inside the with block, how long they take and how many requests
+        they make, as a tree of calls::
+
+            with huegely.profile() as calls:
+                light.brighter()
+            print(calls)
+
+        prints something like::
+
+            Dimmer.brighter  calls=1 requests=1 time=2.10ms
+              FeatureBase.state  calls=1 requests=1 time=2.03ms
+                Dimmer._set_state  calls=1 requests=1 time=2.01ms
+                  ...
+                    Bridge._request  calls=1 requests=1 time=1.90ms
+
+        Calls made in other threads (e.g. by ``Bridge.map``) are recorded as separate trees below the root.
+        This traces every Python function call, so code runs a lot slower while it's being profiled.
+        Only the synchronous api is supported, coroutines aren't recorded properly.
+    """
+    result = Profile()
+    previous_profiler = sys.getprofile()
+    previous_thread_profiler = getattr(threading, 'getprofile', lambda: None)()
+    threading.setprofile(result._trace)
+    sys.setprofile(result._trace)
+    try:
+        yield result
+    finally:
+        sys.setprofile(previous_profiler)
+        threading.setprofile(previous_thread_profiler)
+
+
+class RequestBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def request_budget(max_requests, *bridges):
+    """ Test helper that fails if the code in the with block makes more than *max_requests* requests to *bridges*::
+
+            with request_budget(1, bridge):
+                light.brighter()
+
+        Raises RequestBudgetExceeded, an AssertionError showing the calls that made the requests (see ``profile()``).
+    """
+    requests_before = sum(hue_bridge.request_count for hue_bridge in bridges)
+    with profile() as calls:
+        yield calls
+    requests = sum(hue_bridge.request_count for hue_bridge in bridges) - requests_before
+
+    if requests > max_requests:
+        raise RequestBudgetExceeded(
+            'Expected at most {} request(s), but {} were made:\n{}'.format(max_requests, requests, calls)
+        )
@@ -0,0 +1,97 @@
+import threading
+import time
+
+
+class DeviceRegistry(object):
+    """ Index of a bridge's lights, groups and sensors by id and by name, used by ``bridge.light(id)``,
+        ``bridge.light_by_name(name)`` and their group and sensor counterparts.
+
+        The registry is filled lazily: every listing of devices the bridge gets (``lights()``, ``snapshot()``, ...)
+        replaces the devices of that kind, and every single device fetched by id is added to it. Looking a device up
+        doesn't make any requests, the bridge decides when to refresh it.
+
+        Lookups by name need a complete listing, because a missing name can only be told apart from an unknown device
+        once all devices of a kind are known. Devices renamed through huegely are re-indexed right away. Names that
+        aren't known are only trusted to be missing for ``MISSING_MAX_AGE`` seconds after the listing, since devices
+        could have been added or renamed elsewhere since. If several devices have the same name, the one with the lowest
+        id is used.
+    """
+    KINDS = ('lights', 'groups', 'sensors')
+
+    # Default for how old a listing may be to tell that a name doesn't exist, in seconds
+    MISSING_MAX_AGE = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # Per kind: device id -> (device, time it was updated), name -> {device id: device},
+        # and device id -> the name it's indexed under
+        self._by_id = {kind: {} for kind in self.KINDS}
+        self._by_name = {kind: {} for kind in self.KINDS}
+        self._names = {kind: {} for kind in self.KINDS}
+
+        # Per kind: time of the last complete listing, None if there hasn't been one
+        self.listed_at = dict.fromkeys(self.KINDS)
+
+    def update(self, kind, devices, complete=False):
+        """ Indexes *devices* of *kind*. If the list is *complete*, i.e. contains all devices of that kind on the bridge,
+            it replaces the indexed ones.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if complete:
+                self._by_id[kind].clear()
+                self._by_name[kind].clear()
+                self._names[kind].clear()
+                self.listed_at[kind] = now
+
+            for device in devices:
+                self._by_id[kind][device.device_id] = (device, now)
+                self._index_name(kind, device)
+
+    def rename(self, kind, device):
+        """ Re-indexes *device* of *kind* under its current name, if it's the indexed device with its id. """
+        with self._lock:
+            indexed, _ = self._by_id[kind].get(device.device_id, (None, None))
+            if indexed is device:
+                self._index_name(kind, device)
+
+    def _index_name(self, kind, device):
+        by_name, names = self._by_name[kind], self._names[kind]
+        old_name = names.get(device.device_id)
+        if old_name is not None:
+            named = by_name[old_name]
+            del named[device.device_id]
+            if not named:
+                del by_name[old_name]
+
+        names[device.device_id] = device._name
+        by_name.setdefault(device._name, {})[device.device_id] = device
+
+    def _is_fresh(self, updated_at, max_age):
+        return updated_at is not None and (max_age is None or time.monotonic() - updated_at <= max_age)
+
+    def get(self, kind, device_id, max_age=None):
+        """ Returns the device of *kind* with *device_id*, or None if it isn't known or older than *max_age* seconds. """
+        with self._lock:
+            device, updated_at = self._by_id[kind].get(device_id, (None, None))
+        return device if self._is_fresh(updated_at, max_age) else None
+
+    def get_by_name(self, kind, name, max_age=None):
+        """ Returns the device of *kind* called *name*, or None if there is no such device in the last complete listing,
+            or that listing is older than *max_age* seconds.
+        """
+        with self._lock:
+            named = self._by_name[kind].get(name)
+            device = named[min(named)] if named else None
+            listed_at = self.listed_at[kind]
+        return device if self._is_fresh(listed_at, max_age) else None
+
+    def is_missing(self, kind, name, max_age=None):
+        """ Returns True if there is no device of *kind* called *name*, according to a complete listing that isn't older
+            than *max_age* seconds (``MISSING_MAX_AGE`` if not given).
+        """
+        with self._lock:
+            listed_at = self.listed_at[kind]
+            known = name in self._by_name[kind]
+        return not known and self._is_fresh(listed_at, self.MISSING_MAX_AGE if max_age is None else max_age)
@@ -0,0 +1,170 @@
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from huegely import batch
+
+
+class TokenBucket(object):
+    """ Allows *rate* operations per second on average, with bursts of up to *capacity* operations. Thread-safe.
+
+        *clock* and *sleep* default to ``time.monotonic`` and ``time.sleep``.
+    """
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """ Takes a token, returns how many seconds to wait before it may be used. """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return max(0, -self._tokens / self.rate)
+
+    def try_acquire(self):
+        """ Takes a token if one is available right now. Returns False otherwise, without waiting. """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        """ Waits until a token is available and takes it. """
+        delay = self._reserve()
+        if delay:
+            self._sleep(delay)
+
+
+class ScheduledCommand(object):
+    """ A pending command, shared by all callers whose updates were merged into it. """
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class CommandScheduler(object):
+    """ Sends commands (PUT requests) to the bridge no faster than it can handle them.
+
+        Philips recommends at most 10 light commands and 1 group command per second, which are the default *rates*.
+        Commands for each resource (the first part of the path, e.g. 'lights') are queued and sent in order by a
+        worker thread, at the rate allowed by that resource's token bucket. Callers block until their command was sent.
+
+        If a command is submitted for a path that already has a command waiting, the new values are merged into the
+        waiting command instead of queueing another one, as the older values would be overwritten immediately anyway.
+        All callers involved get the response of the merged command.
+    """
+    DEFAULT_RATES = {
+        'lights': 10,
+        'groups': 1,
+    }
+
+    def __init__(self, bridge, rates=None, burst=1):
+        self.bridge = bridge
+        self.rates = dict(rates or self.DEFAULT_RATES)
+
+        self._condition = threading.Condition()
+        self._closed = False
+        self._buckets = {resource: TokenBucket(rate, burst) for resource, rate in self.rates.items()}
+        self._queues = {resource: OrderedDict() for resource in self.rates}
+        self._workers = {}
+        self._stats = {
+            resource: {'sent': 0, 'superseded': 0, 'max_queue_depth': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+            for resource in self.rates
+        }
+
+    def handles(self, path, method):
+        """ Returns True if requests with *method* to *path* are rate limited by this scheduler. """
+        return method == 'PUT' and path.split('/', 1)[0] in self.rates
+
+    def submit(self, path, data):
+        """ Queues a PUT of *data* to *path*, waits for it to be sent and returns the processed response. """
+        resource = path.split('/', 1)[0]
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The scheduler has been closed.")
+
+            queue = self._queues[resource]
+            command = queue.get(path)
+            if command is not None:
+                batch.merge_state(command.data, data)
+                self._stats[resource]['superseded'] += 1
+            else:
+                command = queue[path] = ScheduledCommand(path, dict(data))
+                self._stats[resource]['max_queue_depth'] = max(self._stats[resource]['max_queue_depth'], len(queue))
+
+            if resource not in self._workers:
+                self._workers[resource] = threading.Thread(target=self._work, args=(resource,), daemon=True)
+                self._workers[resource].start()
+            self._condition.notify_all()
+
+        return command.future.result()
+
+    def _work(self, resource):
+        queue = self._queues[resource]
+        bucket = self._buckets[resource]
+        stats = self._stats[resource]
+
+        while True:
+            with self._condition:
+                while not queue and not self._closed:
+                    self._condition.wait()
+                if not queue:
+                    return
+
+            # Wait for the token before taking the command off the queue, so that it can still be updated while waiting
+            bucket.acquire()
+
+            with self._condition:
+                _, command = queue.popitem(last=False)
+                wait = time.monotonic() - command.submitted_at
+                stats['sent'] += 1
+                stats['total_wait'] += wait
+                stats['max_wait'] = max(stats['max_wait'], wait)
+
+            try:
+                response = self.bridge._request('PUT', self.bridge.base_url + command.path, command.data)
+            except Exception as e:
+                command.future.set_exception(e)
+            else:
+                command.future.set_result(response)
+
+    def metrics(self):
+        """ Returns queue depth, number of commands sent and superseded and wait times (in seconds) per resource. """
+        with self._condition:
+            return {
+                resource: {
+                    'queue_depth': len(self._queues[resource]),
+                    'max_queue_depth': stats['max_queue_depth'],
+                    'sent': stats['sent'],
+                    'superseded': stats['superseded'],
+                    'average_wait': stats['total_wait'] / stats['sent'] if stats['sent'] else 0.0,
+                    'max_wait': stats['max_wait'],
+                }
+                for resource, stats in self._stats.items()
+            }
+
+    def close(self):
+        """ Sends all queued commands and stops the worker threads. """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            workers = list(self._workers.values())
+
+        for worker in workers:
+            worker.join()
@@ -1,54 +1,42 @@
-from datetime import (
-    datetime,
-    timedelta,
-)
+from datetime import datetime
 
 from huegely.features import (
     FeatureBase,
 )
+from huegely.state import SensorState
 
 
 class Sensor(FeatureBase):
+    __slots__ = ()
     _state_attribute = 'state'
+    _state_type = SensorState
     _device_url_prefix = 'sensors'
 
-    def __init__(self, bridge, device_id, name=None, state=None):
-        super().__init__(bridge, device_id, name=name)
-        self._state = state
-        self._state_set_at = datetime.now()
-
-    def state(self, max_age=0):
-        """Sensors generally get updated very rarely, so we add some simple caching."""
-
-        if self._state and datetime.now() - self._state_set_at <= timedelta(seconds=max_age):
-            state = self._state
-        else:
-            state = super().state()
-            self._state_set_at = datetime.now()
-
-        return state
-
 
 class TemperatureSensor(Sensor):
     """Hue temperature sensor, currently just an unused part of the hue motion sensor."""
+    __slots__ = ()
+    _state_fields = ('temperature',)
 
-    def _get_temperature(self, max_age=0):
+    def _get_temperature(self, max_age=None):
         """Get current temperature in degrees Celcius."""
-        return self.state(max_age=max_age)['temperature'] / 100
+        return self._state_value('temperature', max_age=max_age) / 100
     temperature = _get_temperature
 
 
 class MotionSensor(Sensor):
     """The hue motion sensor contains multiple sensor, this is the motion part of it."""
+    __slots__ = ()
+    _state_fields = ('presence',)
 
-    def _get_presence(self, max_age=0):
+    def _get_presence(self, max_age=None):
         """Get current presence state as True or False."""
-        return self.state(max_age=max_age)['presence']
+        return self._state_value('presence', max_age=max_age)
     presence = _get_presence
 
-    def _get_last_updated(self, max_age=0):
+    def _get_last_updated(self, max_age=None):
         """Get time the presence state was last updated."""
-        datetime_string = self.state(max_age=max_age)['last_updated']
+        datetime_string = self._state_value('last_updated', max_age=max_age)
         return datetime.strptime(datetime_string, "%Y-%m-%dT%H:%M:%S")
     last_updated = _get_last_updated
 
@@ -57,3 +45,16 @@ SENSOR_TYPES = {
     'ZLLTemperature': TemperatureSensor,
     'ZLLPresence': MotionSensor,
 }
+
+
+def state_fingerprint(sensor_data):
+    """ Returns a cheap fingerprint of a sensor's API data, used to skip sensors that haven't changed between syncs.
+
+        Sensors report when their state last changed, which is enough to tell changes apart.
+        Sensors that never report it (like the daylight sensor) fall back to their full state.
+    """
+    state = sensor_data['state']
+    last_updated = state.get('lastupdated', 'none')
+    if last_updated != 'none':
+        return sensor_data['name'], last_updated
+    return sensor_data['name'], sorted(state.items())
@@ -0,0 +1,147 @@
+from collections.abc import MutableMapping
+
+
+class DeviceState(MutableMapping):
+    """ Last known state of a device, using huegely names. Devices keep one of these and update it in place.
+
+        Attributes the device type is known to have (see ``_state_fields`` on the device's features) are stored in
+        slots, so a device's state takes a fraction of the memory of a dictionary. Any other attributes reported
+        by the bridge are kept in a dictionary on the side. States behave like a (mutable) dictionary of all of them,
+        ``as_dict()`` returns one.
+    """
+    __slots__ = ('_extra',)
+
+    # Names of the slots, in the order they're iterated in
+    _fields = ()
+    _field_set = frozenset()
+
+    def __init__(self, state=None):
+        self._extra = None
+        if state:
+            self.assign(state)
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for field in self._fields:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for field in self._fields if hasattr(self, field)) + len(self._extra or ())
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+    def __reduce__(self):
+        # State classes are built at runtime (see ``state_type``), so they are pickled as dictionaries
+        return dict, (self.as_dict(),)
+
+    def as_dict(self):
+        """ Returns the state as a new dictionary. """
+        state = {}
+        for field in self._fields:
+            try:
+                state[field] = getattr(self, field)
+            except AttributeError:
+                pass
+        if self._extra is not None:
+            state.update(self._extra)
+        return state
+
+    def assign(self, state):
+        """ Replaces all attributes with the ones in the huegely-named *state*. """
+        for field in self._fields:
+            try:
+                delattr(self, field)
+            except AttributeError:
+                pass
+        self._extra = None
+
+        for key, value in state.items():
+            self[key] = value
+
+
+class LightState(DeviceState):
+    __slots__ = ('on', 'alert', 'is_reachable')
+    _fields = __slots__
+    _field_set = frozenset(_fields)
+
+
+class GroupAction(DeviceState):
+    __slots__ = ('on', 'alert')
+    _fields = __slots__
+    _field_set = frozenset(_fields)
+
+
+class SensorState(DeviceState):
+    __slots__ = ('last_updated',)
+    _fields = __slots__
+    _field_set = frozenset(_fields)
+
+
+# Device class -> state class, and (base state class, fields) -> state class, see ``state_type``
+_device_state_types = {}
+_state_types = {}
+
+
+def state_type(device_type):
+    """ Returns the state class for *device_type*: its ``_state_type`` (e.g. LightState), extended with the
+        ``_state_fields`` of all features the device type has. Device types with the same features share a class.
+    """
+    try:
+        return _device_state_types[device_type]
+    except KeyError:
+        pass
+
+    base = device_type._state_type
+    fields = []
+    for cls in reversed(device_type.__mro__):
+        for field in cls.__dict__.get('_state_fields', ()):
+            if field not in fields and field not in base._field_set:
+                fields.append(field)
+    fields = tuple(fields)
+
+    state_class = _state_types.get((base, fields))
+    if state_class is None:
+        state_class = _state_types[(base, fields)] = type(base.__name__, (base,), {
+            '__slots__': fields,
+            '_fields': base._fields + fields,
+            '_field_set': base._field_set | frozenset(fields),
+        })
+    _device_state_types[device_type] = state_class
+    return state_class
@@ -1,4 +1,4 @@
-from huegely import constants
+from huegely import codec
 
 
 def parse_attribute_from_url(resource_url):
@@ -13,13 +13,9 @@ def parse_attribute_from_url(resource_url):
 
 def huegely_to_hue_names(attributes):
     """ Maps attributes to their hue API names, e.g. 'brightness' becomes 'bri'. """
-    return {
-        constants.HUEGELY_TO_HUE_MAPPING.setdefault(key, key): value for key, value in attributes.items()
-    }
+    return codec.NAMES.encode(attributes)
 
 
 def hue_to_huegely_names(attributes):
     """ Maps attributes to their huegely names, e.g. 'bri' becomes 'brightness'. """
-    return {
-        constants.HUE_TO_HUEGELY_MAPPING.setdefault(key, key): value for key, value in attributes.items()
-    }
+    return codec.NAMES.decode(attributes)
@@ -0,0 +1,106 @@
+import time
+
+from collections import namedtuple
+
+
+# A single changed attribute of a device, using huegely attribute names
+ChangeEvent = namedtuple('ChangeEvent', ['device', 'attribute', 'old_value', 'new_value'])
+
+
+class Watcher(object):
+    """ Polls the bridge for changes and yields a ChangeEvent for every changed attribute. Use via ``bridge.watch()``::
+
+            for event in bridge.watch():
+                print(event.device, event.attribute, event.old_value, event.new_value)
+
+        Each poll makes one request per device kind in *kinds* ('lights', 'groups' and 'sensors').
+        The first poll only records the current state. Polling speeds up to *min_interval* seconds whenever something
+        changed and slows down by a factor of *backoff* per quiet poll, up to *max_interval* seconds.
+
+        Watched devices always know their latest polled state (see ``state(max_age=...)``).
+    """
+    def __init__(self, bridge, kinds=('lights', 'groups', 'sensors'), min_interval=0.5, max_interval=10, backoff=1.5):
+        self.bridge = bridge
+        self.kinds = kinds
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+
+        self._builders = {
+            'lights': bridge._build_lights,
+            'groups': bridge._build_groups,
+            'sensors': bridge._build_sensors,
+        }
+
+        # (kind, device_id) -> device, and the last state seen for it
+        self._devices = {}
+        self._states = {}
+        self._unsupported = set()
+        self._initialized = False
+
+    def __iter__(self):
+        while True:
+            for event in self.poll():
+                yield event
+            time.sleep(self.interval)
+
+    def poll(self):
+        """ Polls the bridge once and returns the list of changes since the last poll. Adjusts the polling interval. """
+        events = []
+        for kind in self.kinds:
+            events += self._process_kind(kind, self.bridge.make_request(kind))
+        return self._finish_poll(events)
+
+    def _finish_poll(self, events):
+        """ Adjusts the polling interval after a poll that found *events*, and returns them. """
+        # Nothing can have changed on the first poll, so it doesn't count as activity
+        if events or not self._initialized:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+        self._initialized = True
+        return events
+
+    def _process_kind(self, kind, data):
+        """ Returns the changes in *data*, the bridge's listing of all devices of *kind*, since the last poll. """
+        events = []
+        for device_id, device_data in data.items():
+            key = (kind, int(device_id))
+            device = self._devices.get(key)
+            if device is None:
+                device = self._add_device(key, device_id, device_data)
+                if device is None:
+                    continue
+
+            new_state = device._process_device(device_data)
+            old_state = self._states.get(key)
+            self._states[key] = new_state
+
+            if old_state is None:
+                continue
+
+            for attribute in sorted(set(old_state) | set(new_state)):
+                old_value, new_value = old_state.get(attribute), new_state.get(attribute)
+                if old_value != new_value:
+                    events.append(ChangeEvent(device, attribute, old_value, new_value))
+
+        # Forget devices that have been removed from the bridge
+        for key in [key for key in self._devices if key[0] == kind and str(key[1]) not in data]:
+            del self._devices[key]
+            del self._states[key]
+
+        return events
+
+    def _add_device(self, key, device_id, device_data):
+        if key in self._unsupported:
+            return None
+
+        devices = self._builders[key[0]]({device_id: device_data})
+        if not devices:
+            self._unsupported.add(key)
+            return None
+
+        self._devices[key] = devices[0]
+        return devices[0]
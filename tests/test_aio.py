@@ -0,0 +1,203 @@
+import asyncio
+import unittest
+import mock
+
+from huegely import (
+    aio,
+    exceptions,
+    lights,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+def run(coroutine_function):
+    """ Runs *coroutine_function* with a fresh AsyncBridge and closes the bridge afterwards. """
+    async def wrapper():
+        async with aio.AsyncBridge('127.0.0.1', 'fake_token') as bridge:
+            return await coroutine_function(bridge)
+    return asyncio.run(wrapper())
+
+
+@unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+class AsyncBridgeTests(unittest.TestCase):
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_LIGHTS))
+    def test_lights(self, mock_request):
+        found_lights = run(lambda bridge: bridge.lights())
+
+        self.assertEqual([1, 2], [light.device_id for light in found_lights])
+        self.assertIsInstance(found_lights[0], aio.AsyncExtendedColorLight)
+        self.assertIsInstance(found_lights[0], lights.ExtendedColorLight)
+        self.assertIsInstance(found_lights[1], aio.AsyncDimmableLight)
+
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_GROUPS))
+    def test_groups(self, mock_request):
+        found_groups = run(lambda bridge: bridge.groups())
+
+        self.assertEqual([1, 2, 3], [group.device_id for group in found_groups])
+        self.assertIsInstance(found_groups[0], aio.AsyncExtendedColorGroup)
+        self.assertIsInstance(found_groups[2], aio.AsyncDimmableGroup)
+
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_SENSORS))
+    def test_sensors(self, mock_request):
+        found_sensors = run(lambda bridge: bridge.sensors())
+        self.assertEqual([1, 2], [sensor.device_id for sensor in found_sensors])
+
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_FULL_STATE))
+    def test_membership(self, mock_request):
+        async def memberships(bridge):
+            group_lights = await aio.AsyncDimmableGroup(bridge, 2).lights()
+            light_groups = await group_lights[0].groups()
+            return group_lights, light_groups
+
+        group_lights, light_groups = run(memberships)
+        self.assertEqual([1, 2], [light.device_id for light in group_lights])
+        self.assertIsInstance(group_lights[0], aio.AsyncExtendedColorLight)
+        self.assertEqual([1, 2], [group.device_id for group in light_groups])
+        self.assertEqual(mock_request.call_count, 1)
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_map(self, mock_request):
+        def respond(method, url, **kwargs):
+            if '/lights/2/' in url:
+                return test_utils.MockAsyncResponse([{"error": {"type": 201, "address": "don't care", "description": "Off"}}])
+            return test_utils.MockAsyncResponse([{'success': {'/lights/x/state/on': True}}])
+        mock_request.side_effect = respond
+
+        async def turn_on(bridge):
+            return await bridge.map([aio.AsyncDimmableLight(bridge, light_id) for light_id in [1, 2, 3]], lambda light: light.on())
+
+        with self.assertRaises(exceptions.BulkHueError) as context:
+            run(turn_on)
+        self.assertEqual(context.exception.results, [True, None, True])
+
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse([{"error": {'type': 0, 'description': 'Fake'}}]))
+    def test_make_request_error(self, mock_request):
+        with self.assertRaises(exceptions.HueError):
+            run(lambda bridge: bridge.make_request('lights/1/state', method='PUT', on=True))
+
+
+@unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+class AsyncLightTests(unittest.TestCase):
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_LIGHTS['1']))
+    def test_get_state(self, mock_request):
+        async def get_state(bridge):
+            light = aio.AsyncExtendedColorLight(bridge, 1)
+            return await light.state(), await light.hue(), await light.brightness()
+
+        state, hue, brightness = run(get_state)
+        self.assertTrue('brightness' in state)
+        self.assertEqual(hue, 14678)
+        self.assertEqual(brightness, 254)
+
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse([{"success": {"/lights/1/state/bri": 200}}]))
+    def test_set_state(self, mock_request):
+        async def set_brightness(bridge):
+            return await aio.AsyncExtendedColorLight(bridge, 1).brightness(200, transition_time=10)
+
+        self.assertEqual(run(set_brightness), 200)
+        self.assertEqual(mock_request.call_args[1]['json'], {'on': True, 'bri': 200, 'transitiontime': 1})
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_concurrent_commands(self, mock_request):
+        mock_request.return_value = test_utils.MockAsyncResponse([{"success": {"/lights/1/state/on": True}}])
+
+        async def turn_on(bridge):
+            return await asyncio.gather(*[aio.AsyncDimmableLight(bridge, i).on() for i in range(20)])
+
+        self.assertEqual(run(turn_on), [True] * 20)
+        self.assertEqual(mock_request.call_count, 20)
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_group_brighter(self, mock_request):
+        """ Groups need a second request to find out the new brightness, same as the sync version. """
+        mock_request.side_effect = [
+            test_utils.MockAsyncResponse([{"success": {"bri_inc": 10}}]),
+            test_utils.MockAsyncResponse(fake_data.BRIDGE_GROUPS['1']),
+        ]
+
+        async def brighter(bridge):
+            return await aio.AsyncExtendedColorGroup(bridge, 1).brighter(10)
+
+        self.assertEqual(run(brighter), 254)
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_transition_brightness_reset(self, mock_request):
+        mock_request.side_effect = [
+            test_utils.MockAsyncResponse(fake_data.BRIDGE_LIGHTS['1']),
+            test_utils.MockAsyncResponse([{'success': {'on': False}}]),
+        ]
+
+        async def off(bridge):
+            light = aio.AsyncExtendedColorLight(bridge, 1)
+            await light.off(transition_time=0)
+            return light._reset_brightness_to
+
+        self.assertEqual(run(off), fake_data.BRIDGE_LIGHTS['1']['state']['bri'])
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_darker_turns_off(self, mock_request):
+        """ Like the sync version, going below the lowest brightness turns the light off in the same request. """
+        mock_request.side_effect = [
+            test_utils.MockAsyncResponse([{"success": {"/lights/1/state/bri": 1}}, {"success": {"/lights/1/state/on": False}}]),
+            test_utils.MockAsyncResponse([{"error": {"type": 201, "address": "", "description": ""}}]),
+            test_utils.MockAsyncResponse([{"success": {"/lights/2/state/on": True, "/lights/2/state/bri": 25}}]),
+        ]
+
+        async def darker_and_back(bridge):
+            light = aio.AsyncExtendedColorLight(bridge, 1, state={'on': True, 'bri': 20})
+            light.cache_ttl = 60
+            darker = await light.darker(20)
+
+            # A light that was turned off elsewhere fails the first request, the retry needs no GET
+            other_light = aio.AsyncExtendedColorLight(bridge, 2, state={'on': True, 'bri': 20})
+            other_light.cache_ttl = 60
+            return darker, await other_light.brighter(), other_light._state['on']
+
+        self.assertEqual(run(darker_and_back), (0, 25, True))
+        self.assertEqual(mock_request.call_args_list[0][1]['json'], {'bri_inc': -20, 'on': False})
+        self.assertEqual([call[0][0] for call in mock_request.call_args_list], ['PUT', 'PUT', 'PUT'])
+
+    def test_sync_context_manager(self):
+        with self.assertRaises(TypeError):
+            with aio.AsyncBridge('127.0.0.1', 'fake_token'):
+                pass
+
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse([{'success': {'/lights/1/state/hue': 1}}]))
+    def test_shared_validation(self, mock_request):
+        """ Async devices clamp and validate values exactly like the sync ones. """
+        async def update(bridge):
+            light = aio.AsyncExtendedColorLight(bridge, 1)
+            await light.hue(65536)
+            with self.assertRaises(exceptions.HueError):
+                await light.effect('disco')
+
+        run(update)
+        self.assertEqual(mock_request.call_args[1]['json'], {'hue': 1})
+        self.assertEqual(mock_request.call_count, 1)
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_set_many(self, mock_request):
+        def respond(method, url, json, **kwargs):
+            if method == 'PUT':
+                return test_utils.MockAsyncResponse([{'success': {'/groups/2/action/on': json['on']}}])
+            return test_utils.MockAsyncResponse(fake_data.BRIDGE_LIGHTS if url.endswith('lights') else fake_data.BRIDGE_FULL_STATE)
+        mock_request.side_effect = respond
+
+        async def turn_off(bridge):
+            bridge.cache_ttl = 60
+            found_lights = await bridge.lights()
+            responses = await bridge.set_many(found_lights, on=False)
+            await bridge.set_many(found_lights[:1], on=False)
+            return responses, [await light.is_on() for light in found_lights]
+
+        responses, on = run(turn_off)
+        self.assertEqual([(device.device_id, response) for device, response in responses], [(2, {'on': False})])
+        self.assertIsInstance(responses[0][0], aio.AsyncGroup)
+        self.assertEqual(on, [False, False])
+
+        # Listing, building the membership index, the group command, and the single light's command
+        self.assertEqual(mock_request.call_count, 4)
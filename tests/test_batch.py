@@ -0,0 +1,157 @@
+import asyncio
+import unittest
+import mock
+
+from huegely import (
+    aio,
+    bridge,
+    exceptions,
+    groups,
+    lights,
+)
+
+from . import test_utils
+
+
+class BatchTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('127.0.0.1', 'fake_token')
+        self.light = lights.ExtendedColorLight(self.fake_bridge, 1)
+        self.other_light = lights.DimmableLight(self.fake_bridge, 2)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_updates_are_merged_per_device(self, mock_request):
+        def respond(method, url, json, **kwargs):
+            device_url = url.split('/api/fake_token/', 1)[1]
+            return test_utils.MockResponse([
+                {'success': {'/{}/{}'.format(device_url, key): value}} for key, value in json.items()
+            ])
+        mock_request.side_effect = respond
+
+        with self.fake_bridge.batch() as batch:
+            on = self.light.on()
+            self.light.brightness(200)
+            hue = self.light.hue(1000)
+            self.other_light.on()
+
+            # Inside the batch, the requested values are returned, but nothing has been sent yet
+            self.assertTrue(on)
+            self.assertEqual(hue, 1000)
+            self.assertEqual(len(batch), 2)
+            self.assertFalse(mock_request.called)
+
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.call_args_list[0][1]['json'], {'on': True, 'bri': 200, 'hue': 1000})
+        self.assertEqual(mock_request.call_args_list[1][1]['json'], {'on': True})
+        self.assertIsNone(self.fake_bridge.current_batch)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_results(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse([
+            {'success': {'/lights/1/state/on': True}},
+            {'success': {'/lights/1/state/bri': 200}},
+        ])
+
+        with self.fake_bridge.batch():
+            on_result = self.light.state(on=True)
+            brightness_result = self.light.state(brightness=200)
+            self.assertFalse(on_result.done())
+
+        # Each call gets the part of the response it asked for
+        self.assertEqual(on_result.result(), {'on': True})
+        self.assertEqual(brightness_result.result(), {'brightness': 200})
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_brightness_steps(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse([{'success': {'/groups/1/action/bri_inc': 30}}])
+        group = groups.DimmableGroup(self.fake_bridge, 1)
+
+        with self.fake_bridge.batch():
+            self.assertIsNone(group.brighter(20))
+            group.brighter(20)
+            group.darker(10)
+
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(mock_request.call_args[1]['json'], {'bri_inc': 30})
+
+        with self.fake_bridge.batch():
+            group.brightness(100)
+            group.brighter(20)
+
+        self.assertEqual(mock_request.call_args[1]['json'], {'on': True, 'bri': 120})
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_errors(self, mock_request):
+        def respond(method, url, json, **kwargs):
+            if '/lights/1/' in url:
+                return test_utils.MockResponse([{"error": {"type": 0, "address": "don't care", "description": "Don't care"}}])
+            return test_utils.MockResponse([{'success': {'/lights/2/state/on': True}}])
+        mock_request.side_effect = respond
+
+        with self.assertRaises(exceptions.HueError):
+            with self.fake_bridge.batch():
+                failing = self.light.state(on=True)
+                succeeding = self.other_light.state(on=True)
+
+        # All updates are attempted, failed ones raise their error
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(succeeding.result(), {'on': True})
+        with self.assertRaises(exceptions.HueError):
+            failing.result()
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_exception_cancels_batch(self, mock_request):
+        with self.assertRaises(ValueError):
+            with self.fake_bridge.batch():
+                result = self.light.state(on=True)
+                raise ValueError()
+
+        self.assertFalse(mock_request.called)
+        self.assertTrue(result._future.cancelled())
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_brightness_reset_bookkeeping(self, mock_request):
+        """ The brightness to re-apply after turning off with a transition time is only remembered once the batch is sent. """
+        self.light.cache_ttl = 60
+        self.light._store_state({'on': True, 'brightness': 150})
+        mock_request.return_value = test_utils.MockResponse([{'success': {'/lights/1/state/on': False}}])
+
+        with self.assertRaises(ValueError):
+            with self.fake_bridge.batch():
+                self.light.off(transition_time=10)
+                raise ValueError()
+        self.assertIsNone(self.light._reset_brightness_to)
+
+        with self.fake_bridge.batch():
+            self.light.off(transition_time=10)
+            self.assertIsNone(self.light._reset_brightness_to)
+        self.assertEqual(self.light._reset_brightness_to, 150)
+
+    @unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_async(self, mock_request):
+        def respond(method, url, json, **kwargs):
+            device_url = url.split('/api/fake_token/', 1)[1]
+            return test_utils.MockAsyncResponse([
+                {'success': {'/{}/{}'.format(device_url, key): value}} for key, value in json.items()
+            ])
+        mock_request.side_effect = respond
+
+        async def update():
+            async with aio.AsyncBridge('127.0.0.1', 'fake_token') as async_bridge:
+                light = aio.AsyncExtendedColorLight(async_bridge, 1)
+                other_light = aio.AsyncDimmableLight(async_bridge, 2)
+
+                async with async_bridge.batch():
+                    # Tasks started inside the batch are part of it
+                    await asyncio.gather(light.on(), light.brightness(200), other_light.on())
+                    self.assertFalse(mock_request.called)
+                    brighter = await other_light.brighter(10)
+
+                self.assertIsNone(async_bridge.current_batch)
+                return brighter
+
+        self.assertIsNone(asyncio.run(update()))
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.call_args_list[0][1]['json'], {'on': True, 'bri': 200})
+        self.assertEqual(mock_request.call_args_list[1][1]['json'], {'on': True, 'bri_inc': 10})
@@ -0,0 +1,60 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from huegely import bench
+
+
+class BenchTests(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(bench.percentile(values, 0.5), 50)
+        self.assertEqual(bench.percentile(values, 0.95), 95)
+        self.assertEqual(bench.percentile(values, 0.99), 99)
+        self.assertEqual(bench.percentile([3], 0.99), 3)
+        self.assertIsNone(bench.percentile([], 0.5))
+
+    def test_make_datastore(self):
+        datastore = bench.make_datastore(lights=5)
+        self.assertEqual(list(datastore['lights']), ['1', '2', '3', '4', '5'])
+        self.assertEqual(datastore['groups']['1']['lights'], ['1', '2', '3', '4', '5'])
+        self.assertEqual({sensor['type'] for sensor in datastore['sensors'].values()}, {'ZLLTemperature', 'ZLLPresence'})
+
+    def test_run(self):
+        report = bench.run(scenarios=['default', 'concurrent'], iterations=3, lights=3)
+
+        results = {(result['scenario'], result['operation']): result for result in report['results']}
+        self.assertEqual(len(results), len(bench.OPERATIONS) + len(bench.CONCURRENT_OPERATIONS))
+
+        self.assertEqual(results[('default', 'Dimmer.on')]['requests_per_op'], 1)
+        self.assertEqual(results[('default', 'Group.lights')]['requests_per_op'], 0)
+        self.assertEqual(results[('concurrent', 'Dimmer.on')]['ops'], 9)
+        self.assertEqual(set(results[('default', 'Dimmer.on')]['latency_ms']), {'mean', 'p50', 'p95', 'p99'})
+
+        self.assertEqual(report['memory']['devices'], 3)
+        self.assertGreater(report['memory']['bytes_per_device'], report['memory']['state_bytes_per_device'])
+
+        # Reports can be saved as JSON
+        json.dumps(report)
+
+    def test_compare(self):
+        report = bench.run(scenarios=['default'], iterations=1, lights=1)
+        comparison = bench.compare(report, report)
+        self.assertEqual(len(comparison), len(bench.OPERATIONS))
+        self.assertTrue(all(latency == 1 and requests in (1, None) for _, _, latency, requests in comparison))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            bench.main(['--scenario', 'default', '--iterations', '1', '--lights', '1', '--output', output])
+
+            with open(output) as output_file:
+                report = json.load(output_file)
+            self.assertEqual(report['settings']['iterations'], 1)
+
+            out = io.StringIO()
+            bench.print_report(report, baseline=report, out=out)
+            self.assertIn('Dimmer.on', out.getvalue())
+            self.assertIn('1.00x', out.getvalue())
@@ -1,7 +1,14 @@
+import copy
+import gc
+import threading
 import unittest
 import mock
 
-from huegely import exceptions
+from huegely import (
+    exceptions,
+    groups,
+    lights,
+)
 from huegely.bridge import Bridge
 
 from . import (
@@ -15,7 +22,7 @@ class BridgeTests(unittest.TestCase):
         success_data = [{"success": {"username": "test"}}]
         error_data = [{"error": {'type': 110, 'description': 'Fake button not pressed'}}]
 
-        with mock.patch('huegely.bridge.request') as mock_request:
+        with mock.patch('huegely.bridge.Session.request') as mock_request:
             # Fake success
             mock_request.return_value = test_utils.MockResponse(success_data)
             bridge = Bridge('192.168.1.2')
@@ -27,7 +34,7 @@ class BridgeTests(unittest.TestCase):
             with self.assertRaises(exceptions.HueError):
                 bridge.get_token('test_app')
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request')
     def test_make_request_list_response(self, mock_request):
         """ make_request doesn't attempt to do any processing with list responses, as their
             format is directly usable. (They're used for listing lights/groups/etc)
@@ -39,7 +46,7 @@ class BridgeTests(unittest.TestCase):
         response = bridge.make_request('some_path')
         self.assertEqual(data, response)
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request')
     def test_make_request_empty_response_error(self, mock_request):
         """ Empty responses from the hue api mean something unexpected went wrong, so we raise an error.
         """
@@ -50,23 +57,242 @@ class BridgeTests(unittest.TestCase):
         with self.assertRaises(exceptions.HueError):
             bridge.make_request('some_path')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_CONF))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_CONF))
     def test_get_name(self, mock_request):
         bridge = Bridge('192.168.1.2', 'fake_token')
         self.assertEqual(bridge.name(), fake_data.BRIDGE_CONF['name'])
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"name": "new_name"}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"name": "new_name"}}]))
     def test_set_name(self, mock_request):
         bridge = Bridge('192.168.1.2', 'fake_token')
         self.assertEqual(bridge.name('new_name'), 'new_name')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
     def test_lights(self, mock_request):
         bridge = Bridge('192.168.1.2', 'fake_token')
         self.assertEqual([1, 2], [light.device_id for light in bridge.lights()])
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_GROUPS))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_identity_map(self, mock_request):
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        first_lights = bridge.lights()
+        first_lights[0].transition_time = 5
+        first_lights[0]._reset_brightness_to = 100
+
+        # Discovering the lights again returns the same objects, updated in place
+        changed_lights = copy.deepcopy(fake_data.BRIDGE_LIGHTS)
+        changed_lights['1']['name'] = 'Renamed'
+        changed_lights['1']['state']['bri'] = 10
+        mock_request.return_value = test_utils.MockResponse(changed_lights)
+
+        second_lights = bridge.lights()
+        self.assertIs(second_lights[0], first_lights[0])
+        self.assertIs(second_lights[1], first_lights[1])
+        self.assertEqual(str(second_lights[0]), 'Renamed')
+        self.assertEqual(second_lights[0].state(max_age=10)['brightness'], 10)
+        self.assertEqual(second_lights[0].transition_time, 5)
+        self.assertEqual(second_lights[0]._reset_brightness_to, 100)
+
+        # Snapshots share the objects too
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE)
+        self.assertIs(bridge.snapshot().lights[0], first_lights[0])
+
+        # A device whose type changed gets a new object
+        changed_lights['2']['type'] = 'Color light'
+        mock_request.return_value = test_utils.MockResponse(changed_lights)
+        third_lights = bridge.lights()
+        self.assertIsNot(third_lights[1], first_lights[1])
+        self.assertIsInstance(third_lights[1], lights.ColorLight)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_identity_map_is_weak(self, mock_request):
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        bridge.lights()
+        self.assertIn(('lights', 2), bridge._devices)
+
+        # Light 2 was removed from the bridge. Once nothing uses it anymore, it's collected.
+        mock_request.return_value = test_utils.MockResponse({'1': fake_data.BRIDGE_LIGHTS['1']})
+        bridge.lights()
+        gc.collect()
+        self.assertNotIn(('lights', 2), bridge._devices)
+        self.assertIn(('lights', 1), bridge._devices)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_GROUPS))
     def test_groups(self, mock_request):
         bridge = Bridge('192.168.1.2', 'fake_token')
         groups = bridge.groups()
         self.assertEqual([1, 2, 3], [group.device_id for group in groups])
+
+    def test_connection_pool(self):
+        """ Every bridge owns a session with a keep-alive connection pool of the configured size. """
+        bridge = Bridge('192.168.1.2', 'fake_token', pool_size=3)
+        adapter = bridge.session.get_adapter('http://192.168.1.2/api/')
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_CONF))
+    def test_warm_up(self, mock_request):
+        bridge = Bridge('192.168.1.2', 'fake_token', pool_size=3, prewarm=True)
+        self.assertEqual(mock_request.call_count, 3)
+
+        bridge.warm_up(connections=1)
+        self.assertEqual(mock_request.call_count, 4)
+
+    @mock.patch('huegely.bridge.Session.close')
+    def test_close(self, mock_close):
+        with Bridge('192.168.1.2', 'fake_token') as bridge:
+            self.assertFalse(mock_close.called)
+        self.assertTrue(mock_close.called)
+
+        bridge.close()
+        self.assertEqual(mock_close.call_count, 2)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE))
+    def test_snapshot(self, mock_request):
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        snapshot = bridge.snapshot()
+
+        self.assertEqual(mock_request.call_args[0], ('GET', 'http://192.168.1.2/api/fake_token/'))
+        self.assertEqual(snapshot.name, fake_data.BRIDGE_CONF['name'])
+        self.assertEqual([1, 2], [light.device_id for light in snapshot.lights])
+        self.assertEqual([1, 2, 3], [group.device_id for group in snapshot.groups])
+        self.assertEqual([1, 2], [sensor.device_id for sensor in snapshot.sensors])
+
+        # All devices know their state, reading it causes no further requests
+        self.assertEqual(snapshot.lights[0].state(max_age=60)['brightness'], 254)
+        self.assertEqual(snapshot.groups[2].state(max_age=60)['on'], False)
+        self.assertEqual(snapshot.sensors[1].state(max_age=60)['presence'], False)
+        self.assertEqual(mock_request.call_count, 1)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_refresh(self, mock_request):
+        """ Refreshing many devices makes one request per device kind. """
+        def respond(method, url, **kwargs):
+            return test_utils.MockResponse(fake_data.BRIDGE_LIGHTS if url.endswith('lights') else fake_data.BRIDGE_GROUPS)
+        mock_request.side_effect = respond
+
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        devices = [
+            lights.DimmableLight(bridge, 2),
+            lights.ExtendedColorLight(bridge, 1),
+            groups.DimmableGroup(bridge, 3),
+        ]
+        states = bridge.refresh(devices)
+
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual([state['on'] for state in states], [False, True, False])
+        self.assertEqual(devices[1].state(max_age=60)['hue'], 14678)
+        self.assertEqual(str(devices[0]), 'Light 2')
+        self.assertEqual(mock_request.call_count, 2)
+
+        # Devices the bridge doesn't know about raise an error
+        with self.assertRaises(exceptions.HueError):
+            bridge.refresh([lights.DimmableLight(bridge, 10)])
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_set_many(self, mock_request):
+        full_state = copy.deepcopy(fake_data.BRIDGE_FULL_STATE)
+        full_state['lights']['3'] = dict(full_state['lights']['2'], name='Light 3')
+
+        def respond(method, url, **kwargs):
+            path = url.split('/api/fake_token', 1)[1].strip('/')
+            if method == 'PUT':
+                return test_utils.MockResponse([{'success': {'/x/on': True}}])
+            if path == 'groups/0':
+                return test_utils.MockResponse(dict(full_state['groups']['2'], lights=['1', '2', '3']))
+            return test_utils.MockResponse(full_state)
+        mock_request.side_effect = respond
+
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        light_1, light_2, light_3 = [lights.DimmableLight(bridge, light_id) for light_id in [1, 2, 3]]
+
+        # Single lights are addressed directly, without planning
+        responses = bridge.set_many([light_3], on=True)
+        self.assertEqual([device for device, _ in responses], [light_3])
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Lights 1 and 2 are group 2. The membership index is built once, with a single request.
+        responses = bridge.set_many([light_2, light_1], on=True)
+        self.assertEqual([(device.device_id, response) for device, response in responses], [(2, {'on': True})])
+        self.assertIsInstance(responses[0][0], groups.Group)
+        self.assertTrue(mock_request.call_args[0][1].endswith('groups/2/action'))
+        self.assertEqual(mock_request.call_count, 3)
+
+        bridge.set_many([light_2, light_1], on=True)
+        self.assertEqual(mock_request.call_count, 4)
+
+        # All lights are group 0, which is fetched the first time it's needed
+        responses = bridge.set_many([light_1, light_2, light_3], on=True)
+        self.assertEqual([device.device_id for device, _ in responses], [0])
+        self.assertTrue(mock_request.call_args[0][1].endswith('groups/0/action'))
+        self.assertEqual(mock_request.call_count, 6)
+
+        bridge.set_many([light_1, light_2, light_3], on=True)
+        self.assertEqual(mock_request.call_count, 7)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_set_many_updates_lights(self, mock_request):
+        def respond(method, url, **kwargs):
+            if method == 'PUT':
+                return test_utils.MockResponse([{'success': {'/groups/2/action/{}'.format(key): value}} for key, value in kwargs['json'].items()])
+            path = url.split('/api/fake_token', 1)[1].strip('/')
+            kind, _, device_id = path.partition('/')
+            data = fake_data.BRIDGE_GROUPS if kind == 'groups' else fake_data.BRIDGE_LIGHTS
+            return test_utils.MockResponse(data[device_id] if device_id else data if path else fake_data.BRIDGE_FULL_STATE)
+        mock_request.side_effect = respond
+
+        bridge = Bridge('192.168.1.2', 'fake_token', cache_ttl=60)
+        found_lights = bridge.snapshot().lights
+        self.assertTrue(found_lights[0].is_on())
+
+        # The group command's outcome is applied to the lights it updated
+        bridge.set_many(found_lights, on=False)
+        self.assertEqual([light.is_on() for light in found_lights], [False, False])
+        self.assertEqual(mock_request.call_count, 2)
+
+        # Relative brightness changes depend on each light, so they need to get their state again
+        bridge.set_many(found_lights, brighter=10)
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertTrue(found_lights[0].is_on())
+        self.assertEqual(mock_request.call_count, 4)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_map(self, mock_request):
+        def respond(method, url, **kwargs):
+            if '/lights/2/' in url:
+                return test_utils.MockResponse([{"error": {"type": 201, "address": "don't care", "description": "Off"}}])
+            return test_utils.MockResponse([{'success': {'/lights/x/state/hue': 100}}])
+        mock_request.side_effect = respond
+
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        devices = [lights.ExtendedColorLight(bridge, light_id) for light_id in [1, 3, 4]]
+
+        # Calls run in parallel, the barrier would time out otherwise
+        barrier = threading.Barrier(3, timeout=5)
+
+        def set_hue(light):
+            barrier.wait()
+            return light.hue(100)
+
+        self.assertEqual(bridge.map(devices, set_hue), [100, 100, 100])
+
+        # Errors are collected, all other calls still complete
+        devices.insert(1, lights.ExtendedColorLight(bridge, 2))
+        with self.assertRaises(exceptions.BulkHueError) as context:
+            bridge.map(devices, lambda light: light.hue(100), max_workers=2)
+
+        self.assertEqual(context.exception.results, [100, None, 100, 100])
+        self.assertEqual([error.device for error in context.exception.errors], [devices[1]])
+        self.assertEqual(context.exception.errors[0].error_code, exceptions.CANNOT_MODIFY_WHILE_OFF)
+
+    def test_map_same_device(self):
+        """ Calls for the same device never run at the same time. """
+        bridge = Bridge('192.168.1.2', 'fake_token')
+        running = []
+
+        def call(light):
+            running.append(light.device_id)
+            self.assertEqual(running.count(light.device_id), 1)
+            threading.Event().wait(0.01)
+            running.remove(light.device_id)
+
+        bridge.map([lights.DimmableLight(bridge, 1) for _ in range(5)], call)
@@ -0,0 +1,106 @@
+import threading
+import unittest
+import mock
+
+from huegely import (
+    bridge,
+    cluster,
+    exceptions,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+FIRST = ('192.168.1.2', 'token_1')
+SECOND = ('192.168.1.3', 'token_2')
+
+
+class BridgeClusterTests(unittest.TestCase):
+    def setUp(self):
+        self.bridges = [bridge.Bridge('192.168.1.2', 'token_1'), bridge.Bridge('192.168.1.3', 'token_2')]
+        self.cluster = cluster.BridgeCluster(self.bridges)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_lights(self, mock_request):
+        found_lights = self.cluster.lights()
+
+        self.assertEqual(list(found_lights), [(FIRST, 1), (FIRST, 2), (SECOND, 1), (SECOND, 2)])
+        self.assertIs(found_lights[(SECOND, 2)].bridge, self.bridges[1])
+        self.assertEqual(self.cluster.key(found_lights[(SECOND, 2)]), (SECOND, 2))
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE))
+    def test_snapshot_is_concurrent(self, mock_request):
+        # Each bridge waits for the other one, this only works if both requests are in flight at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def respond(*args, **kwargs):
+            barrier.wait()
+            return test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE)
+        mock_request.side_effect = respond
+
+        snapshots = self.cluster.snapshot()
+        self.assertEqual(list(snapshots), [FIRST, SECOND])
+        self.assertEqual(len(snapshots[SECOND].lights), 2)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_map(self, mock_request):
+        def respond(method, url, **kwargs):
+            if method == 'GET':
+                return test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+            if url.startswith('http://192.168.1.3/') and '/lights/2/' in url:
+                return test_utils.MockResponse([{"error": {"type": 201, "address": "don't care", "description": "Off"}}])
+            return test_utils.MockResponse([{'success': {'/lights/x/state/on': True}}])
+        mock_request.side_effect = respond
+
+        found_lights = list(self.cluster.lights().values())
+
+        # Commands are routed to the bridge of each light, results keep their order
+        with self.assertRaises(exceptions.BulkHueError) as context:
+            self.cluster.map(found_lights, lambda light: light.on())
+        self.assertEqual(context.exception.results, [True, True, True, None])
+        self.assertEqual([error.device for error in context.exception.errors], [found_lights[3]])
+
+        self.assertEqual(self.cluster.map(found_lights[:3], lambda light: light.on()), [True, True, True])
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_set_many(self, mock_request):
+        def respond(method, url, **kwargs):
+            if method == 'GET':
+                return test_utils.MockResponse(fake_data.BRIDGE_LIGHTS if url.endswith('lights') else fake_data.BRIDGE_FULL_STATE)
+            return test_utils.MockResponse([{'success': {'/groups/2/action/on': True}}])
+        mock_request.side_effect = respond
+
+        found_lights = list(self.cluster.lights().values())
+        responses = self.cluster.set_many(found_lights, on=True)
+
+        # Both bridges have a group with lights 1 and 2
+        self.assertEqual([(self.cluster.key(device), response) for device, response in responses], [
+            ((FIRST, 2), {'on': True}),
+            ((SECOND, 2), {'on': True}),
+        ])
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_errors(self, mock_request):
+        """ A failing bridge doesn't stop the others, the results and errors of all bridges are raised together. """
+        def respond(method, url, **kwargs):
+            if url.startswith('http://192.168.1.3/'):
+                return test_utils.MockResponse([{"error": {"type": 1, "address": "/", "description": "unauthorized user"}}])
+            return test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+        mock_request.side_effect = respond
+
+        with self.assertRaises(exceptions.BulkHueError) as context:
+            self.cluster.lights()
+
+        self.assertEqual(list(context.exception.results), [FIRST, SECOND])
+        self.assertEqual(len(context.exception.results[FIRST]), 2)
+        self.assertIsNone(context.exception.results[SECOND])
+        self.assertEqual([error.device for error in context.exception.errors], [self.bridges[1]])
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_same_ip(self):
+        """ Bridges with the same ip but different users (or an emulator on one host) are kept apart. """
+        bridges = [bridge.Bridge('127.0.0.1', 'user_1'), bridge.Bridge('127.0.0.1', 'user_2')]
+        self.assertEqual(list(cluster.BridgeCluster(bridges).bridges), [('127.0.0.1', 'user_1'), ('127.0.0.1', 'user_2')])
@@ -0,0 +1,49 @@
+import unittest
+import mock
+
+from huegely import (
+    bridge,
+    codec,
+    constants,
+    lights,
+    utils,
+)
+
+from . import test_utils
+
+
+class CodecTests(unittest.TestCase):
+    def test_encode(self):
+        self.assertEqual(
+            codec.STATE.encode({'brightness': 100, 'coordinates': (0.5, 0.25), 'transition_time': 100, 'alert': 'none'}),
+            {'bri': 100, 'xy': [0.5, 0.25], 'transitiontime': 10, 'alert': 'none'}
+        )
+        self.assertEqual(codec.NAMES.encode({'coordinates': (0.5, 0.25), 'transition_time': 100}), {
+            'xy': (0.5, 0.25), 'transitiontime': 100
+        })
+
+    def test_decode(self):
+        self.assertEqual(
+            codec.STATE.decode({'bri': 100, 'xy': [0.5, 0.25], 'reachable': True, 'colormode': 'xy', 'bri_inc': 10}),
+            {'brightness': 100, 'coordinates': [0.5, 0.25], 'is_reachable': True, 'color_mode': 'xy', 'bri_inc': 10}
+        )
+
+    def test_immutable(self):
+        mappings = (dict(constants.HUEGELY_TO_HUE_MAPPING), dict(constants.HUE_TO_HUEGELY_MAPPING))
+
+        codec.STATE.encode({'unknown_attribute': 1})
+        codec.STATE.decode({'unknown': 1, 'bri_inc': 1})
+        utils.huegely_to_hue_names({'unknown_attribute': 1})
+        utils.hue_to_huegely_names({'unknown': 1})
+
+        self.assertEqual((constants.HUEGELY_TO_HUE_MAPPING, constants.HUE_TO_HUEGELY_MAPPING), mappings)
+        with self.assertRaises(TypeError):
+            codec.STATE.names['unknown'] = 'unknown'
+        with self.assertRaises(AttributeError):
+            codec.STATE.extra = True
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{'success': {'/lights/1/state/xy': [0.5, 0.25]}}]))
+    def test_device_codec(self, mock_request):
+        light = lights.ExtendedColorLight(bridge.Bridge('192.168.1.2', 'token'), 1, transition_time=100)
+        self.assertEqual(light.coordinates((0.5, 0.25)), [0.5, 0.25])
+        self.assertEqual(mock_request.call_args[1]['json'], {'xy': [0.5, 0.25], 'transitiontime': 10})
@@ -0,0 +1,122 @@
+import time
+import unittest
+
+from huegely import (
+    bridge,
+    emulator,
+    exceptions,
+    lights,
+)
+
+
+class BridgeEmulatorTests(unittest.TestCase):
+    """ End to end tests, running real HTTP requests against the emulator """
+    def setUp(self):
+        self.emulator = emulator.BridgeEmulator()
+        self.emulator.start()
+        self.bridge = bridge.Bridge(self.emulator.ip, self.emulator.username)
+
+    def tearDown(self):
+        self.bridge.close()
+        self.emulator.stop()
+
+    def test_get(self):
+        self.assertEqual(self.bridge.name(), 'Hue Bridge')
+        self.assertEqual([light.name() for light in self.bridge.lights()], ['Light 1', 'Light 2'])
+        self.assertEqual(len(self.bridge.groups()), 3)
+        self.assertEqual(len(self.bridge.sensors()), 2)
+        self.assertEqual(self.bridge.snapshot().name, 'Hue Bridge')
+
+    def test_unauthorized(self):
+        unknown_bridge = bridge.Bridge(self.emulator.ip, 'unknown')
+        with self.assertRaises(exceptions.HueError) as context:
+            unknown_bridge.lights()
+        self.assertEqual(context.exception.error_code, emulator.UNAUTHORIZED_USER)
+
+    def test_create_user(self):
+        with self.assertRaises(exceptions.HueError):
+            self.bridge.get_token('test_app')
+
+        self.emulator.bridge.press_link_button()
+        username = self.bridge.get_token('test_app')
+        self.assertIn(username, self.emulator.bridge.usernames)
+
+    def test_set_state(self):
+        light = self.bridge.lights()[0]
+        self.assertEqual(light.brightness(100), 100)
+        self.assertEqual(light.hue(1000), 1000)
+        self.assertEqual(self.emulator.bridge.datastore['lights']['1']['state']['bri'], 100)
+        self.assertEqual(light.brightness(), 100)
+
+    def test_set_name(self):
+        light = self.bridge.lights()[0]
+        self.assertEqual(light.name('New name'), 'New name')
+        self.assertEqual(self.emulator.bridge.datastore['lights']['1']['name'], 'New name')
+
+        self.assertEqual(self.bridge.name('New bridge'), 'New bridge')
+        self.assertEqual(self.bridge.name(), 'New bridge')
+
+    def test_brightness_steps(self):
+        light, group = self.bridge.lights()[0], self.bridge.groups()[0]
+
+        # Lights respond with the new brightness, groups with the step
+        self.assertEqual(light.darker(54), 200)
+        self.assertEqual(group.darker(54), 200)
+        self.assertEqual(self.emulator.bridge.datastore['lights']['1']['state']['bri'], 146)
+        self.assertEqual(self.emulator.bridge.datastore['groups']['1']['action']['bri'], 200)
+
+    def test_modify_while_off(self):
+        light = self.bridge.lights()[1]
+        self.assertFalse(light.is_on())
+
+        with self.assertRaises(exceptions.HueError) as context:
+            light.state(brightness=100)
+        self.assertEqual(context.exception.error_code, exceptions.CANNOT_MODIFY_WHILE_OFF)
+
+        # brighter() turns the light on when it's off
+        self.assertEqual(light.brighter(10), 254)
+        self.assertTrue(light.is_on())
+
+    def test_invalid_device(self):
+        light = lights.DimmableLight(self.bridge, 9)
+        with self.assertRaises(exceptions.HueError) as context:
+            light.is_on()
+        self.assertEqual(context.exception.error_code, exceptions.RESOURCE_NOT_AVAILABLE)
+
+    def test_stats(self):
+        self.bridge.lights()
+        self.bridge.lights()[0].on()
+
+        stats = self.emulator.bridge.stats()
+        self.assertEqual(stats['GET'], 2)
+        self.assertEqual(stats['GET lights'], 2)
+        self.assertEqual(stats['PUT lights'], 1)
+
+
+class EmulatorTimingTests(unittest.TestCase):
+    def request_times(self, requests, **kwargs):
+        with emulator.BridgeEmulator(**kwargs) as bridge_emulator:
+            with bridge.Bridge(bridge_emulator.ip, bridge_emulator.username) as hue_bridge:
+                light = hue_bridge.lights()[0]
+                start = time.monotonic()
+                for _ in range(requests):
+                    light.on()
+                return time.monotonic() - start, bridge_emulator.bridge.stats()
+
+    def test_latency(self):
+        duration, _ = self.request_times(3, latency=0.05, jitter=0.01)
+        self.assertGreaterEqual(duration, 0.12)
+
+    def test_rate_limit_delay(self):
+        duration, stats = self.request_times(4, rate_limits={'lights': 20})
+        self.assertGreaterEqual(duration, 0.14)
+        self.assertNotIn('dropped', stats)
+
+    def test_rate_limit_drop(self):
+        with self.assertRaises(exceptions.HueError) as context:
+            self.request_times(2, rate_limits={'lights': 1}, overload='drop')
+        self.assertEqual(context.exception.error_code, emulator.INTERNAL_ERROR)
+
+    def test_invalid_overload(self):
+        with self.assertRaises(ValueError):
+            emulator.EmulatedBridge(overload='queue')
@@ -38,7 +38,7 @@ class GroupTests(unittest.TestCase):
         group._name = 'some name'
         self.assertEqual(str(group), 'some name')
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request')
     def test_brighter(self, mock_request):
         # Brighter/darker require two api requests because the new brightness isn't returned by the first request
         def side_effect(*args, **kwargs):
@@ -50,7 +50,7 @@ class GroupTests(unittest.TestCase):
 
         self.assertEqual(self.ex_color_group.brighter(10), 254)
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request')
     def test_darker(self, mock_request):
         # Brighter/darker require two api requests because the new brightness isn't returned by the first request
         def side_effect(*args, **kwargs):
@@ -62,25 +62,40 @@ class GroupTests(unittest.TestCase):
 
         self.assertEqual(self.ex_color_group.darker(10), 254)
 
+    @mock.patch('huegely.bridge.Session.request')
+    def test_brighter_darker_known_state(self, mock_request):
+        """ With a known state, the new brightness is predicted instead of requested. """
+        group = groups.ExtendedColorGroup(self.fake_bridge, 1, state={'on': True, 'bri': 100})
 
-    @mock.patch('huegely.bridge.request')
-    def test_lights(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/groups/1/action/bri_inc": 10}}])
+        self.assertEqual(group.brighter(10), 110)
+        self.assertEqual(mock_request.call_count, 1)
 
-        # Getting lights from a group requires two api requests: one to get the list of lights for the group,
-        # and one to get the light objects from the api
-        def side_effect(*args, **kwargs):
-            def second_call(*args, **kwargs):
-                return test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
-            mock_request.side_effect = second_call
-            return test_utils.MockResponse(fake_data.BRIDGE_GROUPS['3'])
-        mock_request.side_effect = side_effect
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/groups/1/action/bri_inc": -50}}])
+        self.assertEqual(group.darker(50), 60)
+        self.assertEqual(group.state(max_age=10)['brightness'], 60)
+        self.assertEqual(mock_request.call_count, 2)
+
+        # Like the bridge, the prediction doesn't go below brightness 1
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/groups/1/action/bri_inc": -100}}])
+        self.assertEqual(group.darker(100), 1)
+        self.assertEqual(mock_request.call_count, 3)
 
-        # Group for has one light (DimmableLight with id 4)
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE))
+    def test_lights(self, mock_request):
+        # The first call builds the bridge's membership index with a single request to the full datastore
         group = groups.DimmableGroup(self.fake_bridge, 3)
         lights = group.lights()
         self.assertEqual([2], [light.device_id for light in lights])
+        self.assertEqual(mock_request.call_count, 1)
+
+        # After that, no requests are needed
+        self.assertEqual([1, 2], [light.device_id for light in groups.DimmableGroup(self.fake_bridge, 2).lights()])
+        self.assertEqual([1, 2], [light.device_id for light in groups.DimmableGroup(self.fake_bridge, 0).lights()])
+        self.assertEqual([2, 3], [group.device_id for group in lights[0].groups()])
+        self.assertEqual(mock_request.call_count, 1)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"brightness": 200}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"brightness": 200}}]))
     def test_state(self, mock_request):
         # Set state
         self.assertEqual(self.ex_color_group.state(brightness=200), {'brightness': 200})
@@ -89,11 +104,11 @@ class GroupTests(unittest.TestCase):
         mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_GROUPS['1'])
         self.assertEqual(self.ex_color_group.state(), utils.hue_to_huegely_names(fake_data.BRIDGE_GROUPS['1']['action']))
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_GROUPS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_GROUPS['1']))
     def test_get_name(self, mock_request):
         self.assertEqual(self.ex_color_group.name(), fake_data.BRIDGE_GROUPS['1']['name'])
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"name": "new_name"}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"name": "new_name"}}]))
     def test_set_name(self, mock_request):
         self.assertEqual(self.ex_color_group.name('new_name'), 'new_name')
 
@@ -116,3 +131,16 @@ class GroupTests(unittest.TestCase):
         self.assertEqual(groups.get_group_type({'bri': 200, 'hue': 100}), groups.ColorGroup)
         with self.assertRaises(Exception):
             groups.get_group_type({'i_dont_exist': 200})
+
+    def test_plan_group_commands(self):
+        group_lights = {1: {1, 2}, 2: {1, 2, 3, 4}, 3: {5, 6}, 4: {5, 7}, 5: {8}}
+
+        # Exact match
+        self.assertEqual(groups.plan_group_commands({1, 2, 3, 4}, group_lights), ([2], []))
+
+        # Groups covering part of the lights, remaining lights are addressed directly
+        self.assertEqual(groups.plan_group_commands({1, 2, 3, 4, 5, 6, 8, 9}, group_lights), ([2, 3], [8, 9]))
+
+        # Groups with lights that aren't targeted, or only a single light, are never used
+        self.assertEqual(groups.plan_group_commands({1, 3, 5, 7}, group_lights), ([4], [1, 3]))
+        self.assertEqual(groups.plan_group_commands({8}, group_lights), ([], [8]))
@@ -0,0 +1,138 @@
+import asyncio
+import unittest
+import mock
+
+from huegely import (
+    aio,
+    bridge,
+    exceptions,
+    instrumentation,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class RecordingInstrument(instrumentation.Instrument):
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, info):
+        self.calls.append(('before', info.method, info.endpoint))
+
+    def after_request(self, info):
+        self.calls.append(('after', info.method, info.endpoint, info.error_type))
+
+
+class EndpointTemplateTests(unittest.TestCase):
+    def test_endpoint_template(self):
+        base_url = 'http://192.168.1.2/api/token/'
+        self.assertEqual(instrumentation.endpoint_template(base_url + 'lights', base_url), 'lights')
+        self.assertEqual(instrumentation.endpoint_template(base_url + 'lights/12/state', base_url), 'lights/{id}/state')
+        self.assertEqual(instrumentation.endpoint_template(base_url + 'groups/0', base_url), 'groups/{id}')
+        self.assertEqual(instrumentation.endpoint_template(base_url, base_url), '/')
+        self.assertEqual(instrumentation.endpoint_template('http://192.168.1.2/api', base_url), '/')
+        self.assertEqual(instrumentation.endpoint_template('http://192.168.1.2/api/config', base_url), 'config')
+
+
+class InstrumentationTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('192.168.1.2', 'token')
+        self.metrics = self.fake_bridge.add_instrument(instrumentation.Metrics(buckets=(0.1, 1)))
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_hooks(self, mock_request):
+        instrument = self.fake_bridge.add_instrument(RecordingInstrument())
+
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+        light = self.fake_bridge.lights()[0]
+
+        mock_request.return_value = test_utils.MockResponse([{'error': {'type': 201, 'address': '', 'description': ''}}])
+        with self.assertRaises(exceptions.HueError):
+            light.state(brightness=100)
+
+        mock_request.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            self.fake_bridge.lights()
+
+        self.assertEqual(instrument.calls, [
+            ('before', 'GET', 'lights'),
+            ('after', 'GET', 'lights', None),
+            ('before', 'PUT', 'lights/{id}/state'),
+            ('after', 'PUT', 'lights/{id}/state', '201'),
+            ('before', 'GET', 'lights'),
+            ('after', 'GET', 'lights', 'ValueError'),
+        ])
+
+        self.fake_bridge.remove_instrument(instrument)
+        mock_request.side_effect = None
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+        self.fake_bridge.lights()
+        self.assertEqual(len(instrument.calls), 6)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_metrics(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+        lights = self.fake_bridge.lights()
+
+        mock_request.return_value = test_utils.MockResponse(
+            [{'success': {'/lights/1/state/on': True}}], request_body=b'{"on": true}'
+        )
+        lights[0].on()
+        lights[1].on()
+
+        mock_request.return_value = test_utils.MockResponse([{'error': {'type': 201, 'address': '', 'description': ''}}])
+        with self.assertRaises(exceptions.HueError):
+            lights[1].state(brightness=100)
+
+        metrics = {(metric['method'], metric['endpoint']): metric for metric in self.metrics.as_dict()}
+        self.assertEqual(set(metrics), {('GET', 'lights'), ('PUT', 'lights/{id}/state')})
+
+        get_lights = metrics[('GET', 'lights')]
+        self.assertEqual(get_lights['bridge'], '192.168.1.2')
+        self.assertEqual(get_lights['count'], 1)
+        self.assertEqual(get_lights['histogram'], {0.1: 1, 1: 1})
+        self.assertEqual(get_lights['bytes_in'], len(test_utils.MockResponse(fake_data.BRIDGE_LIGHTS).content))
+        self.assertEqual(get_lights['errors'], {})
+
+        put_state = metrics[('PUT', 'lights/{id}/state')]
+        self.assertEqual(put_state['count'], 3)
+        self.assertEqual(put_state['bytes_out'], 24)
+        self.assertEqual(put_state['errors'], {'201': 1})
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_prometheus(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse([{'error': {'type': 3, 'address': '', 'description': ''}}])
+        with self.assertRaises(exceptions.HueError):
+            self.fake_bridge.lights()
+
+        lines = self.metrics.prometheus().splitlines()
+        labels = 'bridge="192.168.1.2",method="GET",endpoint="lights"'
+
+        self.assertIn('# TYPE huegely_requests_total counter', lines)
+        self.assertIn('huegely_requests_total{%s} 1' % labels, lines)
+        self.assertIn('# TYPE huegely_request_duration_seconds histogram', lines)
+        self.assertIn('huegely_request_duration_seconds_bucket{%s,le="+Inf"} 1' % labels, lines)
+        self.assertIn('huegely_request_duration_seconds_count{%s} 1' % labels, lines)
+        self.assertIn('huegely_request_errors_total{%s,error_type="3"} 1' % labels, lines)
+        self.assertIn('huegely_sent_bytes_total{%s} 0' % labels, lines)
+
+        self.metrics.reset()
+        self.assertEqual(self.metrics.as_dict(), [])
+
+    @unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_LIGHTS))
+    def test_async(self, mock_request):
+        async def get_lights():
+            async with aio.AsyncBridge('192.168.1.2', 'token') as async_bridge:
+                metrics = async_bridge.add_instrument(instrumentation.Metrics())
+                await async_bridge.lights()
+                return metrics.as_dict()
+
+        metrics = asyncio.run(get_lights())
+        self.assertEqual(len(metrics), 1)
+        self.assertEqual(metrics[0]['endpoint'], 'lights')
+        self.assertEqual(metrics[0]['count'], 1)
+        self.assertEqual(metrics[0]['bytes_out'], 2)
@@ -0,0 +1,127 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from huegely import (
+    aio,
+    bridge,
+    groups,
+    inventory,
+    lights,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class InventoryTests(unittest.TestCase):
+    def setUp(self):
+        self.state = fake_data.BRIDGE_FULL_STATE
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'inventory.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def respond(self, method, url, **kwargs):
+        """ Responds with the bridge data in self.state, the full datastore or the requested part of it. """
+        path = url.split('/api/token', 1)[1].strip('/')
+        return test_utils.MockResponse(self.state[path] if path else self.state)
+
+    def new_inventory(self, **kwargs):
+        """ An inventory for a new bridge, like after restarting the process. """
+        return inventory.Inventory(bridge.Bridge('192.168.1.2', 'token'), self.path, **kwargs)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_first_start(self, mock_request):
+        mock_request.side_effect = self.respond
+        first = self.new_inventory()
+        self.assertEqual([1, 2], [light.device_id for light in first.lights()])
+        self.assertEqual([1, 2, 3], [group.device_id for group in first.groups()])
+        self.assertEqual([1, 2], [sensor.device_id for sensor in first.sensors()])
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertTrue(first.is_valid)
+
+        with open(self.path) as inventory_file:
+            stored = json.load(inventory_file)
+        self.assertEqual(stored['bridge'], '192.168.1.2')
+        self.assertEqual(stored['records']['groups']['2'], {
+            'name': 'Extended Color Lights 2', 'type': 'ExtendedColorGroup', 'lights': ['2', '1']
+        })
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_restart(self, mock_request):
+        mock_request.side_effect = self.respond
+        self.new_inventory().lights()
+        mock_request.reset_mock()
+
+        restarted = self.new_inventory(validate=False)
+        found_lights = restarted.lights()
+        found_groups = restarted.groups()
+
+        # No requests at all to get devices, their types and group memberships
+        self.assertEqual(mock_request.call_count, 0)
+        self.assertIsInstance(found_lights[0], lights.ExtendedColorLight)
+        self.assertIsInstance(found_lights[1], lights.DimmableLight)
+        self.assertIsInstance(found_groups[0], groups.ExtendedColorGroup)
+        self.assertEqual(found_lights[0]._name, fake_data.BRIDGE_LIGHTS['1']['name'])
+        self.assertEqual([1, 2], [light.device_id for light in found_groups[1].lights()])
+        self.assertEqual(mock_request.call_count, 0)
+        self.assertIsNone(restarted.is_valid)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_background_validation(self, mock_request):
+        mock_request.side_effect = self.respond
+        self.new_inventory().lights()
+
+        restarted = self.new_inventory()
+        found_lights = restarted.lights()
+        self.assertTrue(restarted.wait(timeout=5))
+
+        # Validation only gets the config, lights and groups, not the full datastore
+        self.assertEqual([call[0][1].rsplit('/', 1)[1] for call in mock_request.call_args_list[1:]], ['config', 'lights', 'groups'])
+
+        # Validation updated the devices in place
+        self.assertEqual(found_lights[0].state(max_age=10)['brightness'], fake_data.BRIDGE_LIGHTS['1']['state']['bri'])
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_invalid(self, mock_request):
+        mock_request.side_effect = self.respond
+        self.new_inventory().lights()
+
+        # A light was added and the bridge was updated
+        changed_state = copy.deepcopy(fake_data.BRIDGE_FULL_STATE)
+        changed_state['lights']['3'] = dict(changed_state['lights']['2'], name='Light 3')
+        changed_state['config'] = dict(changed_state['config'], swversion='01030000')
+        self.state = changed_state
+
+        restarted = self.new_inventory()
+        self.assertEqual(len(restarted.lights()), 2)
+        self.assertFalse(restarted.wait(timeout=5))
+        self.assertEqual(len(restarted.lights()), 3)
+
+        # The updated inventory was saved
+        mock_request.reset_mock()
+        self.assertEqual(len(self.new_inventory(validate=False).lights()), 3)
+        self.assertEqual(mock_request.call_count, 0)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_other_bridge(self, mock_request):
+        mock_request.side_effect = self.respond
+        self.new_inventory().lights()
+
+        other = inventory.Inventory(bridge.Bridge('192.168.1.3', 'token'), self.path)
+        other.lights()
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertTrue(other.is_valid)
+
+    @unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+    def test_async_bridge(self):
+        with self.assertRaises(TypeError):
+            inventory.Inventory(aio.AsyncBridge('192.168.1.2', 'token'), self.path)
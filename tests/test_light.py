@@ -28,6 +28,13 @@ class LightTests(unittest.TestCase):
         light._name = 'some name'
         self.assertEqual(repr(light), 'DimmableLight some name (id: 1)')
 
+    def test_slots(self):
+        light = lights.ExtendedColorLight(self.fake_bridge, 12)
+        self.assertEqual(light.device_url, 'lights/12')
+        self.assertFalse(hasattr(light, '__dict__'))
+        with self.assertRaises(AttributeError):
+            light.some_attribute = True
+
     def test_str(self):
         light = lights.DimmableLight(self.fake_bridge, 1)
 
@@ -38,7 +45,7 @@ class LightTests(unittest.TestCase):
         light._name = 'some name'
         self.assertEqual(str(light), 'some name')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
     def test_get_state(self, mock_request):
         state = self.ex_color_light.state()
 
@@ -46,7 +53,52 @@ class LightTests(unittest.TestCase):
         self.assertTrue('brightness' in state)
         self.assertFalse('bri' in state)
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    def test_get_state_max_age(self, mock_request):
+        """ Recently received state is returned without a request when a max_age is given. """
+        light = lights.ExtendedColorLight(self.fake_bridge, 1)
+        light.state(max_age=10)
+        self.assertEqual(mock_request.call_count, 1)
+
+        self.assertEqual(light.state(max_age=10)['hue'], 14678)
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Without max_age, a request is always made
+        light.state()
+        self.assertEqual(mock_request.call_count, 2)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    def test_state_cache(self, mock_request):
+        """ With a cache_ttl on the bridge, getters share one request and updates keep the cache valid. """
+        cached_bridge = bridge.Bridge('127.0.0.1', 'fake_token', cache_ttl=10)
+        light = lights.ExtendedColorLight(cached_bridge, 1)
+
+        self.assertEqual(light.brightness(), 254)
+        self.assertEqual(light.hue(), 14678)
+        self.assertTrue(light.is_on())
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Successful updates are applied to the cached state
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/bri": 100, "/lights/1/state/transitiontime": 1}}])
+        light.brightness(100, transition_time=10)
+        self.assertEqual(light.brightness(), 100)
+        self.assertNotIn('transition_time', light.state())
+        self.assertEqual(mock_request.call_count, 2)
+
+        # Failed updates invalidate the cache
+        mock_request.return_value = test_utils.MockResponse([{"error": {"type": 0, "address": "don't care", "description": "Don't care"}}])
+        with self.assertRaises(exceptions.HueError):
+            light.hue(100)
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1'])
+        self.assertEqual(light.brightness(), 254)
+        self.assertEqual(mock_request.call_count, 4)
+
+        # The device's cache_ttl overrides the bridge's
+        light.cache_ttl = 0
+        light.brightness()
+        self.assertEqual(mock_request.call_count, 5)
+
+    @mock.patch('huegely.bridge.Session.request')
     def test_set_state(self, mock_request):
         mock_request.return_value = test_utils.MockResponse([{"success": {"bri": 254, "on": True}}])
 
@@ -54,19 +106,19 @@ class LightTests(unittest.TestCase):
 
         self.assertEqual(state['brightness'], 254)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
     def test_get_name(self, mock_request):
         self.assertEqual(self.ex_color_light.name(), fake_data.BRIDGE_LIGHTS['1']['name'])
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"name": "new_name"}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"name": "new_name"}}]))
     def test_set_name(self, mock_request):
         self.assertEqual(self.ex_color_light.name('new_name'), 'new_name')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
     def test_is_reachable(self, mock_request):
         self.assertEqual(self.ex_color_light.is_reachable(), fake_data.BRIDGE_LIGHTS['1']['state']['reachable'])
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"brightness": 254}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"brightness": 254}}]))
     def test_brighter(self, mock_request):
         # light is already on
         self.assertEqual(self.ex_color_light.brighter(), 254)
@@ -89,7 +141,7 @@ class LightTests(unittest.TestCase):
         with self.assertRaises(exceptions.HueError):
             self.ex_color_light.brighter()
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"brightness": 200}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"brightness": 200}}]))
     def test_darker(self, mock_request):
         # light is on
         self.assertEqual(self.ex_color_light.darker(), 200)
@@ -103,13 +155,80 @@ class LightTests(unittest.TestCase):
         with self.assertRaises(exceptions.HueError):
             self.ex_color_light.darker()
 
-        # Brightness goes down to 0, lamp is turned off
-        with mock.patch.object(self.ex_color_light, 'off'):
-            mock_request.return_value = test_utils.MockResponse([{"success": {"brightness": 0}}])
-            self.ex_color_light.darker()
-            self.assertTrue(self.ex_color_light.off.called)
-
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"brightness": 200}}]))
+    @mock.patch('huegely.bridge.Session.request')
+    def test_darker_turns_off(self, mock_request):
+        """ A light known to go below the lowest brightness is turned off in the same request. """
+        light = lights.ExtendedColorLight(self.fake_bridge, 1, state={'on': True, 'bri': 20})
+        light.cache_ttl = 60
+
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/bri": 1}}, {"success": {"/lights/1/state/on": False}}])
+        self.assertEqual(light.darker(20), 0)
+        self.assertEqual(mock_request.call_args[1]['json'], {'bri_inc': -20, 'on': False})
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Now known to be off, so no further requests are needed
+        self.assertEqual(light.darker(), 0)
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Without a known brightness, the bridge stops at brightness 1 and the light stays on
+        light._invalidate_state()
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/bri": 1}}])
+        self.assertEqual(light.darker(20), 1)
+        self.assertEqual(mock_request.call_args[1]['json'], {'bri_inc': -20})
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_off_error_keeps_state(self, mock_request):
+        """ Failing because the light is off keeps the cached state (now off), so brighter's retry needs no GET. """
+        light = lights.ExtendedColorLight(self.fake_bridge, 1, state={'on': True, 'bri': 20})
+        light.cache_ttl = 60
+
+        mock_request.side_effect = [
+            test_utils.MockResponse([{"error": {"type": 201, "address": "", "description": ""}}]),
+            test_utils.MockResponse([{"success": {"/lights/1/state/on": True, "/lights/1/state/bri": 45}}]),
+        ]
+        self.assertEqual(light.brighter(), 45)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual([call[0][0] for call in mock_request.call_args_list], ['PUT', 'PUT'])
+        self.assertTrue(light._state['on'])
+
+        # Any other error leaves the light in an unknown state
+        mock_request.side_effect = None
+        mock_request.return_value = test_utils.MockResponse([{"error": {"type": 0, "address": "", "description": ""}}])
+        with self.assertRaises(exceptions.HueError):
+            light.brighter()
+        self.assertIsNone(light._state)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_brighter_darker_known_state(self, mock_request):
+        """ With a known state, brighter/darker need a single request (or none at all). """
+        light = lights.ExtendedColorLight(self.fake_bridge, 1, state={'on': False, 'bri': 20})
+
+        # Light is known to be off, so it's turned on in the first request
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/on": True, "/lights/1/state/bri": 45}}])
+        self.assertEqual(light.brighter(), 45)
+        self.assertEqual(mock_request.call_args[1]['json'], {'on': True, 'bri_inc': 25})
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Like the bridge, dimming stops at brightness 1
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/bri": 1}}])
+        self.assertEqual(light.darker(50), 1)
+        self.assertEqual(mock_request.call_args[1]['json'], {'bri_inc': -50})
+        self.assertEqual(mock_request.call_count, 2)
+
+        # Light is known to be off, nothing to do while that state is fresh
+        light.cache_ttl = 60
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/on": False}}])
+        light.off()
+        self.assertEqual(light.darker(), 0)
+        self.assertEqual(mock_request.call_count, 3)
+
+        # Without caching, someone else might have turned it on since, so the request is made
+        light.cache_ttl = None
+        mock_request.return_value = test_utils.MockResponse([{"error": {"type": 201, "address": "", "description": ""}}])
+        self.assertEqual(light.darker(), 0)
+        self.assertEqual(mock_request.call_count, 4)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"brightness": 200}}]))
     def test_brightness(self, mock_request):
         # Set brightness
         self.assertEqual(self.ex_color_light.brightness(200), 200)
@@ -127,7 +246,7 @@ class LightTests(unittest.TestCase):
         with self.assertRaises(exceptions.HueError):
             self.ex_color_light.brightness(200)
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request')
     def test_transition_time(self, mock_request):
         mock_request.return_value = test_utils.MockResponse([{"success": {"bri": 200, "transitiontime": 1}}])
 
@@ -138,48 +257,75 @@ class LightTests(unittest.TestCase):
             {'brightness': 200, 'transition_time': 1}
         )
 
-    @mock.patch('huegely.bridge.request')
+    @mock.patch('huegely.bridge.Session.request')
     def test_transition_brightness_reset(self, mock_request):
         """ Test handling of the brightness reset bug that occurs when turning off a light with a transition specified. """
-        # First call requests the current brightness
+        self.ex_color_light.cache_ttl = 60
+
+        # The light's state isn't known yet, so the first call requests the current brightness
         # Second call turns light off
-        def side_effect(*args, **kwargs):
-            def second_call(*args, **kwargs):
-                return test_utils.MockResponse([{'success': {'on': False}}])
-            mock_request.side_effect = second_call
-            return test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1'])
-        mock_request.side_effect = side_effect
+        mock_request.side_effect = [
+            test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']),
+            test_utils.MockResponse([{'success': {'/lights/1/state/on': False}}]),
+        ]
 
         self.assertIsNone(self.ex_color_light._reset_brightness_to)
         self.ex_color_light.off(transition_time=0)
         self.assertEqual(self.ex_color_light._reset_brightness_to, fake_data.BRIDGE_LIGHTS['1']['state']['bri'])
+        self.assertEqual(self.fake_bridge.request_count, 2)
 
         # Turn light back on
-        # First call returns on state (False)
-        # Second call turns light on
-        def side_effect(*args, **kwargs):
-            def second_call(*args, **kwargs):
-                return test_utils.MockResponse([{'success': {'on': True}}])
-            mock_request.side_effect = second_call
-            return test_utils.MockResponse({'state': {'on': False}})
-        mock_request.side_effect = side_effect
+        # The light is known to be off now, so turning it on with the remembered brightness only needs one request
+        mock_request.side_effect = [
+            test_utils.MockResponse([{'success': {'/lights/1/state/on': True, '/lights/1/state/bri': 254}}]),
+        ]
 
         self.ex_color_light.on()
         self.assertIsNone(self.ex_color_light._reset_brightness_to)
+        self.assertEqual(mock_request.call_args[1]['json'], {'on': True, 'bri': 254})
+        self.assertEqual(self.fake_bridge.request_count, 3)
+
+        # Turning it off again only needs one request, because the brightness is known
+        mock_request.side_effect = [
+            test_utils.MockResponse([{'success': {'/lights/1/state/on': False}}]),
+        ]
+        self.ex_color_light.off(transition_time=1)
+        self.assertEqual(self.ex_color_light._reset_brightness_to, 254)
+        self.assertEqual(self.fake_bridge.request_count, 4)
+
+        # Turning it off while it's already off doesn't try to reset the brightness, which would fail with error 201
+        mock_request.side_effect = [
+            test_utils.MockResponse([{'success': {'/lights/1/state/on': False}}]),
+        ]
+        self.ex_color_light.off(transition_time=100)
+        self.assertEqual(mock_request.call_args[1]['json'], {'on': False, 'transitiontime': 10})
+        self.assertEqual(self.fake_bridge.request_count, 5)
+
+        # State that isn't fresh under cache_ttl might be outdated, so the current brightness is requested again
+        self.ex_color_light.cache_ttl = None
+        self.ex_color_light._reset_brightness_to = None
+        self.ex_color_light._store_state({'on': True, 'brightness': 100})
+        mock_request.side_effect = [
+            test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']),
+            test_utils.MockResponse([{'success': {'/lights/1/state/on': False}}]),
+        ]
+        self.ex_color_light.off(transition_time=1)
+        self.assertEqual(self.ex_color_light._reset_brightness_to, fake_data.BRIDGE_LIGHTS['1']['state']['bri'])
+        self.assertEqual(self.fake_bridge.request_count, 7)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"on": True}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"on": True}}]))
     def test_on(self, mock_request):
         self.assertEqual(self.ex_color_light.on(), True)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"on": False}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"on": False}}]))
     def test_off(self, mock_request):
         self.assertEqual(self.ex_color_light.off(), False)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
     def test_is_on(self, mock_request):
         self.assertEqual(self.ex_color_light.is_on(), True)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"alert": 'select'}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"alert": 'select'}}]))
     def test_alert(self, mock_request):
         # Set alert
         self.assertEqual(self.ex_color_light.alert('select'), 'select')
@@ -192,7 +338,7 @@ class LightTests(unittest.TestCase):
         with self.assertRaises(exceptions.HueError):
             self.ex_color_light.alert('invalid')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"coordinates": [0.5, 0.5]}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"coordinates": [0.5, 0.5]}}]))
     def test_coordinates(self, mock_request):
         # Set coordinates
         self.assertEqual(self.ex_color_light.coordinates([0.5, 0.5]), [0.5, 0.5])
@@ -201,7 +347,7 @@ class LightTests(unittest.TestCase):
         mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1'])
         self.assertEqual(self.ex_color_light.coordinates(), [0.5, 0.5])
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"hue": 14678}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"hue": 14678}}]))
     def test_hue(self, mock_request):
         # Set hue
         self.assertEqual(self.ex_color_light.hue(14678), 14678)
@@ -210,7 +356,7 @@ class LightTests(unittest.TestCase):
         mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1'])
         self.assertEqual(self.ex_color_light.hue(), 14678)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"saturation": 254}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"saturation": 254}}]))
     def test_saturation(self, mock_request):
         # Set saturation
         self.assertEqual(self.ex_color_light.saturation(254), 254)
@@ -219,7 +365,7 @@ class LightTests(unittest.TestCase):
         mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1'])
         self.assertEqual(self.ex_color_light.saturation(), 254)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"effect": 'colorloop'}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"effect": 'colorloop'}}]))
     def test_effect(self, mock_request):
         # Set effect
         self.assertEqual(self.ex_color_light.effect('colorloop'), 'colorloop')
@@ -232,11 +378,11 @@ class LightTests(unittest.TestCase):
         with self.assertRaises(exceptions.HueError):
             self.ex_color_light.effect('invalid')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
     def test_color_mode(self, mock_request):
         self.assertEqual(self.ex_color_light.color_mode(), 'hs')
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse([{"success": {"temperature": 154}}]))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"temperature": 154}}]))
     def test_temperature(self, mock_request):
         # Set temperature
         self.assertEqual(self.ex_color_light.temperature(100), 154)
@@ -0,0 +1,69 @@
+import copy
+import unittest
+import mock
+
+from huegely import (
+    bridge,
+    membership,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class MembershipIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('192.168.1.2', 'token')
+        self.index = membership.MembershipIndex()
+
+    def test_incomplete(self):
+        self.assertFalse(self.index.is_complete)
+        self.assertIsNone(self.index.age())
+
+        self.index.update_lights(self.fake_bridge._build_lights(fake_data.BRIDGE_LIGHTS))
+        self.assertFalse(self.index.is_complete)
+
+        self.index.update_groups(fake_data.BRIDGE_GROUPS, self.fake_bridge._build_groups(fake_data.BRIDGE_GROUPS))
+        self.assertTrue(self.index.is_complete)
+        self.assertGreaterEqual(self.index.age(), 0)
+
+    def test_incremental_update(self):
+        self.index.update_groups(fake_data.BRIDGE_GROUPS, [])
+        self.assertEqual(self.index.light_ids(2), [1, 2])
+        self.assertEqual(self.index.group_ids(1), [1, 2])
+        self.assertEqual(self.index.group_ids(2), [2, 3])
+
+        # Light 1 leaves group 2, group 3 is removed and group 4 is added
+        group_data = copy.deepcopy(fake_data.BRIDGE_GROUPS)
+        group_data['2']['lights'] = ['2']
+        group_data['4'] = dict(group_data.pop('3'), lights=['1', '5'])
+        self.index.update_groups(group_data, [])
+
+        self.assertEqual(self.index.light_ids(2), [2])
+        self.assertEqual(self.index.light_ids(3), [])
+        self.assertEqual(self.index.light_ids(4), [1, 5])
+        self.assertEqual(self.index.group_ids(1), [1, 4])
+        self.assertEqual(self.index.group_ids(2), [2])
+        self.assertEqual(self.index.group_ids(5), [4])
+        self.assertEqual(self.index.group_ids(9), [])
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_bridge_listings_update_index(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+        found_lights = self.fake_bridge.lights()
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_GROUPS)
+        found_groups = self.fake_bridge.groups()
+
+        # Listings filled the index, so no snapshot is needed
+        index = self.fake_bridge.membership()
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(index.lights(2), found_lights)
+        self.assertEqual(index.groups(2), found_groups[1:])
+
+        # Too old, refreshed with one request
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE)
+        self.fake_bridge.membership(max_age=0)
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(mock_request.call_args[0][1], 'http://192.168.1.2/api/token/')
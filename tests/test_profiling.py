@@ -0,0 +1,74 @@
+import sys
+import unittest
+import mock
+
+import huegely
+
+from huegely import (
+    bridge,
+    profiling,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class ProfileTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('192.168.1.2', 'token')
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_profile(self, mock_request):
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_LIGHTS)
+        light = self.fake_bridge.lights()[0]
+
+        mock_request.return_value = test_utils.MockResponse([{'success': {'/lights/1/state/bri': 229}}])
+        previous_profiler = sys.getprofile()
+        with huegely.profile() as calls:
+            light.darker()
+            light.darker()
+        self.assertIs(sys.getprofile(), previous_profiler)
+
+        self.assertEqual(calls.requests, 2)
+        self.assertEqual(list(calls.root.children), ['Dimmer.darker'])
+
+        darker = calls.root.children['Dimmer.darker']
+        self.assertEqual(darker.calls, 2)
+        self.assertEqual(darker.requests, 2)
+        self.assertGreater(darker.total_time, 0)
+
+        # The request can be followed down the tree
+        path = []
+        children = darker.children.values()
+        while any(child.requests for child in children):
+            node = [child for child in children if child.requests][0]
+            path.append(node.name)
+            children = node.children.values()
+        self.assertEqual(path[-2:], ['Bridge.make_request', 'Bridge._request'])
+
+        self.assertIn('Dimmer.darker  calls=2 requests=2', str(calls))
+        self.assertEqual(calls.as_dict()['children'][0]['name'], 'Dimmer.darker')
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{'success': {'/lights/1/state/on': True}}]))
+    def test_profile_threads(self, mock_request):
+        lights = [huegely.ExtendedColorLight(self.fake_bridge, 1), huegely.ExtendedColorLight(self.fake_bridge, 2)]
+        with huegely.profile() as calls:
+            self.fake_bridge.map(lights, lambda light: light.on())
+
+        self.assertEqual(calls.requests, 2)
+        self.assertEqual(calls.root.children['Bridge.map.<locals>.call'].requests, 2)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_request_budget(self, mock_request):
+        with profiling.request_budget(1, self.fake_bridge):
+            self.fake_bridge.lights()
+
+        with self.assertRaises(profiling.RequestBudgetExceeded) as context:
+            with profiling.request_budget(1, self.fake_bridge):
+                self.fake_bridge.lights()
+                self.fake_bridge.lights()
+        self.assertIn('Expected at most 1 request(s), but 2 were made', str(context.exception))
+        self.assertIn('Bridge.lights  calls=2 requests=2', str(context.exception))
+        self.assertIsInstance(context.exception, AssertionError)
@@ -0,0 +1,143 @@
+import asyncio
+import unittest
+import mock
+
+from huegely import (
+    aio,
+    bridge,
+    exceptions,
+    groups,
+    lights,
+    registry,
+    sensors,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class RegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('192.168.1.2', 'token')
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['2']))
+    def test_device(self, mock_request):
+        # A single request for just that light
+        light = self.fake_bridge.light(2)
+        self.assertIsInstance(light, lights.DimmableLight)
+        self.assertEqual(str(light), fake_data.BRIDGE_LIGHTS['2']['name'])
+        self.assertEqual(mock_request.call_args[0][1], 'http://192.168.1.2/api/token/lights/2')
+
+        # Known lights don't need any requests, unless they're too old
+        self.assertIs(self.fake_bridge.light(2), light)
+        self.assertIs(self.fake_bridge.light('2'), light)
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertIs(self.fake_bridge.light(2, max_age=0), light)
+        self.assertEqual(mock_request.call_count, 2)
+
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_GROUPS['3'])
+        self.assertIsInstance(self.fake_bridge.group(3), groups.DimmableGroup)
+
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_SENSORS['2'])
+        self.assertIsInstance(self.fake_bridge.sensor(2), sensors.MotionSensor)
+
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_SENSORS['3'])
+        with self.assertRaises(exceptions.HueError):
+            self.fake_bridge.sensor(3)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_listing(self, mock_request):
+        found_lights = self.fake_bridge.lights()
+        self.assertIs(self.fake_bridge.light(1), found_lights[0])
+        self.assertIs(self.fake_bridge.light_by_name('Light 2'), found_lights[1])
+        self.assertEqual(mock_request.call_count, 1)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_by_name(self, mock_request):
+        # Without a complete listing, the lights are listed first
+        light = self.fake_bridge.light_by_name('Light 1')
+        self.assertEqual(light.device_id, 1)
+        self.assertEqual(mock_request.call_count, 1)
+
+        self.assertIs(self.fake_bridge.light_by_name('Light 1'), light)
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Listings that are too old cause the lights to be listed again
+        self.fake_bridge.light_by_name('Light 1', max_age=0)
+        self.assertEqual(mock_request.call_count, 2)
+
+        # Names that aren't in a recent enough listing don't
+        with self.assertRaises(exceptions.HueError) as error:
+            self.fake_bridge.light_by_name('Light 3')
+        self.assertEqual(error.exception.error_code, exceptions.RESOURCE_NOT_AVAILABLE)
+        self.assertEqual(mock_request.call_count, 2)
+
+        with self.assertRaises(exceptions.HueError):
+            self.fake_bridge.light_by_name('Light 3', max_age=0)
+        self.assertEqual(mock_request.call_count, 3)
+
+        # Without max_age, missing names are listed again once the listing is older than MISSING_MAX_AGE
+        with mock.patch.object(registry.DeviceRegistry, 'MISSING_MAX_AGE', 0):
+            with self.assertRaises(exceptions.HueError):
+                self.fake_bridge.light_by_name('Light 3')
+        self.assertEqual(mock_request.call_count, 4)
+
+        # Lights renamed through huegely are found by their new name, and not by their old one
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/name": "Renamed"}}])
+        light.name('Renamed')
+        self.assertEqual(mock_request.call_count, 5)
+
+        self.assertIs(self.fake_bridge.light_by_name('Renamed'), light)
+        with self.assertRaises(exceptions.HueError):
+            self.fake_bridge.light_by_name('Light 1')
+        self.assertEqual(mock_request.call_count, 5)
+
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_GROUPS)
+        self.assertEqual(self.fake_bridge.group_by_name('Dimmer lights').device_id, 3)
+
+        mock_request.return_value = test_utils.MockResponse(fake_data.BRIDGE_SENSORS)
+        self.assertEqual(self.fake_bridge.sensor_by_name('Hallway sensor').device_id, 2)
+
+    def test_rename(self):
+        """ Devices with the same name resolve to the lowest id, renames move devices between names. """
+        device_registry = registry.DeviceRegistry()
+        first, second = [lights.DimmableLight(self.fake_bridge, device_id, name='Same') for device_id in (2, 1)]
+        device_registry.update('lights', [first, second], complete=True)
+        self.assertIs(device_registry.get_by_name('lights', 'Same'), second)
+
+        second._name = 'Other'
+        device_registry.rename('lights', second)
+        self.assertIs(device_registry.get_by_name('lights', 'Same'), first)
+        self.assertIs(device_registry.get_by_name('lights', 'Other'), second)
+
+        first._name = 'Third'
+        device_registry.rename('lights', first)
+        self.assertTrue(device_registry.is_missing('lights', 'Same'))
+
+        # Devices that aren't the indexed ones for their id are ignored
+        device_registry.rename('lights', lights.DimmableLight(self.fake_bridge, 1, name='Copy'))
+        self.assertTrue(device_registry.is_missing('lights', 'Copy'))
+        self.assertIs(device_registry.get_by_name('lights', 'Other'), second)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_FULL_STATE))
+    def test_snapshot(self, mock_request):
+        self.fake_bridge.snapshot()
+        self.fake_bridge.light_by_name('Light 2')
+        self.fake_bridge.group(1)
+        self.fake_bridge.sensor_by_name('Hallway sensor')
+        self.assertEqual(mock_request.call_count, 1)
+
+    @unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+    @mock.patch('aiohttp.ClientSession.request', return_value=test_utils.MockAsyncResponse(fake_data.BRIDGE_LIGHTS))
+    def test_async(self, mock_request):
+        async def find_lights():
+            async with aio.AsyncBridge('192.168.1.2', 'token') as async_bridge:
+                light = await async_bridge.light_by_name('Light 2')
+                return light, await async_bridge.light(2)
+
+        light, same_light = asyncio.run(find_lights())
+        self.assertIsInstance(light, aio.AsyncDimmableLight)
+        self.assertIs(light, same_light)
+        self.assertEqual(mock_request.call_count, 1)
@@ -0,0 +1,72 @@
+import unittest
+
+from huegely import (
+    bridge,
+    emulator,
+)
+from huegely.profiling import request_budget
+
+
+class RequestBudgetTests(unittest.TestCase):
+    """ Number of requests made by common operations, against the emulator. These catch operations becoming more expensive. """
+    def setUp(self):
+        self.emulator = emulator.BridgeEmulator()
+        self.emulator.start()
+        self.bridge = bridge.Bridge(self.emulator.ip, self.emulator.username)
+        self.light, self.off_light = self.bridge.lights()
+        self.group = self.bridge.groups()[0]
+
+    def tearDown(self):
+        self.bridge.close()
+        self.emulator.stop()
+
+    def test_listing(self):
+        with request_budget(1, self.bridge):
+            self.bridge.lights()
+        with request_budget(1, self.bridge):
+            self.bridge.snapshot()
+        # Group memberships are indexed by the listings above
+        with request_budget(0, self.bridge):
+            self.group.lights()
+            self.light.groups()
+
+    def test_on_off(self):
+        with request_budget(1, self.bridge):
+            self.light.off()
+        with request_budget(1, self.bridge):
+            self.light.on()
+
+    def test_transition_time(self):
+        # The brightness reset workaround uses the cached state, so it doesn't cost an extra request
+        self.light.cache_ttl = 60
+        with request_budget(1, self.bridge):
+            self.light.off(transition_time=100)
+        with request_budget(1, self.bridge):
+            self.light.on()
+
+        # Without a fresh state, it does
+        self.light.cache_ttl = None
+        with request_budget(2, self.bridge):
+            self.light.off(transition_time=100)
+
+        unknown_light = type(self.light)(self.bridge, self.light.device_id)
+        with request_budget(2, self.bridge):
+            unknown_light.off(transition_time=100)
+
+    def test_brightness_steps(self):
+        with request_budget(1, self.bridge):
+            self.light.darker()
+        with request_budget(1, self.bridge):
+            self.light.brighter()
+        with request_budget(1, self.bridge):
+            self.group.darker()
+
+        # A light known to be off is turned on in the same request
+        with request_budget(1, self.bridge):
+            self.off_light.brighter()
+
+    def test_color(self):
+        with request_budget(1, self.bridge):
+            self.light.hue(1000)
+        with request_budget(1, self.bridge):
+            self.light.brightness(100)
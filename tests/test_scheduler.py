@@ -0,0 +1,125 @@
+import threading
+import unittest
+import mock
+
+from huegely import (
+    batch,
+    bridge,
+    lights,
+    scheduler,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class FakeClock(object):
+    """ A clock for token buckets that only moves when sleeping. """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = scheduler.TokenBucket(rate=50, capacity=1, clock=clock, sleep=clock.sleep)
+
+        for _ in range(6):
+            bucket.acquire()
+
+        # The first token is available immediately, the other five take 20ms each
+        self.assertEqual(len(clock.sleeps), 5)
+        self.assertAlmostEqual(clock.now, 0.1)
+
+        self.assertFalse(bucket.try_acquire())
+        clock.now += 0.02
+        self.assertTrue(bucket.try_acquire())
+
+
+class SchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('127.0.0.1', 'fake_token', rate_limit=True)
+
+    def tearDown(self):
+        self.fake_bridge.close()
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse([{"success": {"/lights/1/state/on": True}}]))
+    def test_commands_are_scheduled(self, mock_request):
+        light = lights.DimmableLight(self.fake_bridge, 1)
+        self.assertTrue(light.on())
+        self.assertEqual(mock_request.call_count, 1)
+
+        metrics = self.fake_bridge.scheduler.metrics()
+        self.assertEqual(metrics['lights']['sent'], 1)
+        self.assertEqual(metrics['lights']['queue_depth'], 0)
+        self.assertEqual(metrics['groups']['sent'], 0)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS['1']))
+    def test_reads_are_not_scheduled(self, mock_request):
+        lights.DimmableLight(self.fake_bridge, 1).state()
+        self.assertEqual(self.fake_bridge.scheduler.metrics()['lights']['sent'], 0)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_supersession(self, mock_request):
+        """ Commands for a device that already has a command waiting are merged into it. """
+        mock_request.return_value = test_utils.MockResponse([{"success": {"/lights/1/state/bri": 100}}])
+
+        # The worker waits for its token until released, while the clock doesn't move on its own
+        clock = FakeClock()
+        waiting, release = threading.Event(), threading.Event()
+
+        def sleep(seconds):
+            waiting.set()
+            release.wait()
+            clock.sleep(seconds)
+
+        self.fake_bridge.scheduler = scheduler.CommandScheduler(self.fake_bridge, rates={'lights': 5})
+        self.fake_bridge.scheduler._buckets['lights'] = scheduler.TokenBucket(5, clock=clock, sleep=sleep)
+
+        # Use up the initial token, so that the following commands have to wait
+        self.fake_bridge.make_request('lights/2/state', method='PUT', bri=100)
+
+        # The merge of the second command, which happens while the first one is waiting for its token
+        merge_state = batch.merge_state
+        merged = threading.Event()
+
+        def merge(*args):
+            merge_state(*args)
+            merged.set()
+
+        responses = []
+
+        def put(bri):
+            responses.append(self.fake_bridge.make_request('lights/1/state', method='PUT', bri=bri))
+
+        with mock.patch('huegely.scheduler.batch.merge_state', side_effect=merge):
+            first = threading.Thread(target=put, args=(50,))
+            first.start()
+            self.assertTrue(waiting.wait(5))
+
+            second = threading.Thread(target=put, args=(100,))
+            second.start()
+            self.assertTrue(merged.wait(5))
+
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.call_args[1]['json'], {'bri': 100})
+        self.assertEqual(responses, [{'bri': 100}] * 2)
+        self.assertEqual(clock.sleeps, [0.2])
+
+        metrics = self.fake_bridge.scheduler.metrics()['lights']
+        self.assertEqual(metrics['sent'], 2)
+        self.assertEqual(metrics['superseded'], 1)
@@ -1,3 +1,4 @@
+import copy
 import unittest
 import mock
 from datetime import datetime
@@ -19,25 +20,25 @@ class SensorTests(unittest.TestCase):
         self.temperature_sensor = sensors.TemperatureSensor(self.fake_bridge, 1)
         self.motion_sensor = sensors.MotionSensor(self.fake_bridge, 2)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['1']))
     def test_get_state(self, mock_request):
         state = self.temperature_sensor.state()
 
         self.assertTrue('temperature' in state)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['1']))
     def test_temperature(self, mock_request):
         self.assertEqual(self.temperature_sensor.temperature(), 22.14)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['2']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['2']))
     def test_presence(self, mock_request):
         self.assertEqual(self.motion_sensor.presence(), False)
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['2']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['2']))
     def test_last_updated(self, mock_request):
         self.assertEqual(self.motion_sensor.last_updated(), datetime(year=2017, month=8, day=27, hour=18, minute=22, second=21))
 
-    @mock.patch('huegely.bridge.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['1']))
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_SENSORS['1']))
     def test_cache(self, mock_request):
         """Test sensor caching - requests should only be made if the data is older than specified."""
         # Set up the sensor - this should cause no requests
@@ -51,3 +52,44 @@ class SensorTests(unittest.TestCase):
         # Now we ask for the state with no max_age, a request should be made.
         sensor.state()
         assert mock_request.call_count == 1
+
+        # Cached state uses huegely names, same as the state returned by requests
+        self.assertEqual(sensor.state(max_age=10)['last_updated'], fake_data.BRIDGE_SENSORS['1']['state']['lastupdated'])
+        assert mock_request.call_count == 1
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_sync_sensors(self, mock_request):
+        """ Only new or changed sensors are decoded and returned by sync_sensors. """
+        data = copy.deepcopy(fake_data.BRIDGE_SENSORS)
+        mock_request.side_effect = lambda *args, **kwargs: test_utils.MockResponse(copy.deepcopy(data))
+
+        synced = self.fake_bridge.sync_sensors()
+        self.assertEqual([1, 2], [sensor.device_id for sensor in synced])
+        self.assertEqual(self.fake_bridge.synced_sensors(), synced)
+
+        # Nothing changed
+        with mock.patch.object(sensors.Sensor, '_process_device') as mock_process:
+            self.assertEqual(self.fake_bridge.sync_sensors(), [])
+            self.assertFalse(mock_process.called)
+
+        data['2']['state'] = {'lastupdated': '2017-08-27T18:30:00', 'presence': True}
+        changed = self.fake_bridge.sync_sensors()
+
+        # The changed sensor is updated in place
+        self.assertEqual(changed, [synced[1]])
+        self.assertTrue(synced[1].presence(max_age=60))
+
+        # Removed sensors are forgotten
+        del data['1']
+        self.fake_bridge.sync_sensors()
+        self.assertEqual([2], [sensor.device_id for sensor in self.fake_bridge.synced_sensors()])
+
+    def test_state_fingerprint(self):
+        temperature_data = fake_data.BRIDGE_SENSORS['1']
+        self.assertEqual(sensors.state_fingerprint(temperature_data), (temperature_data['name'], '2017-08-27T19:03:50'))
+
+        # Sensors that don't report their last update are compared by their full state
+        daylight_data = copy.deepcopy(fake_data.BRIDGE_SENSORS['3'])
+        fingerprint = sensors.state_fingerprint(daylight_data)
+        daylight_data['state']['daylight'] = True
+        self.assertNotEqual(sensors.state_fingerprint(daylight_data), fingerprint)
@@ -0,0 +1,86 @@
+import pickle
+import unittest
+import mock
+
+from huegely import (
+    bridge,
+    groups,
+    lights,
+    sensors,
+    state,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class DeviceStateTests(unittest.TestCase):
+    def setUp(self):
+        self.state_type = state.state_type(lights.DimmableLight)
+
+    def test_state_type(self):
+        self.assertEqual(self.state_type._fields, ('on', 'alert', 'is_reachable', 'brightness'))
+        self.assertEqual(set(state.state_type(lights.ExtendedColorLight)._fields), {
+            'on', 'alert', 'is_reachable', 'brightness', 'temperature', 'color_mode', 'hue', 'saturation', 'coordinates', 'effect'
+        })
+        self.assertTrue(issubclass(state.state_type(groups.DimmableGroup), state.GroupAction))
+        self.assertEqual(state.state_type(sensors.MotionSensor)._fields, ('last_updated', 'presence'))
+
+        # Device types with the same features share their state type
+        self.assertIs(state.state_type(lights.DimmableLight), state.state_type(type('Light', (lights.DimmableLight,), {})))
+        self.assertFalse(hasattr(self.state_type(), '__dict__'))
+
+    def test_mapping(self):
+        device_state = self.state_type({'on': True, 'brightness': 100, 'mode': 'homeautomation'})
+        self.assertEqual(device_state, {'on': True, 'brightness': 100, 'mode': 'homeautomation'})
+        self.assertEqual(list(device_state), ['on', 'brightness', 'mode'])
+        self.assertEqual(len(device_state), 3)
+        self.assertEqual(device_state['brightness'], 100)
+        self.assertIsNone(device_state.get('alert'))
+        self.assertNotIn('alert', device_state)
+        with self.assertRaises(KeyError):
+            device_state['alert']
+
+        device_state.update(alert='none', brightness=200)
+        del device_state['mode']
+        self.assertEqual(device_state.as_dict(), {'on': True, 'brightness': 200, 'alert': 'none'})
+
+        device_state.assign({'on': False})
+        self.assertEqual(device_state, {'on': False})
+        self.assertEqual(pickle.loads(pickle.dumps(device_state)), {'on': False})
+
+
+class DeviceStateUsageTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('192.168.1.2', 'token', cache_ttl=60)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_updated_in_place(self, mock_request):
+        light = self.fake_bridge.lights()[0]
+        known_state = light._state
+        self.assertIsInstance(known_state, state.LightState)
+
+        self.fake_bridge.lights()
+        self.assertIs(light._state, known_state)
+
+        # state() still returns dictionaries, which can be changed without affecting the known state
+        light_state = light.state()
+        self.assertIs(type(light_state), dict)
+        light_state['brightness'] = 0
+        self.assertEqual(light.brightness(), fake_data.BRIDGE_LIGHTS['1']['state']['bri'])
+        self.assertEqual(mock_request.call_count, 2)
+
+        mock_request.return_value = test_utils.MockResponse([{'success': {'/lights/1/state/bri': 10}}])
+        light.brightness(10)
+        self.assertIs(light._state, known_state)
+        self.assertEqual(known_state['brightness'], 10)
+
+    @mock.patch('huegely.bridge.Session.request', return_value=test_utils.MockResponse(fake_data.BRIDGE_LIGHTS))
+    def test_getters_dont_copy(self, mock_request):
+        light = self.fake_bridge.lights()[0]
+        with mock.patch.object(state.DeviceState, 'as_dict') as mock_as_dict:
+            light.hue()
+            light.brightness()
+            self.assertFalse(mock_as_dict.called)
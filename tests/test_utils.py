@@ -1,6 +1,34 @@
+import json
+
+
+class MockRequest(object):
+    def __init__(self, body=None):
+        self.body = body
+
+
 class MockResponse(object):
-    def __init__(self, data):
+    def __init__(self, data, request_body=None):
         self.data = data
+        self.request = MockRequest(request_body)
+
+    @property
+    def content(self):
+        return json.dumps(self.data).encode('utf-8')
 
     def json(self):
         return self.data
+
+
+class MockAsyncResponse(MockResponse):
+    """ Stand-in for the aiohttp response context manager returned by ClientSession.request. """
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    async def json(self, content_type=None):
+        return self.data
+
+    async def read(self):
+        return self.content
@@ -0,0 +1,94 @@
+import asyncio
+import copy
+import unittest
+import mock
+
+from huegely import (
+    aio,
+    bridge,
+    lights,
+    sensors,
+)
+
+from . import (
+    fake_data,
+    test_utils
+)
+
+
+class WatchTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_bridge = bridge.Bridge('127.0.0.1', 'fake_token')
+        self.data = {
+            'lights': copy.deepcopy(fake_data.BRIDGE_LIGHTS),
+            'sensors': copy.deepcopy(fake_data.BRIDGE_SENSORS),
+        }
+
+    def respond(self, method, url, **kwargs):
+        return test_utils.MockResponse(copy.deepcopy(self.data[url.rsplit('/', 1)[1]]))
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_changes(self, mock_request):
+        mock_request.side_effect = self.respond
+        watcher = self.fake_bridge.watch(kinds=('lights', 'sensors'), min_interval=1, max_interval=4, backoff=2)
+
+        # The first poll records the current state
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(mock_request.call_count, 2)
+
+        # No changes, polling slows down
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.interval, 2)
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.interval, 4)
+
+        self.data['lights']['1']['state']['bri'] = 100
+        self.data['sensors']['2']['state']['presence'] = True
+        events = watcher.poll()
+
+        self.assertEqual([(event.attribute, event.old_value, event.new_value) for event in events], [
+            ('brightness', 254, 100),
+            ('presence', False, True),
+        ])
+        self.assertIsInstance(events[0].device, lights.ExtendedColorLight)
+        self.assertIsInstance(events[1].device, sensors.MotionSensor)
+        self.assertEqual(events[0].device.state(max_age=60)['brightness'], 100)
+
+        # Activity speeds polling back up
+        self.assertEqual(watcher.interval, 1)
+
+    @mock.patch('huegely.bridge.Session.request')
+    def test_iteration(self, mock_request):
+        mock_request.side_effect = self.respond
+        watcher = self.fake_bridge.watch(kinds=('lights',), min_interval=0, max_interval=0)
+
+        def change_light(interval):
+            self.data['lights']['2']['state']['on'] = True
+
+        with mock.patch('huegely.watch.time.sleep', side_effect=change_light):
+            event = next(iter(watcher))
+
+        self.assertEqual((event.device.device_id, event.attribute, event.new_value), (2, 'on', True))
+
+    @unittest.skipIf(aio.aiohttp is None, "aiohttp is not installed")
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_async(self, mock_request):
+        mock_request.side_effect = lambda method, url, **kwargs: test_utils.MockAsyncResponse(
+            copy.deepcopy(self.data[url.rsplit('/', 1)[1]])
+        )
+
+        async def watch_changes():
+            async with aio.AsyncBridge('127.0.0.1', 'fake_token') as async_bridge:
+                watcher = async_bridge.watch(kinds=('lights', 'sensors'), min_interval=0, max_interval=0)
+                with self.assertRaises(TypeError):
+                    iter(watcher)
+
+                self.assertEqual(await watcher.poll(), [])
+                self.data['lights']['2']['state']['on'] = True
+                async for event in watcher:
+                    return event
+
+        event = asyncio.run(watch_changes())
+        self.assertIsInstance(event.device, aio.AsyncDimmableLight)
+        self.assertEqual((event.device.device_id, event.attribute, event.new_value), (2, 'on', True))